@@ -0,0 +1,231 @@
+import argparse
+import json
+import logging
+import os
+import shutil
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from checkpoint import RunCheckpoint, write_part_outputs
+from html_extract import set_default_backend
+from http_fetcher import HttpPageFetcher
+from kia_parts import (add_scrape_arguments, check_scrape_arguments, create_vin_directory, open_driver_manager,
+                       open_page_cache, open_parse_pool, open_proxy_pool, open_retry_policy, page_load_stats,
+                       record_delta, report_metrics, setup_logging, write_columnar_copy)
+from metrics import enable_metrics
+from navigate_kia_parts_undetected import KiaPartsScraper
+from page_cache import normalize_url
+from rate_limiter import set_default_limits
+from worker_pool import ScraperWorkerPool
+
+PLAN_FILE = "batch_plan.json"
+
+
+def read_vins(vin_file: str) -> List[str]:
+    """Read one VIN per line, skipping blanks, comments and duplicates."""
+    vins = []
+    with open(vin_file, 'r') as f:
+        for line in f:
+            vin = line.split("#", 1)[0].strip().upper()
+            if vin and vin not in vins:
+                vins.append(vin)
+    return vins
+
+
+def build_plan(vins: List[str], link_scraper: KiaPartsScraper, logger: logging.Logger) -> Dict:
+    """Resolve every VIN to its model URL and discover each model's assembly URLs once.
+
+    Returns ``{"vins": {vin: model_url}, "models": {model_url: [assembly urls]}, "invalid": [...]}``.
+    """
+    plan = {"vins": OrderedDict(), "models": OrderedDict(), "invalid": []}
+    for vin in vins:
+        logger.info(f"Searching for VIN {vin}...")
+        model_url = link_scraper.search_vin(vin)
+        if not model_url:
+            logger.error(f"Invalid VIN {vin}: could not find vehicle")
+            plan["invalid"].append(vin)
+            continue
+        plan["vins"][vin] = model_url
+
+    for model_url in OrderedDict.fromkeys(plan["vins"].values()):
+        sharing = [vin for vin, url in plan["vins"].items() if url == model_url]
+        logger.info(f"Discovering assemblies for {model_url} (shared by {len(sharing)} VINs)")
+        category_links = link_scraper.discover_category_links(model_url)
+        plan["models"][model_url] = link_scraper.scrape_category_pages(category_links)
+    return plan
+
+
+def run_batch(args):
+    """Scrape every VIN in ``args.vin_file``, fetching each distinct assembly page once."""
+    vins = read_vins(args.vin_file)
+    batch_name = os.path.splitext(os.path.basename(args.vin_file))[0]
+    batch_dir = create_vin_directory(f"batch_{batch_name}")
+    logger = setup_logging(batch_dir)
+    logger.info(f"Batch {batch_name}: {len(vins)} VINs")
+
+    set_default_limits(initial_rate=args.rate, max_rate=args.max_rate)
+    set_default_backend(args.parser)
+    if args.metrics:
+        enable_metrics()
+    parse_pool = open_parse_pool(args)
+    proxy_pool = open_proxy_pool(args)
+    http_fetcher = None if args.browser_only else HttpPageFetcher(proxy_pool=proxy_pool)
+    drivers = open_driver_manager(args, proxy_pool)
+    retry_policy = open_retry_policy(args)
+    page_cache = None if args.no_cache else open_page_cache(args, batch_dir)
+
+    try:
+        plan_file = os.path.join(batch_dir, PLAN_FILE)
+        if RunCheckpoint.is_resumable(batch_dir) and os.path.exists(plan_file):
+            with open(plan_file, 'r') as f:
+                plan = json.load(f, object_pairs_hook=OrderedDict)
+            logger.info(f"Resuming batch with {len(plan['vins'])} resolved VINs from {plan_file}")
+        else:
+            session = drivers.acquire()
+            category_stats = page_load_stats(args, "category")
+            link_scraper = KiaPartsScraper(cache=page_cache, proxy=session.proxy, lean=args.lean,
+                                           load_stats=category_stats, driver=session.driver,
+                                           retry_policy=retry_policy, parse_pool=parse_pool)
+            try:
+                plan = build_plan(vins, link_scraper, logger)
+                if http_fetcher:
+                    http_fetcher.export_cookies(link_scraper.driver)
+            finally:
+                link_scraper.close()
+                drivers.release(session)
+                if category_stats:
+                    logger.info(category_stats.summary())
+            with open(plan_file, 'w') as f:
+                json.dump(plan, f, indent=4)
+
+        # Every distinct assembly page across all models, keyed without the volatile search GUID
+        crawl_urls = list(OrderedDict(
+            (normalize_url(url), url) for urls in plan["models"].values() for url in urls
+        ).values())
+        total_assembly_urls = sum(len(plan["models"][model]) for model in plan["vins"].values())
+        logger.info(f"{len(plan['vins'])} VINs map to {len(plan['models'])} models and "
+                    f"{len(crawl_urls)} distinct assembly pages ({total_assembly_urls} without sharing)")
+
+        checkpoint = RunCheckpoint(batch_dir)
+        failed_urls = set()
+
+        def on_result(index, url, parts_data):
+            if parts_data:
+                checkpoint.record(index, url, parts_data)
+            else:
+                failed_urls.add(url)
+                logger.warning(f"No data scraped from {url}")
+
+        pool = ScraperWorkerPool(num_workers=args.workers, http_fetcher=http_fetcher, page_cache=page_cache,
+                                 extraction_mode=args.extract, proxy_pool=proxy_pool, lean=args.lean,
+                                 load_stats=page_load_stats(args, "assembly"), driver_manager=drivers,
+                                 retry_policy=retry_policy, parse_pool=parse_pool)
+        try:
+            pool.run(crawl_urls, on_result=on_result, skip=checkpoint.completed_urls, keep_results=False)
+        finally:
+            checkpoint.close()
+        if pool.load_stats:
+            logger.info(pool.load_stats.summary())
+
+        finish_batch(plan, checkpoint, args.columnar, args.delta, logger)
+
+        if failed_urls:
+            failed_file = os.path.join(batch_dir, "failed_urls.txt")
+            with open(failed_file, 'w') as f:
+                for url in failed_urls:
+                    f.write(f"{url}\n")
+            logger.warning(f"Failed URLs saved to {failed_file}")
+
+        logger.info(f"""
+        Batch Summary:
+        --------------
+        VINs: {len(vins)} ({len(plan['invalid'])} invalid)
+        Models: {len(plan['models'])}
+        Assembly pages fetched: {len(crawl_urls)} (instead of {total_assembly_urls})
+        Failed: {len(failed_urls)}
+        Batch directory: {batch_dir}
+        """)
+        report_metrics(batch_dir, checkpoint.run_id, logger)
+    finally:
+        drivers.close()
+        if http_fetcher:
+            http_fetcher.close()
+        if proxy_pool:
+            proxy_pool.stop()
+        if parse_pool:
+            parse_pool.close()
+
+
+def finish_batch(plan: Dict, checkpoint: RunCheckpoint, columnar: Optional[str], delta: bool,
+                 logger: logging.Logger):
+    """Write every VIN's outputs and close the batch's run.
+
+    The per-VIN files are the batch's output. No combined file is written to
+    the batch directory: parts_index and consolidate would read it as one more
+    vehicle, mixing every model's rows.
+    """
+    fan_out(plan, checkpoint, checkpoint.run_id, columnar, delta, logger)
+    checkpoint.finalize(write_outputs=False)
+
+
+def fan_out(plan: Dict, checkpoint: RunCheckpoint, timestamp: str, columnar: Optional[str], delta: bool,
+            logger: logging.Logger):
+    """Write each VIN's assembly_urls.txt and CSV/JSON outputs (or snapshot delta) from the shared record log.
+
+    The log is scanned once; each VIN then reads only its own records. VINs of
+    the same model share their assembly pages, so the model's first VIN
+    writes the outputs and the others get copies.
+    """
+    records = checkpoint.index_records()
+    by_url = {normalize_url(url): index for index, (url, _) in records.items()}
+    # Per model: its records and the first VIN's output files
+    selections: Dict[str, Dict] = {}
+    written: Dict[str, Tuple[List[str], int]] = {}
+    for vin, model_url in plan["vins"].items():
+        assembly_urls = plan["models"][model_url]
+        if model_url not in selections:
+            indexes = (by_url.get(normalize_url(url)) for url in assembly_urls)
+            selections[model_url] = {index: records[index] for index in indexes if index is not None}
+        selection = selections[model_url]
+        output_dir = create_vin_directory(vin)
+
+        with open(os.path.join(output_dir, "assembly_urls.txt"), 'w') as f:
+            for url in assembly_urls:
+                f.write(f"{url}\n")
+
+        def vin_parts():
+            for _, _, record_parts in checkpoint.iter_records(selection):
+                yield from record_parts
+
+        output_file = os.path.join(output_dir, f"kia_parts_data_{timestamp}.csv")
+        if delta:
+            record_delta(output_dir, checkpoint.run_id, checkpoint.iter_records(selection), logger)
+            logger.info(f"VIN {vin}: run stored in {os.path.join(output_dir, 'snapshots')}")
+        else:
+            paths = [output_file,
+                     os.path.join(output_dir, f"kia_parts_compressed_{timestamp}.csv"),
+                     os.path.join(output_dir, f"kia_parts_data_{timestamp}.json")]
+            if model_url in written:
+                first_paths, count = written[model_url]
+                for source, path in zip(first_paths, paths):
+                    shutil.copyfile(source, path)
+            else:
+                count = write_part_outputs(vin_parts(), *paths)
+                written[model_url] = (paths, count)
+            logger.info(f"VIN {vin}: {count} parts written to {output_dir}")
+        write_columnar_copy(vin_parts(), output_file, columnar, vin, logger)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Scrape many VINs non-interactively, crawling assemblies shared by the same model once"
+    )
+    parser.add_argument("vin_file", help="Text file with one VIN per line (# starts a comment)")
+    add_scrape_arguments(parser)
+    args = parser.parse_args()
+    check_scrape_arguments(parser, args)
+    run_batch(args)
+
+
+if __name__ == "__main__":
+    main()
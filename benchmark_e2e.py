@@ -0,0 +1,278 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; peak memory is then left out of the report
+    resource = None
+
+from selenium.webdriver.support.ui import WebDriverWait
+
+from driver_manager import DriverSession
+from http_fetcher import HttpPageFetcher
+from metrics import enable_metrics, get_metrics
+from navigate_kia_parts_undetected import KiaPartsScraper
+from rate_limiter import set_default_limits
+from scrape_kia_parts_undetected import EXTRACTION_MODES, parse_parts_from_html, scrape_parts_from_page, setup_driver
+from standin_site import StandInSite, default_catalogs
+from worker_pool import ScraperWorkerPool
+
+TARGETS = ("discovery", "browser", "http", "pipeline")
+
+# Settings that must be equal for two reports to be compared
+CONFIG_KEYS = ("vin", "limit", "latency", "jitter", "error_rate", "challenge_rate", "seed", "rate", "extract", "lean",
+               "workers")
+
+DEFAULT_REPORT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "output", "benchmarks")
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident memory of this process so far (ru_maxrss is in KB on Linux)."""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _result(pages: int, parts: int, errors: int, mismatches: int, elapsed: float, **extra) -> Dict:
+    result = {
+        "pages": pages,
+        "parts": parts,
+        "errors": errors,
+        "mismatches": mismatches,
+        "wall_seconds": round(elapsed, 3),
+        "pages_per_sec": round(pages / elapsed, 3) if elapsed else 0.0,
+        "parts_per_sec": round(parts / elapsed, 3) if elapsed else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    result.update(extra)
+    return result
+
+
+def bench_discovery(site: StandInSite, vin: str, driver, wait_time: int) -> Dict:
+    """VIN search, category links and assembly URL collection through KiaPartsScraper."""
+    scraper = KiaPartsScraper(driver=driver, base_url=site.base_url)
+    scraper.wait = WebDriverWait(driver, wait_time)
+    expected = site.assembly_urls(vin)
+
+    start = time.perf_counter()
+    model_url = scraper.search_vin(vin)
+    category_links = scraper.discover_category_links(model_url) if model_url else []
+    assembly_urls = scraper.scrape_category_pages(category_links)
+    elapsed = time.perf_counter() - start
+
+    missing = len(set(expected) - set(assembly_urls))
+    return _result(3 + len(category_links), 0, 0 if model_url else 1, missing, elapsed,
+                   assembly_urls=len(assembly_urls), expected_assembly_urls=len(expected))
+
+
+def bench_browser(site: StandInSite, urls: List[str], driver, wait_time: int, mode: str) -> Dict:
+    """scrape_parts_from_page over every assembly URL in one browser."""
+    parts = errors = mismatches = 0
+    start = time.perf_counter()
+    for url in urls:
+        rows = scrape_parts_from_page(driver, url, wait_time=wait_time, mode=mode)
+        if not rows:
+            errors += 1
+            continue
+        parts += len(rows)
+        if rows != site.expected_parts(url):
+            mismatches += 1
+    elapsed = time.perf_counter() - start
+    return _result(len(urls), parts, errors, mismatches, elapsed,
+                   browser_mb=DriverSession(0, driver, None).memory_mb())
+
+
+def bench_http(site: StandInSite, urls: List[str]) -> Dict:
+    """HttpPageFetcher plus parsing over every assembly URL, no browser involved."""
+    with tempfile.TemporaryDirectory() as tmp:
+        fetcher = HttpPageFetcher(cookies_file=os.path.join(tmp, "cookies.json"))
+        parts = errors = mismatches = 0
+        start = time.perf_counter()
+        for url in urls:
+            page_source = fetcher.fetch(url)
+            rows = parse_parts_from_html(page_source, url) if page_source else []
+            if not rows:
+                errors += 1
+                continue
+            parts += len(rows)
+            if rows != site.expected_parts(url):
+                mismatches += 1
+        elapsed = time.perf_counter() - start
+        fetcher.close()
+    return _result(len(urls), parts, errors, mismatches, elapsed)
+
+
+def _discover_and_scrape(site: StandInSite, vin: str, driver, wait_time: int, workers: int,
+                         pipelined: bool) -> Dict:
+    scraper = KiaPartsScraper(driver=driver, base_url=site.base_url)
+    scraper.wait = WebDriverWait(driver, wait_time)
+    first_part = None
+
+    def on_result(index, url, parts_data):
+        nonlocal first_part
+        if parts_data and first_part is None:
+            first_part = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fetcher = HttpPageFetcher(cookies_file=os.path.join(tmp, "cookies.json"))
+        pool = ScraperWorkerPool(num_workers=workers, http_fetcher=fetcher)
+        start = time.perf_counter()
+        model_url = scraper.search_vin(vin)
+        category_links = scraper.discover_category_links(model_url) if model_url else []
+        urls = (url for _, assembly_urls in scraper.iter_category_pages(category_links) for url in assembly_urls)
+        results = pool.run(urls if pipelined else list(urls), on_result=on_result)
+        elapsed = time.perf_counter() - start
+        fetcher.close()
+
+    scraped = [(url, rows) for url, rows in zip(site.assembly_urls(vin), results) if rows]
+    mismatches = sum(1 for url, rows in scraped if rows != site.expected_parts(url))
+    return {
+        "pages": len(results),
+        "parts": sum(len(rows) for _, rows in scraped),
+        "errors": len(results) - len(scraped),
+        "mismatches": mismatches,
+        "elapsed": elapsed,
+        "first_part_seconds": round(first_part, 3) if first_part is not None else None,
+    }
+
+
+def bench_pipeline(site: StandInSite, vin: str, driver, wait_time: int, workers: int) -> Dict:
+    """VIN search through parts scraping with discovery streaming URLs to HTTP workers, against doing it in turn."""
+    sequential = _discover_and_scrape(site, vin, driver, wait_time, workers, pipelined=False)
+    pipelined = _discover_and_scrape(site, vin, driver, wait_time, workers, pipelined=True)
+    return _result(pipelined["pages"], pipelined["parts"], pipelined["errors"], pipelined["mismatches"],
+                   pipelined["elapsed"], first_part_seconds=pipelined["first_part_seconds"],
+                   sequential_wall_seconds=round(sequential["elapsed"], 3),
+                   sequential_first_part_seconds=sequential["first_part_seconds"])
+
+
+def print_report(report: Dict, previous: Optional[Dict] = None):
+    print(f"\n{'target':<10} {'pages':>6} {'parts':>7} {'errors':>6} {'mismatch':>8} {'wall s':>8} "
+          f"{'pages/s':>8} {'parts/s':>9} {'peak MB':>8}")
+    for target, result in report["results"].items():
+        print(f"{target:<10} {result['pages']:>6} {result['parts']:>7} {result['errors']:>6} "
+              f"{result['mismatches']:>8} {result['wall_seconds']:>8.2f} {result['pages_per_sec']:>8.2f} "
+              f"{result['parts_per_sec']:>9.1f} {result['peak_rss_mb'] or 0:>8.0f}")
+        before = (previous or {}).get("results", {}).get(target)
+        if before and before["wall_seconds"]:
+            change = (result["wall_seconds"] - before["wall_seconds"]) / before["wall_seconds"] * 100
+            print(f"{'':<10} vs {previous['run_id']}: wall {before['wall_seconds']:.2f}s -> "
+                  f"{result['wall_seconds']:.2f}s ({change:+.1f}%), pages/s {before['pages_per_sec']:.2f} -> "
+                  f"{result['pages_per_sec']:.2f}")
+    pipeline = report["results"].get("pipeline")
+    if pipeline:
+        print(f"\npipeline: first parts after {pipeline['first_part_seconds'] or 0:.2f}s "
+              f"(sequential {pipeline['sequential_first_part_seconds'] or 0:.2f}s), wall "
+              f"{pipeline['wall_seconds']:.2f}s (sequential {pipeline['sequential_wall_seconds']:.2f}s)")
+    site = report["site"]
+    print(f"\nStand-in site: {site['requests']} requests, {site['errors']} injected errors, "
+          f"{site['challenges']} injected challenges")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the scraper end to end against a local stand-in of parts.kia.com"
+    )
+    parser.add_argument("--json", help="kia_parts_data_*.json to serve (default: newest JSON of every output/<VIN>/)")
+    parser.add_argument("--vin", help="VIN to benchmark (default: the first VIN found; required with --json)")
+    parser.add_argument("--targets", nargs="+", choices=TARGETS, default=list(TARGETS),
+                        help="What to run: discovery (KiaPartsScraper), browser (scrape_parts_from_page), "
+                             "http (HttpPageFetcher), pipeline (discovery streaming into HTTP workers, timed "
+                             "against discovery then scraping); default: all")
+    parser.add_argument("--limit", type=int, default=50, help="Assembly pages per target, 0 for all (default: 50)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds the site adds to every page")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Up to this many extra random seconds per page")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of pages answered with a 503")
+    parser.add_argument("--challenge-rate", type=float, default=0.0,
+                        help="Fraction of pages answered with a challenge page")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for latency and error draws (default: 0)")
+    parser.add_argument("--rate", type=float, default=1000,
+                        help="Rate limiter requests/sec; the default effectively turns pacing off")
+    parser.add_argument("--extract", choices=EXTRACTION_MODES, default="html",
+                        help="Extraction mode for the browser target (default: html)")
+    parser.add_argument("--lean", action="store_true", help="Run the browser in lean mode")
+    parser.add_argument("--wait", type=int, default=10,
+                        help="Seconds the browser waits for a page's rows before giving up (default: 10)")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="Worker threads for the pipeline target (default: 4)")
+    parser.add_argument("--report-dir", default=DEFAULT_REPORT_DIR,
+                        help="Where e2e_<timestamp>.json reports go (default: output/benchmarks/)")
+    parser.add_argument("--compare", metavar="REPORT", help="Earlier report to compare this run against")
+    args = parser.parse_args()
+
+    if args.json and not args.vin:
+        parser.error("--vin is required with --json")
+    output_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "output")
+    catalogs = {args.vin: args.json} if args.json else default_catalogs(output_dir)
+    if not catalogs:
+        raise SystemExit("No output/<VIN>/kia_parts_data_*.json found; pass --json and --vin")
+    vin = args.vin or next(iter(catalogs))
+    if vin not in catalogs:
+        raise SystemExit(f"No scraped JSON for VIN {vin} under output/")
+
+    previous = None
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            previous = json.load(f)
+
+    set_default_limits(initial_rate=args.rate, max_rate=args.rate)
+    enable_metrics()
+    config = {"vin": vin, "limit": args.limit, "latency": args.latency, "jitter": args.jitter,
+              "error_rate": args.error_rate, "challenge_rate": args.challenge_rate, "seed": args.seed,
+              "rate": args.rate, "extract": args.extract, "lean": args.lean, "workers": args.workers,
+              "targets": args.targets,
+              "source": catalogs[vin]}
+    if previous:
+        differences = [key for key in CONFIG_KEYS if previous["config"].get(key) != config[key]]
+        if differences:
+            print(f"Warning: {args.compare} was run with different settings ({', '.join(differences)}); "
+                  f"numbers are not directly comparable")
+
+    with StandInSite(catalogs, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                     challenge_rate=args.challenge_rate, seed=args.seed) as site:
+        urls = site.assembly_urls(vin)
+        urls = urls[:args.limit] if args.limit else urls
+        print(f"Stand-in site on {site.base_url}: VIN {vin}, {len(urls)} assembly pages per target")
+
+        results = {}
+        driver = None
+        try:
+            if {"discovery", "browser", "pipeline"} & set(args.targets):
+                driver = setup_driver(user_data_dir=tempfile.mkdtemp(prefix="kia_bench_"), lean=args.lean)
+            if "discovery" in args.targets:
+                results["discovery"] = bench_discovery(site, vin, driver, args.wait)
+            if "browser" in args.targets:
+                results["browser"] = bench_browser(site, urls, driver, args.wait, args.extract)
+            if "http" in args.targets:
+                results["http"] = bench_http(site, urls)
+            if "pipeline" in args.targets:
+                results["pipeline"] = bench_pipeline(site, vin, driver, args.wait, args.workers)
+        finally:
+            if driver is not None:
+                driver.quit()
+
+        report = {
+            "run_id": datetime.now().strftime('%Y%m%d_%H%M%S'),
+            "config": config,
+            "results": results,
+            "site": dict(site.stats),
+            "metrics": get_metrics().to_dict(),
+        }
+
+    os.makedirs(args.report_dir, exist_ok=True)
+    report_file = os.path.join(args.report_dir, f"e2e_{report['run_id']}.json")
+    with open(report_file, 'w') as f:
+        json.dump(report, f, indent=4)
+
+    print_report(report, previous)
+    print(get_metrics().summary())
+    print(f"\nReport saved to {report_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import argparse
+import glob
+import gzip
+import json
+import os
+import time
+import tracemalloc
+from typing import List, Tuple
+
+from html_extract import BACKENDS, extract_assembly_links, extract_parts, lxml
+from synthetic_pages import load_assemblies, render_assembly_page, render_category_page, site_path
+
+
+def default_json_file() -> str:
+    """Newest kia_parts_data_*.json under output/."""
+    base = os.path.join(os.path.dirname(os.path.abspath(__file__)), "output")
+    files = glob.glob(os.path.join(base, "**", "kia_parts_data_*.json"), recursive=True)
+    if not files:
+        raise SystemExit("No kia_parts_data_*.json found under output/; pass --json or --cache-dir")
+    return max(files, key=os.path.getsize)
+
+
+def fixture_pages(json_file: str, limit: int) -> Tuple[List[Tuple[str, str]], List[str]]:
+    """Render (url, html) assembly pages and category pages from a JSON output file."""
+    assemblies = load_assemblies(json_file)
+    urls = list(assemblies)[:limit] if limit else list(assemblies)
+    pages = [(url, render_assembly_page(assemblies[url])) for url in urls]
+    cards = [{"name": assemblies[url][0]["Assembly"], "href": site_path(url)} for url in urls]
+    # Split the cards over five category pages like the real site
+    step = max(1, len(cards) // 5)
+    categories = [render_category_page(cards[i:i + step]) for i in range(0, len(cards), step)]
+    return pages, categories
+
+
+def cached_pages(cache_dir: str, limit: int) -> Tuple[List[Tuple[str, str]], List[str]]:
+    """Real pages from a PageCache directory, split into assembly and category pages."""
+    pages, categories = [], []
+    for path in sorted(glob.glob(os.path.join(cache_dir, "**", "*.json.gz"), recursive=True)):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            entry = json.load(f)
+        if "assemblyProdDetails" in entry["page_source"]:
+            pages.append((entry["url"], entry["page_source"]))
+        elif "assemblyCard" in entry["page_source"]:
+            categories.append(entry["page_source"])
+        if limit and len(pages) >= limit:
+            break
+    return pages, categories
+
+
+def run_backend(backend: str, pages, categories, repeat: int):
+    """Return (parts, links, seconds per pass, peak bytes) for one backend."""
+    def one_pass():
+        parts = [extract_parts(html, url, backend=backend) for url, html in pages]
+        links = [extract_assembly_links(html, backend=backend) for html in categories]
+        return parts, links
+
+    # Peak memory from a separate traced pass; tracing would distort the timings
+    tracemalloc.start()
+    parts, links = one_pass()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        one_pass()
+    elapsed = (time.perf_counter() - start) / repeat
+    return parts, links, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare HTML extraction backends on fixture pages")
+    parser.add_argument("--json", help="kia_parts_data_*.json to render fixture pages from (default: largest under output/)")
+    parser.add_argument("--cache-dir", help="Benchmark real pages from a page cache directory instead")
+    parser.add_argument("--limit", type=int, default=0, help="Use at most this many assembly pages")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed passes per backend (default: 3)")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    args = parser.parse_args()
+
+    if args.cache_dir:
+        pages, categories = cached_pages(args.cache_dir, args.limit)
+        source = args.cache_dir
+    else:
+        source = args.json or default_json_file()
+        pages, categories = fixture_pages(source, args.limit)
+
+    backends = [b for b in args.backends if b != "lxml" or lxml is not None]
+    if len(backends) < len(args.backends):
+        print("lxml is not installed, skipping the lxml backend")
+
+    total_bytes = sum(len(html) for _, html in pages)
+    print(f"Fixture: {len(pages)} assembly pages ({total_bytes / 1e6:.1f} MB), "
+          f"{len(categories)} category pages from {source}\n")
+    print(f"{'backend':<10} {'pages/sec':>10} {'ms/page':>9} {'peak MB':>9} {'parts':>8}  identical")
+
+    reference = None
+    for backend in backends:
+        parts, links, elapsed, peak = run_backend(backend, pages, categories, args.repeat)
+        if reference is None:
+            reference = (parts, links)
+        identical = (parts, links) == reference
+        page_count = len(pages) + len(categories)
+        print(f"{backend:<10} {page_count / elapsed:>10.1f} {elapsed / page_count * 1000:>9.2f} "
+              f"{peak / 1e6:>9.1f} {sum(len(p) for p in parts):>8}  {'yes' if identical else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
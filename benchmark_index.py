@@ -0,0 +1,96 @@
+import argparse
+import os
+import random
+import statistics
+import string
+import tempfile
+import time
+
+from parts_index import PartsIndex
+
+NAME_WORDS = ["BOLT", "SCREW-TAPPING", "NUT-FLANGE", "CLIP", "GROMMET", "BRACKET", "COVER ASSY", "SEAL",
+              "WASHER", "RETAINER", "HOSE", "PANEL-TRIM", "SENSOR", "SWITCH", "BUMPER", "GASKET"]
+ASSEMBLIES = [f"ASSEMBLY {i}" for i in range(300)]
+
+
+def random_part_number(rng: random.Random) -> str:
+    return "".join(rng.choices(string.digits, k=10)) + "".join(rng.choices(string.ascii_uppercase, k=rng.randint(0, 2)))
+
+
+def build_index(db_path: str, rows: int, vins: int, catalog: int, seed: int) -> PartsIndex:
+    """Fill ``db_path`` with ``rows`` synthetic parts spread over ``vins`` single-run VINs."""
+    rng = random.Random(seed)
+    part_numbers = [random_part_number(rng) for _ in range(catalog)]
+    index = PartsIndex(db_path)
+    per_vin = rows // vins
+    with index.conn:
+        for v in range(vins):
+            vin = f"KNASYNTH{v:09d}"
+            source_id = index.conn.execute(
+                "INSERT INTO sources(path, directory, mtime, size, vin, run, latest) VALUES (?, ?, 0, 0, ?, ?, 1)",
+                (f"synthetic/{vin}/kia_parts_data.json", f"synthetic/{vin}", vin, "20250101_000000")
+            ).lastrowid
+            index.conn.executemany(
+                "INSERT INTO parts(source_id, assembly, part_name, part_number, price, price_cents, "
+                "price_is_msrp, quantity, product_url, assembly_url) VALUES (?, ?, ?, ?, ?, ?, 1, ?, ?, ?)",
+                (
+                    (source_id, assembly, name, number, f"$ {cents / 100:.2f}MSRP", cents, rng.randint(1, 8),
+                     f"https://parts.kia.com/p/{number}.html", f"https://parts.kia.com/a/{assembly}.html")
+                    for assembly, name, number, cents in (
+                        (rng.choice(ASSEMBLIES), f"{rng.choice(NAME_WORDS)}. {rng.choice(NAME_WORDS)}",
+                         rng.choice(part_numbers), rng.randint(50, 90000))
+                        for _ in range(per_vin)
+                    )
+                )
+            )
+        index.conn.execute("INSERT INTO parts_fts(parts_fts) VALUES ('rebuild')")
+    return index, part_numbers
+
+
+def time_queries(label: str, query, arguments):
+    timings, found = [], 0
+    for argument in arguments:
+        start = time.perf_counter()
+        found += len(query(argument))
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    p99 = timings[int(len(timings) * 0.99) - 1] if len(timings) >= 100 else timings[-1]
+    print(f"{label:<22} {statistics.median(timings):>9.3f} {p99:>9.3f} {found / len(arguments):>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PartsIndex lookups on a synthetic index")
+    parser.add_argument("--rows", type=int, default=2_000_000, help="Synthetic part rows (default: 2,000,000)")
+    parser.add_argument("--vins", type=int, default=500, help="VINs the rows are spread over (default: 500)")
+    parser.add_argument("--catalog", type=int, default=60_000, help="Distinct part numbers (default: 60,000)")
+    parser.add_argument("--queries", type=int, default=1000, help="Lookups per query type (default: 1000)")
+    parser.add_argument("--db", help="Keep the index at this path instead of a temporary file")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db or os.path.join(tmp, "parts_index.sqlite")
+        start = time.perf_counter()
+        index, part_numbers = build_index(db_path, args.rows, args.vins, args.catalog, args.seed)
+        build_time = time.perf_counter() - start
+        print(f"Built {args.rows:,} rows for {args.vins} VINs in {build_time:.1f} s "
+              f"({os.path.getsize(db_path) / 1e6:.0f} MB)\n")
+
+        rng = random.Random(args.seed + 1)
+        print(f"{'query':<22} {'median ms':>9} {'p99 ms':>9} {'rows/query':>10}")
+        try:
+            time_queries("part number", index.by_part_number,
+                         [rng.choice(part_numbers) for _ in range(args.queries)])
+            time_queries("name prefix (50)", index.by_name_prefix,
+                         [rng.choice(NAME_WORDS)[:rng.randint(2, 4)] for _ in range(args.queries)])
+            time_queries("assembly + VIN", lambda a: index.by_assembly(a[0], a[1]),
+                         [(rng.choice(ASSEMBLIES), f"KNASYNTH{rng.randrange(args.vins):09d}")
+                          for _ in range(args.queries)])
+            time_queries("VIN", index.by_vin,
+                         [f"KNASYNTH{rng.randrange(args.vins):09d}" for _ in range(min(args.queries, 50))])
+        finally:
+            index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import argparse
+import gc
+import hashlib
+import os
+import random
+import string
+import tempfile
+import time
+import tracemalloc
+import uuid
+from typing import Dict, Iterator
+
+from checkpoint import write_part_outputs
+from part_store import PartStore
+
+BASE_URL = "https://parts.kia.com"
+NAME_WORDS = ["BOLT", "SCREW-TAPPING", "NUT-FLANGE", "CLIP", "GROMMET", "BRACKET", "COVER ASSY", "SEAL",
+              "WASHER", "RETAINER", "HOSE", "PANEL-TRIM", "SENSOR", "SWITCH", "BUMPER", "GASKET"]
+ASSEMBLY_WORDS = ["2ND SEAT", "FRONT BUMPER", "CRASH PAD", "WINDSHIELD GLASS", "ENGINE MOUNTING", "COWL PANEL",
+                  "FUEL SYSTEM", "REAR DOOR", "HEADLAMP", "BRAKE SYSTEM", "STEERING COLUMN", "CONSOLE"]
+
+
+def fresh(text: str) -> str:
+    """A new string object with the same text, like the parser returns for every row."""
+    return text.encode().decode()
+
+
+def synthetic_parts(rows: int, vins: int, catalog: int, per_assembly: int, seed: int) -> Iterator[Dict]:
+    """Rows shaped like parse_parts_from_html() output, spread over ``vins`` runs of the same models.
+
+    Every row gets freshly built strings, as parsing a page does, and every
+    VIN has its own assemblySearchGuid in the assembly URLs.
+    """
+    rng = random.Random(seed)
+    part_numbers = ["".join(rng.choices(string.digits, k=10)) for _ in range(catalog)]
+    names = {number: f"{rng.choice(NAME_WORDS)}-{rng.choice(NAME_WORDS)}" for number in part_numbers}
+    prices = {number: f"${rng.randint(50, 90000) / 100:.2f}" for number in part_numbers}
+    assemblies_per_vin = max(1, rows // vins // per_assembly)
+    assemblies = [(f"{rng.choice(ASSEMBLY_WORDS)} {i}", f"_52022_{rng.randint(10000000, 13000000)}",
+                   rng.sample(part_numbers, per_assembly)) for i in range(assemblies_per_vin)]
+
+    produced = 0
+    while produced < rows:
+        guid = str(uuid.UUID(int=rng.getrandbits(128))).upper()
+        for name, group, numbers in assemblies:
+            url = (f"{BASE_URL}/a/Kia_2024_Sorento/{group}/{name.replace(' ', '-')}/AKMAPHY24.html"
+                   f"?assemblySearchGuid={guid}")
+            for number in numbers:
+                if produced == rows:
+                    return
+                yield {
+                    "Assembly": fresh(name),
+                    "Part Name": fresh(names[number]),
+                    "Part Number": fresh(number),
+                    "Price": fresh(prices[number]),
+                    "Quantity": str(rng.randint(1, 4)),
+                    "Product URL": f"{BASE_URL}/p/Kia__/{names[number]}/{number[:8]}/{number}.html",
+                    "Assembly URL": url,
+                }
+                produced += 1
+
+
+def measure(label: str, build):
+    """Build a container under tracemalloc and report the memory it holds once built."""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    container = build()
+    elapsed = time.perf_counter() - start
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<14} {held / 1e6:>10.1f} {peak / 1e6:>10.1f} {held / len(container):>10.1f} {elapsed:>9.1f}")
+    return container, held
+
+
+def export_digest(parts, directory: str, label: str):
+    """Write the CSV/compressed CSV/JSON outputs and return their combined hash and the time taken."""
+    paths = [os.path.join(directory, f"{label}{suffix}") for suffix in (".csv", "_compressed.csv", ".json")]
+    start = time.perf_counter()
+    write_part_outputs(parts, *paths)
+    elapsed = time.perf_counter() - start
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        os.remove(path)
+    return digest.hexdigest(), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the memory held by a list of part dicts and a PartStore")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Synthetic part rows (default: 1,000,000)")
+    parser.add_argument("--vins", type=int, default=20, help="VIN runs the rows are spread over (default: 20)")
+    parser.add_argument("--catalog", type=int, default=60_000, help="Distinct part numbers (default: 60,000)")
+    parser.add_argument("--per-assembly", type=int, default=25, help="Rows per assembly page (default: 25)")
+    parser.add_argument("--no-export", action="store_true", help="Skip writing and comparing the CSV/JSON outputs")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    def rows():
+        return synthetic_parts(args.rows, args.vins, args.catalog, args.per_assembly, args.seed)
+
+    print(f"{args.rows:,} rows over {args.vins} VINs\n")
+    print(f"{'container':<14} {'held MB':>10} {'peak MB':>10} {'bytes/row':>10} {'build s':>9}")
+    parts_list, list_bytes = measure("list of dicts", lambda: list(rows()))
+    if args.no_export:
+        del parts_list
+    store, store_bytes = measure("PartStore", lambda: PartStore(rows()))
+    print(f"\nPartStore holds {store_bytes / list_bytes:.1%} of the list's memory "
+          f"({(list_bytes - store_bytes) / 1e6:.0f} MB less); its own estimate is {store.memory_bytes() / 1e6:.1f} MB")
+    print(", ".join(f"{store.distinct(field):,} distinct {field}" for field in store.fields))
+
+    if not args.no_export:
+        with tempfile.TemporaryDirectory() as tmp:
+            list_digest, list_time = export_digest(parts_list, tmp, "list")
+            store_digest, store_time = export_digest(store, tmp, "store")
+        print(f"\nCSV/JSON export: list {list_time:.1f} s, PartStore {store_time:.1f} s, "
+              f"outputs {'identical' if list_digest == store_digest else 'DIFFER'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+import csv
+import json
+import logging
+import os
+import re
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from metrics import timer
+
+logger = logging.getLogger(__name__)
+
+PART_FIELDS = ["Assembly", "Part Name", "Part Number", "Price", "Quantity", "Product URL", "Assembly URL"]
+COMPRESSED_FIELDS = ["Assembly", "Part Name", "Part Number"]
+
+STATE_FILE = "run_state.json"
+
+JSON_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+def write_part_outputs(parts: Iterable[Dict], output_file: str, compressed_file: str,
+                       json_file: str) -> int:
+    """Stream part rows into the full CSV, compressed CSV and JSON backup in one pass.
+
+    The files match what ``pandas.DataFrame.to_csv`` and ``json.dump(..., indent=4)``
+    used to produce. Returns the number of rows written.
+    """
+    count = 0
+    with open(output_file, 'w', newline='') as full_f, \
+            open(compressed_file, 'w', newline='') as compressed_f, \
+            open(json_file, 'w') as json_f:
+        full_writer = csv.DictWriter(full_f, fieldnames=PART_FIELDS, lineterminator='\n', extrasaction='ignore')
+        compressed_writer = csv.DictWriter(compressed_f, fieldnames=COMPRESSED_FIELDS, lineterminator='\n',
+                                           extrasaction='ignore')
+        full_writer.writeheader()
+        compressed_writer.writeheader()
+
+        json_f.write("[")
+        for part in parts:
+            full_writer.writerow(part)
+            compressed_writer.writerow(part)
+            # Same layout as json.dump(list, indent=4), one element at a time
+            element = json.dumps(part, indent=4).replace("\n", "\n    ")
+            json_f.write(f"{',' if count else ''}\n    {element}")
+            count += 1
+        json_f.write("\n]" if count else "]")
+    return count
+
+
+def iter_json_array(path: str, chunk_size: int = 64 * 1024) -> Iterator:
+    """Yield the elements of a file holding one JSON array, reading it ``chunk_size`` characters at a time.
+
+    Only the element being decoded and the current chunk are held in memory,
+    so multi-megabyte ``indent=4`` backups can be read row by row.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r') as f:
+        buffer, pos, eof = "", 0, False
+
+        def refill() -> bool:
+            nonlocal buffer, pos, eof
+            chunk = f.read(chunk_size)
+            buffer, pos, eof = buffer[pos:] + chunk, 0, not chunk
+            return bool(chunk)
+
+        def next_char() -> str:
+            nonlocal pos
+            while True:
+                pos = JSON_WHITESPACE.match(buffer, pos).end()
+                if pos < len(buffer):
+                    return buffer[pos]
+                if not refill():
+                    raise ValueError(f"{path}: unexpected end of JSON array")
+
+        if next_char() != "[":
+            raise ValueError(f"{path}: expected a JSON array")
+        pos += 1
+        expect_element = True
+        while True:
+            char = next_char()
+            if char == "]":
+                return
+            if not expect_element:
+                if char != ",":
+                    raise ValueError(f"{path}: expected ',' or ']' in JSON array")
+                pos += 1
+                expect_element = True
+                continue
+            try:
+                element, end = decoder.raw_decode(buffer, pos)
+            except ValueError:
+                element, end = None, None
+            # An element running into the end of the buffer may continue in the next chunk
+            if end is None or (end == len(buffer) and not eof):
+                if refill():
+                    continue
+                if end is None:
+                    raise ValueError(f"{path}: invalid JSON array element")
+            yield element
+            pos = end
+            expect_element = False
+
+
+class RunCheckpoint:
+    """Append-only part record log and completed-URL ledger for one VIN run.
+
+    Records go to ``parts_<run_id>.jsonl``, one line per assembly URL, and the
+    URL is added to ``completed_<run_id>.txt`` once its line is on disk. An
+    unfinished run found in ``run_state.json`` is resumed with the same run id,
+    so the final output file names stay the same across restarts. A run that
+    saved its own assembly URL list says so with ``mark_url_list_saved()``, so
+    a restart does not pair it with an older run's list.
+    """
+
+    def __init__(self, output_dir: str, fsync_every: int = 20):
+        self.output_dir = output_dir
+        self.fsync_every = fsync_every
+        self.state_file = os.path.join(output_dir, STATE_FILE)
+
+        state = self._load_state()
+        self.resumed = state is not None and not state.get("finished", False)
+        if self.resumed:
+            self.run_id = state["run_id"]
+            self.url_list_run_id = state.get("url_list_run_id")
+        else:
+            self.url_list_run_id = None
+            self.run_id = datetime.now().strftime('%Y%m%d_%H%M%S')
+            # Two runs started within the same second must not share files
+            suffix = 1
+            while os.path.exists(os.path.join(output_dir, f"parts_{self.run_id}.jsonl")):
+                self.run_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{suffix}"
+                suffix += 1
+            self._save_state(finished=False)
+
+        self.records_file = os.path.join(output_dir, f"parts_{self.run_id}.jsonl")
+        self.ledger_file = os.path.join(output_dir, f"completed_{self.run_id}.txt")
+        for path in (self.records_file, self.ledger_file):
+            self._drop_partial_line(path)
+        self.completed_urls = self._load_ledger()
+
+        self._lock = threading.Lock()
+        self._unsynced = 0
+        self._records = open(self.records_file, 'a')
+        self._ledger = open(self.ledger_file, 'a')
+
+        if self.resumed:
+            logger.info(f"Resuming run {self.run_id}: {len(self.completed_urls)} URLs already done")
+
+    def _load_state(self) -> Optional[dict]:
+        try:
+            with open(self.state_file, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable {self.state_file}: {e}")
+            return None
+
+    def _save_state(self, finished: bool):
+        tmp_file = f"{self.state_file}.tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump({"run_id": self.run_id, "finished": finished, "url_list_run_id": self.url_list_run_id}, f)
+        os.replace(tmp_file, self.state_file)
+
+    def mark_url_list_saved(self):
+        """Record that the assembly URL list now in ``output_dir`` was written by this run."""
+        self.url_list_run_id = self.run_id
+        self._save_state(finished=False)
+
+    @staticmethod
+    def is_resumable(output_dir: str, with_url_list: bool = False) -> bool:
+        """True if ``output_dir`` holds an unfinished run; with ``with_url_list``, one that saved its URL list."""
+        try:
+            with open(os.path.join(output_dir, STATE_FILE), 'r') as f:
+                state = json.load(f)
+        except Exception:
+            return False
+        if state.get("finished", False):
+            return False
+        return not with_url_list or state.get("url_list_run_id") == state.get("run_id")
+
+    @staticmethod
+    def _drop_partial_line(path: str):
+        """Cut off a half-written last line left by a crash so appends start clean."""
+        if not os.path.exists(path):
+            return
+        with open(path, 'rb+') as f:
+            end = f.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                start = max(0, position - 65536)
+                f.seek(start)
+                chunk = f.read(position - start)
+                newline = chunk.rfind(b"\n")
+                if newline != -1:
+                    position = start + newline + 1
+                    break
+                position = start
+            if position != end:
+                f.truncate(position)
+
+    def _load_ledger(self) -> set:
+        if not os.path.exists(self.ledger_file):
+            return set()
+        with open(self.ledger_file, 'r') as f:
+            return {line.strip() for line in f if line.strip()}
+
+    def record(self, index: int, url: str, parts: List[Dict]):
+        """Append one URL's parts to the log and mark the URL as completed."""
+        line = json.dumps({"index": index, "url": url, "parts": parts})
+        with self._lock, timer("checkpoint_write"):
+            self._records.write(line + "\n")
+            self._records.flush()
+            self._unsynced += 1
+            if self._unsynced >= self.fsync_every:
+                self._sync()
+            # Only ledger the URL once its records are written; a crash in
+            # between just means the URL is scraped again
+            self._ledger.write(url + "\n")
+            self._ledger.flush()
+            self.completed_urls.add(url)
+
+    def _sync(self):
+        os.fsync(self._records.fileno())
+        os.fsync(self._ledger.fileno())
+        self._unsynced = 0
+
+    def index_records(self) -> Dict[int, Tuple[str, int]]:
+        """One pass over the log: ``{index: (url, offset)}`` of every recorded URL's latest line."""
+        with self._lock:
+            if not self._records.closed:
+                self._records.flush()
+
+        records = {}
+        with open(self.records_file, 'rb') as f:
+            while True:
+                offset = f.tell()
+                line = f.readline()
+                if not line:
+                    break
+                record = json.loads(line)
+                records[record["index"]] = (record["url"], offset)
+        return records
+
+    def iter_records(self, records: Optional[Dict[int, Tuple[str, int]]] = None
+                     ) -> Iterator[Tuple[int, str, List[Dict]]]:
+        """Stream (index, url, parts) for every recorded URL in index order.
+
+        Only line offsets are held in memory; if a URL was recorded twice the
+        later record wins. Pass ``records`` from ``index_records()``, or a
+        subset of it, to read several selections without scanning the log
+        each time.
+        """
+        if records is None:
+            records = self.index_records()
+        with open(self.records_file, 'rb') as f:
+            for index in sorted(records):
+                f.seek(records[index][1])
+                record = json.loads(f.readline())
+                yield record["index"], record["url"], record["parts"]
+
+    def iter_parts(self) -> Iterator[Dict]:
+        """Stream every recorded part in assembly URL order."""
+        for _, _, parts in self.iter_records():
+            yield from parts
+
+    def output_paths(self) -> Dict[str, str]:
+        """Final output file names for this run."""
+        return {
+            "csv": os.path.join(self.output_dir, f"kia_parts_data_{self.run_id}.csv"),
+            "compressed": os.path.join(self.output_dir, f"kia_parts_compressed_{self.run_id}.csv"),
+            "json": os.path.join(self.output_dir, f"kia_parts_data_{self.run_id}.json"),
+        }
+
+    def finalize(self, write_outputs: bool = True) -> int:
+        """Write the final CSV, compressed CSV and JSON from the log and close the run.
+
+        Returns the number of parts in the run; nothing is written for an empty
+        run. With ``write_outputs`` False (delta runs, whose rows already went
+        to the snapshot store) nothing is written and the log and ledger are
+        removed instead.
+        """
+        self.close()
+        count = 0
+        if os.path.getsize(self.records_file) > 0:
+            if write_outputs:
+                paths = self.output_paths()
+                with timer("write_outputs"):
+                    count = write_part_outputs(self.iter_parts(), paths["csv"], paths["compressed"], paths["json"])
+            else:
+                count = sum(1 for _ in self.iter_parts())
+        self._save_state(finished=True)
+        if not write_outputs:
+            os.remove(self.records_file)
+            os.remove(self.ledger_file)
+        return count
+
+    def close(self):
+        with self._lock:
+            if self._records.closed:
+                return
+            self._sync()
+            self._records.close()
+            self._ledger.close()
@@ -0,0 +1,108 @@
+import logging
+import re
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Iterable, Optional, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional, only needed for columnar output
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+PRICE_PATTERN = re.compile(r"(-?[\d,]*\.?\d+)")
+
+# Columns repeated on every row of an assembly are dictionary-encoded
+DICTIONARY_COLUMNS = ["vin", "assembly", "assembly_url"]
+
+
+def parse_price(price: Optional[str]) -> Tuple[Optional[int], bool]:
+    """Turn scraped price text such as ``"$ 1.09MSRP"`` into (cents, is_msrp)."""
+    if not price:
+        return None, False
+    is_msrp = "MSRP" in price.upper()
+    match = PRICE_PATTERN.search(price)
+    if not match:
+        return None, is_msrp
+    try:
+        cents = (Decimal(match.group(1).replace(",", "")) * 100).quantize(Decimal(1))
+    except InvalidOperation:
+        return None, is_msrp
+    return int(cents), is_msrp
+
+
+def parse_quantity(quantity) -> Optional[int]:
+    """Scraped quantities are strings like ``"2"``; anything unparseable becomes None."""
+    if quantity is None or quantity == "":
+        return None
+    try:
+        return int(str(quantity).strip())
+    except ValueError:
+        return None
+
+
+def columnar_schema():
+    dictionary_string = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ("vin", dictionary_string),
+        ("assembly", dictionary_string),
+        ("part_name", pa.string()),
+        ("part_number", pa.string()),
+        ("price_cents", pa.int64()),
+        ("price_is_msrp", pa.bool_()),
+        ("quantity", pa.int32()),
+        ("product_url", pa.string()),
+        ("assembly_url", dictionary_string),
+    ])
+
+
+def _batch(rows: Dict[str, list], schema):
+    return pa.RecordBatch.from_arrays(
+        [pa.array(rows[field.name], type=field.type) for field in schema],
+        schema=schema
+    )
+
+
+def write_columnar(parts: Iterable[Dict], path: str, vin: Optional[str] = None,
+                   batch_size: int = 50000) -> int:
+    """Stream part rows into a Parquet file, or an Arrow IPC stream if ``path`` ends in ``.arrow``.
+
+    Prices become integer cents plus an MSRP flag and quantities become
+    integers. VIN, assembly and assembly URL are dictionary-encoded. Returns
+    the number of rows written.
+    """
+    if pa is None:
+        raise RuntimeError("Columnar output needs pyarrow: pip install pyarrow")
+
+    schema = columnar_schema()
+    if path.endswith(".arrow"):
+        # The stream format, unlike the file format, allows each batch its own dictionaries
+        writer = pa.ipc.new_stream(path, schema)
+    else:
+        writer = pq.ParquetWriter(path, schema, use_dictionary=DICTIONARY_COLUMNS, compression="zstd")
+
+    count = 0
+    rows = {field.name: [] for field in schema}
+    try:
+        for part in parts:
+            cents, is_msrp = parse_price(part.get("Price"))
+            rows["vin"].append(vin)
+            rows["assembly"].append(part.get("Assembly"))
+            rows["part_name"].append(part.get("Part Name"))
+            rows["part_number"].append(part.get("Part Number"))
+            rows["price_cents"].append(cents)
+            rows["price_is_msrp"].append(is_msrp)
+            rows["quantity"].append(parse_quantity(part.get("Quantity")))
+            rows["product_url"].append(part.get("Product URL"))
+            rows["assembly_url"].append(part.get("Assembly URL"))
+            count += 1
+            if count % batch_size == 0:
+                writer.write_batch(_batch(rows, schema))
+                rows = {field.name: [] for field in schema}
+        if rows["vin"]:
+            writer.write_batch(_batch(rows, schema))
+    finally:
+        writer.close()
+    return count
@@ -0,0 +1,252 @@
+import argparse
+import csv
+import json
+import os
+import re
+import time
+import tracemalloc
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from columnar_output import parse_quantity
+from page_cache import normalize_url
+from parts_index import DEFAULT_OUTPUT_DIR, discover_sources, read_rows, source_directory, vin_for_path
+
+DEFAULT_DEST = os.path.join(DEFAULT_OUTPUT_DIR, "consolidated")
+
+# Product and assembly URLs name the model: /p/Kia_2024_Sorento/... and /a/Kia_2024_Sorento/...
+MODEL_PATTERN = re.compile(r"/[ap]/(Kia_[^/]+)/")
+UNKNOWN_MODEL = "unknown"
+
+CATALOG_FIELDS = ["Assembly", "Part Name", "Part Number", "Price", "Quantity", "Min Quantity", "VINs",
+                  "Product URL"]
+UNION_FIELDS = CATALOG_FIELDS + ["Models"]
+
+# Position of each aggregated value in a catalog entry list
+NAME, PRICE, MAX_QTY, MIN_QTY, VINS, PRODUCT_URL, RUN, MODELS = range(8)
+
+
+def model_for_row(row: Dict) -> Optional[str]:
+    for field in ("Assembly URL", "Product URL"):
+        match = MODEL_PATTERN.search(row.get(field) or "")
+        if match:
+            return match.group(1)
+    return None
+
+
+def latest_sources(output_dir: str) -> "OrderedDict[str, Tuple[str, Optional[str]]]":
+    """The newest run of each output directory, as ``{directory: (path, run)}`` sorted by directory.
+
+    Older runs of a VIN describe the same vehicle and would count it twice.
+    """
+    latest: Dict[str, Tuple[str, str]] = {}
+    for path, run in discover_sources(output_dir).items():
+        directory = source_directory(path)
+        if directory not in latest or run > latest[directory][1]:
+            latest[directory] = (path, run)
+    return OrderedDict(sorted(latest.items()))
+
+
+def source_model(path: str) -> str:
+    """Model of a run, read from the first row that carries a URL (compressed CSVs have none)."""
+    for row in read_rows(path):
+        model = model_for_row(row)
+        if model:
+            return model
+    return UNKNOWN_MODEL
+
+
+def vehicle_quantities(path: str, stats: Dict[str, int]) -> Dict[Tuple, List]:
+    """One run's rows, deduplicated and combined per (assembly, part number).
+
+    Exact duplicate rows (ignoring the per-visit search GUID in the assembly
+    URL) count once. The rest are summed per assembly page and part number.
+    Several pages can share an assembly name (one per catalog, e.g.
+    KKMAPHC20_88-891 and AKMAPHY24_88-891 both list "2ND SEAT"); they are
+    alternatives for the vehicle, so their quantities are not added up but
+    kept as the largest and smallest page total. Returns
+    ``{(assembly, part number): [name, price, max quantity, min quantity, product url]}``;
+    the quantities are None when no row had one.
+    """
+    seen = set()
+    # {(assembly page, part number): [assembly, name, price, quantity, product url]}
+    pages: Dict[Tuple, List] = {}
+    # Every row of a page repeats its assembly URL
+    normalized: Dict[Optional[str], str] = {}
+    for row in read_rows(path):
+        stats["rows"] += 1
+        assembly_url = row.get("Assembly URL")
+        if assembly_url not in normalized:
+            normalized[assembly_url] = normalize_url(assembly_url or "")
+        identity = (row.get("Assembly"), row.get("Part Name"), row.get("Part Number"), row.get("Price"),
+                    row.get("Quantity"), row.get("Product URL"), normalized[assembly_url])
+        if identity in seen:
+            stats["duplicate_rows"] += 1
+            continue
+        seen.add(identity)
+
+        key = (normalized[assembly_url], row.get("Part Number"))
+        quantity = parse_quantity(row.get("Quantity"))
+        page = pages.get(key)
+        if page is None:
+            pages[key] = [row.get("Assembly"), row.get("Part Name"), row.get("Price"), quantity,
+                          row.get("Product URL")]
+            continue
+        stats["merged_rows"] += 1
+        if quantity is not None:
+            page[3] = quantity if page[3] is None else page[3] + quantity
+        # Fill in what an earlier row of the same part lacked
+        page[0] = page[0] or row.get("Assembly")
+        page[1] = page[1] or row.get("Part Name")
+        page[2] = page[2] or row.get("Price")
+        page[4] = page[4] or row.get("Product URL")
+
+    totals: Dict[Tuple, List] = {}
+    for (_, part_number), (assembly, name, price, quantity, product_url) in pages.items():
+        key = (assembly, part_number)
+        total = totals.get(key)
+        if total is None:
+            totals[key] = [name, price, quantity, quantity, product_url]
+            continue
+        stats["merged_pages"] += 1
+        if quantity is not None:
+            total[2] = quantity if total[2] is None else max(total[2], quantity)
+            total[3] = quantity if total[3] is None else min(total[3], quantity)
+        total[0] = total[0] or name
+        total[1] = total[1] or price
+        total[4] = total[4] or product_url
+    return totals
+
+
+def merge_vehicle(catalog: Dict[Tuple, List], totals: Dict[Tuple, List], run: str, model: Optional[str] = None):
+    """Fold one vehicle's per-part totals into a catalog; prices and names come from the newest run."""
+    for key, (name, price, max_quantity, min_quantity, product_url) in totals.items():
+        entry = catalog.get(key)
+        if entry is None:
+            catalog[key] = [name, price, max_quantity, min_quantity, 1, product_url, run, {model} if model else None]
+            continue
+        entry[VINS] += 1
+        if max_quantity is not None:
+            entry[MAX_QTY] = max_quantity if entry[MAX_QTY] is None else max(entry[MAX_QTY], max_quantity)
+            entry[MIN_QTY] = min_quantity if entry[MIN_QTY] is None else min(entry[MIN_QTY], min_quantity)
+        if run >= entry[RUN]:
+            entry[NAME] = name or entry[NAME]
+            entry[PRICE] = price or entry[PRICE]
+            entry[PRODUCT_URL] = product_url or entry[PRODUCT_URL]
+            entry[RUN] = run
+        if model:
+            entry[MODELS].add(model)
+
+
+def catalog_rows(catalog: Dict[Tuple, List]) -> Iterator[Dict]:
+    """Catalog entries as output rows, sorted by assembly and part number."""
+    for (assembly, part_number) in sorted(catalog, key=lambda key: (key[0] or "", key[1] or "")):
+        entry = catalog[(assembly, part_number)]
+        row = {
+            "Assembly": assembly,
+            "Part Name": entry[NAME],
+            "Part Number": part_number,
+            "Price": entry[PRICE],
+            "Quantity": entry[MAX_QTY],
+            "Min Quantity": entry[MIN_QTY],
+            "VINs": entry[VINS],
+            "Product URL": entry[PRODUCT_URL],
+        }
+        if entry[MODELS] is not None:
+            row["Models"] = ";".join(sorted(entry[MODELS]))
+        yield row
+
+
+def write_catalog(rows: Iterator[Dict], path: str, fields: List[str]) -> int:
+    tmp_path = f"{path}.tmp"
+    count = 0
+    with open(tmp_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fields, lineterminator='\n')
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    os.replace(tmp_path, path)
+    return count
+
+
+def consolidate(output_dir: str = DEFAULT_OUTPUT_DIR, dest: str = DEFAULT_DEST,
+                models: Optional[List[str]] = None) -> Dict:
+    """Write ``catalog_<model>.csv`` for every model and ``union.csv`` across all VINs into ``dest``.
+
+    Runs are read one at a time and streamed row by row, so memory grows with
+    the number of distinct (assembly, part number) pairs, not with the number
+    of VINs. Quantities are per vehicle: the sum over a run's distinct rows of
+    the same part on the same assembly page (see ``vehicle_quantities()``),
+    reported as the largest (Quantity) and smallest (Min Quantity) seen across
+    the model's VINs.
+    """
+    os.makedirs(dest, exist_ok=True)
+    stats = {"sources": 0, "rows": 0, "duplicate_rows": 0, "merged_rows": 0, "merged_pages": 0}
+
+    by_model: "OrderedDict[str, List[Tuple[str, str, str]]]" = OrderedDict()
+    for directory, (path, run) in latest_sources(output_dir).items():
+        model = source_model(path)
+        if models and model not in models:
+            continue
+        by_model.setdefault(model, []).append((directory, path, run))
+
+    union: Dict[Tuple, List] = {}
+    summary = {"models": OrderedDict(), "stats": stats}
+    for model, sources in sorted(by_model.items()):
+        catalog: Dict[Tuple, List] = {}
+        for _, path, run in sources:
+            totals = vehicle_quantities(path, stats)
+            merge_vehicle(catalog, totals, run)
+            merge_vehicle(union, totals, run, model)
+            stats["sources"] += 1
+        catalog_file = os.path.join(dest, f"catalog_{model}.csv")
+        count = write_catalog(catalog_rows(catalog), catalog_file, CATALOG_FIELDS)
+        summary["models"][model] = {
+            "catalog": catalog_file,
+            "parts": count,
+            "vins": [vin_for_path(path) or os.path.relpath(path, output_dir) for _, path, _ in sources],
+        }
+        # The model's catalog is on disk; only the union carries on
+        del catalog
+
+    union_file = os.path.join(dest, "union.csv")
+    summary["union"] = {"path": union_file,
+                        "parts": write_catalog(catalog_rows(union), union_file, UNION_FIELDS)}
+    with open(os.path.join(dest, "summary.json"), 'w') as f:
+        json.dump(summary, f, indent=4)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Merge the latest run of every VIN under output/ into per-model catalogs and a cross-VIN union"
+    )
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR,
+                        help=f"Runs to read (default: {DEFAULT_OUTPUT_DIR})")
+    parser.add_argument("--dest", default=DEFAULT_DEST, help=f"Where to write the catalogs (default: {DEFAULT_DEST})")
+    parser.add_argument("--model", action="append", help="Only this model, e.g. Kia_2024_Sorento (repeatable)")
+    parser.add_argument("--memory", action="store_true", help="Report peak Python memory use")
+    args = parser.parse_args()
+
+    if args.memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    summary = consolidate(args.output_dir, args.dest, args.model)
+    elapsed = time.perf_counter() - start
+
+    stats = summary["stats"]
+    for model, info in summary["models"].items():
+        print(f"{model}: {info['parts']} parts from {len(info['vins'])} runs -> {info['catalog']}")
+    print(f"Union: {summary['union']['parts']} parts -> {summary['union']['path']}")
+    print(f"{stats['sources']} runs, {stats['rows']} rows read, {stats['duplicate_rows']} duplicate rows dropped, "
+          f"{stats['merged_rows']} rows merged into another row of the same part, "
+          f"{stats['merged_pages']} pages sharing an assembly name ({elapsed:.1f} s)")
+    if args.memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"Peak memory: {peak / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,346 @@
+import itertools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Optional
+
+try:
+    import psutil
+except ImportError:  # psutil is optional; without it memory is read from the page's JS heap
+    psutil = None
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; profile roots are then made per process id
+    fcntl = None
+
+from scrape_kia_parts_undetected import setup_driver
+
+logger = logging.getLogger(__name__)
+
+# Each session gets its own Chrome profile under this directory; Chrome refuses
+# to open the same profile from two processes at once.
+DEFAULT_PROFILE_ROOT = os.path.abspath(".pw_user_undetected_workers")
+
+# Lock files of the profile roots this process claimed, held open until it exits
+_profile_locks = []
+
+# undetected-chromedriver patches the chromedriver binary while starting up,
+# which is not safe to do from several threads at the same time.
+_driver_start_lock = threading.Lock()
+
+MEMORY_SCRIPT = "return performance.memory ? performance.memory.usedJSHeapSize : null;"
+
+
+def claim_profile_root(base: str = DEFAULT_PROFILE_ROOT) -> str:
+    """A profile root no other running process uses: ``base`` itself if free, else ``base_1``, ``base_2``...
+
+    Several scraper processes on one machine (``--queue`` workers, say) would
+    otherwise all start slot 0's Chrome in the same profile directory. The
+    claim is an exclusive lock on ``<root>.lock`` held until the process
+    exits, so the next run gets the same directories back, cookies included.
+    """
+    if fcntl is None:
+        return f"{base}_{os.getpid()}"
+    os.makedirs(os.path.dirname(base) or ".", exist_ok=True)
+    index = 0
+    while True:
+        root = base if index == 0 else f"{base}_{index}"
+        lock_file = open(f"{root}.lock", "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            index += 1
+            continue
+        _profile_locks.append(lock_file)
+        if index:
+            logger.info(f"{base} is in use by another process, using {root}")
+        return root
+
+
+class DriverSession:
+    """One running browser with the profile slot and proxy it was started with."""
+
+    def __init__(self, slot: int, driver, proxy: Optional[str]):
+        self.slot = slot
+        self.driver = driver
+        self.proxy = proxy
+        self.pages = 0
+        self.started_at = time.monotonic()
+        self.discarded = False
+
+    def discard(self):
+        """Mark the session as broken; it is quit instead of going back to the pool."""
+        self.discarded = True
+
+    def alive(self) -> bool:
+        try:
+            self.driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def memory_mb(self) -> Optional[float]:
+        """Resident memory of the browser's process tree, or the page's JS heap without psutil."""
+        pid = getattr(self.driver, "browser_pid", None)
+        if psutil is not None and pid:
+            try:
+                process = psutil.Process(pid)
+                rss = process.memory_info().rss
+                for child in process.children(recursive=True):
+                    try:
+                        rss += child.memory_info().rss
+                    except psutil.Error:
+                        pass
+                return rss / (1024 * 1024)
+            except psutil.Error:
+                return None
+        try:
+            heap = self.driver.execute_script(MEMORY_SCRIPT)
+        except Exception:
+            return None
+        return heap / (1024 * 1024) if heap else None
+
+
+class DriverManager:
+    """Keeps up to ``size`` warm Chrome sessions and hands them out as leases.
+
+    ``with manager.lease() as session:`` gives exclusive use of
+    ``session.driver``; on exit the session goes back to the idle pool for the
+    next caller. Each lease counts as one page (add to ``session.pages`` for
+    more). A session is quit and its slot restarted on demand once it has
+    served ``max_pages`` pages, its memory passes ``max_memory_mb``, its
+    driver died, its proxy was quarantined, or the holder called
+    ``session.discard()``. ``warm()`` starts sessions in the background ahead
+    of use, ``resize()`` changes how many may exist, and ``close()`` quits
+    everything.
+    """
+
+    def __init__(self, size: int = 1, profile_root: str = DEFAULT_PROFILE_ROOT, max_pages: int = 250,
+                 max_memory_mb: float = 2048, lean: bool = False, proxy_pool=None, warm_url: Optional[str] = None):
+        if size < 1:
+            raise ValueError("size must be at least 1")
+        self.size = size
+        self.profile_root = profile_root
+        self.max_pages = max_pages
+        self.max_memory_mb = max_memory_mb
+        # Measuring memory costs a process scan or a script call, so only every few pages
+        self.memory_check_every = 10
+        self.lean = lean
+        self.proxy_pool = proxy_pool
+        # Page a fresh session opens while warming, e.g. to pass the bot check early
+        self.warm_url = warm_url
+
+        self._condition = threading.Condition()
+        self._idle: List[DriverSession] = []
+        self._free_slots = list(range(size))
+        # Every slot that exists, whether free, idle or leased
+        self._slots = set(range(size))
+        # Slots to drop as soon as they come free, after resize() made the manager smaller
+        self._retiring = 0
+        self._closed = False
+        self.started = 0
+        self.recycled = 0
+        self.leases = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # --- Sessions --------------------------------------------------------------------
+
+    def _start(self, slot: int) -> DriverSession:
+        proxy = self.proxy_pool.acquire("browser") if self.proxy_pool else None
+        profile_dir = os.path.join(self.profile_root, f"worker_{slot}")
+        start = time.monotonic()
+        try:
+            with _driver_start_lock:
+                driver = setup_driver(user_data_dir=profile_dir, proxy=proxy, lean=self.lean)
+        except Exception:
+            if proxy:
+                self.proxy_pool.release(proxy)
+            raise
+        session = DriverSession(slot, driver, proxy)
+        if self.warm_url:
+            try:
+                driver.get(self.warm_url)
+            except Exception as e:
+                logger.warning(f"Warm-up page failed for browser {slot}: {e}")
+        with self._condition:
+            self.started += 1
+        logger.info(f"Started browser {slot}{f' via {proxy}' if proxy else ''} "
+                    f"in {time.monotonic() - start:.1f}s")
+        return session
+
+    def _quit(self, session: DriverSession):
+        try:
+            session.driver.quit()
+        except Exception:
+            pass
+        if session.proxy and self.proxy_pool:
+            self.proxy_pool.release(session.proxy)
+        self._free_slot(session.slot)
+
+    def _free_slot(self, slot: int):
+        with self._condition:
+            if self._retiring:
+                self._retiring -= 1
+                self._slots.discard(slot)
+            else:
+                self._free_slots.append(slot)
+                self._condition.notify()
+
+    def _recycle_reason(self, session: DriverSession) -> Optional[str]:
+        if session.discarded:
+            return "discarded"
+        if session.pages >= self.max_pages:
+            return f"{session.pages} pages served"
+        if session.proxy and self.proxy_pool and not self.proxy_pool.is_available(session.proxy):
+            return f"proxy {session.proxy} quarantined"
+        if not session.alive():
+            return "driver died"
+        if session.pages % self.memory_check_every == 0:
+            memory = session.memory_mb()
+            if memory is not None and memory > self.max_memory_mb:
+                return f"memory at {memory:.0f} MB"
+        return None
+
+    def acquire(self, timeout: Optional[float] = None) -> DriverSession:
+        """Take an idle session, start one in a free slot, or wait for one to come back.
+
+        Raises TimeoutError after ``timeout`` seconds and whatever
+        ``setup_driver`` raised if a browser could not be started.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise RuntimeError("DriverManager is closed")
+                if self._idle:
+                    session = self._idle.pop()
+                    self.leases += 1
+                    return session
+                if self._free_slots:
+                    slot = self._free_slots.pop(0)
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError("No browser session became free in time")
+                self._condition.wait(remaining)
+
+        try:
+            session = self._start(slot)
+        except Exception:
+            self._free_slot(slot)
+            raise
+        with self._condition:
+            self.leases += 1
+        return session
+
+    def release(self, session: DriverSession):
+        """Return a leased session, quitting it instead if it is due for recycling."""
+        session.pages += 1
+        reason = self._recycle_reason(session)
+        if reason is None:
+            with self._condition:
+                if self._closed:
+                    reason = "manager closed"
+                elif self._retiring:
+                    reason = "manager shrunk"
+                else:
+                    self._idle.append(session)
+                    self._condition.notify()
+                    return
+        if reason not in ("manager closed", "manager shrunk"):
+            logger.info(f"Recycling browser {session.slot}: {reason}")
+            with self._condition:
+                self.recycled += 1
+        self._quit(session)
+
+    @contextmanager
+    def lease(self, timeout: Optional[float] = None):
+        session = self.acquire(timeout)
+        try:
+            yield session
+        finally:
+            self.release(session)
+
+    def warm(self, count: int = 1) -> List[threading.Thread]:
+        """Start up to ``count`` sessions in background threads so later leases find them ready."""
+        threads = []
+        for _ in range(count):
+            with self._condition:
+                if self._closed or not self._free_slots:
+                    break
+                slot = self._free_slots.pop(0)
+            thread = threading.Thread(target=self._warm_slot, args=(slot,), name=f"driver-warm-{slot}", daemon=True)
+            thread.start()
+            threads.append(thread)
+        return threads
+
+    def _warm_slot(self, slot: int):
+        try:
+            session = self._start(slot)
+        except Exception as e:
+            logger.error(f"Could not warm browser {slot}: {e}")
+            self._free_slot(slot)
+            return
+        with self._condition:
+            closed = self._closed
+            if not closed:
+                self._idle.append(session)
+                self._condition.notify()
+        if closed:
+            self._quit(session)
+
+    def resize(self, size: int):
+        """Let up to ``size`` sessions exist from now on.
+
+        Growing adds free slots right away. Shrinking drops free slots first,
+        then idle sessions, and quits leased ones as they come back.
+        """
+        if size < 1:
+            raise ValueError("size must be at least 1")
+        dropped = []
+        with self._condition:
+            current = len(self._slots) - self._retiring
+            if size > current:
+                # Slots still waiting to be dropped are simply kept
+                kept = min(self._retiring, size - current)
+                self._retiring -= kept
+                current += kept
+                new_slots = (slot for slot in itertools.count() if slot not in self._slots)
+                for _ in range(size - current):
+                    slot = next(new_slots)
+                    self._slots.add(slot)
+                    self._free_slots.append(slot)
+                self._condition.notify_all()
+            surplus = current - size
+            while surplus > 0 and self._free_slots:
+                self._slots.discard(self._free_slots.pop())
+                surplus -= 1
+            while surplus > 0 and self._idle:
+                dropped.append(self._idle.pop(0))
+                surplus -= 1
+                self._retiring += 1
+            self._retiring += max(surplus, 0)
+            self.size = size
+        for session in dropped:
+            self._quit(session)
+
+    def close(self):
+        """Quit every idle session; sessions still leased are quit when they come back."""
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._condition.notify_all()
+        for session in idle:
+            self._quit(session)
+
+    def summary(self) -> str:
+        return f"Browsers: {self.started} started, {self.recycled} recycled, {self.leases} leases"
@@ -1,31 +1,69 @@
-import requests
-from bs4 import BeautifulSoup
-from selenium import webdriver
-import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+
+from driver_manager import DriverManager
 
 
 url = "https://parts.kia.com/a/Kia_2024_Sorento/_52022_12268602/WINDSHIELD-GLASS/AKMAPHY24_86-861.html?assemblySearchGuid=D9029FCD-1319-467D-8B51-6FBBD9FA14DE"
 
-def get_partnum(url = url):
-    parts_num = []
-    driver = webdriver.Chrome()
+def _partnums_from_page(driver, url: str, wait_time: int) -> Optional[List[str]]:
     driver.get(url)
-    time.sleep(5)  # wait for the page to load
+    # The keywords meta tag lists every part number on the assembly page
+    meta_tag = WebDriverWait(driver, wait_time).until(
+        EC.presence_of_element_located((By.ID, "ctl00_metaKeywords"))
+    )
+    content_str = meta_tag.get_attribute("content") or ""
+    return [item.strip() for item in content_str.split(",") if item.strip()]
 
-    soup = BeautifulSoup(driver.page_source, "html.parser")
-    meta_tag = soup.find("meta", attrs={"id": "ctl00_metaKeywords"})
+def get_partnums(urls: List[str], manager: Optional[DriverManager] = None, workers: int = 1,
+                 wait_time: int = 15) -> Dict[str, Optional[List[str]]]:
+    """Return ``{url: part numbers}`` for many assembly pages, None where the meta tag never showed up.
 
-    if meta_tag:
-        content_str = meta_tag["content"]
-        parts_list = [item.strip() for item in content_str.split(",") if item.strip()]
-        print(parts_list)
-        return parts_list
-        #print("Found content:", meta_tag["content"])
-    else:
-        print("Meta tag not found")
+    Browsers are leased from ``manager`` and stay warm between pages; without
+    one, a manager with ``workers`` browsers is created and closed afterwards.
+    """
+    own_manager = manager is None
+    if own_manager:
+        manager = DriverManager(size=workers, lean=True)
+
+    def fetch(page_url):
+        with manager.lease() as session:
+            try:
+                return page_url, _partnums_from_page(session.driver, page_url, wait_time)
+            except Exception as e:
+                print(f"Meta tag not found on {page_url}: {e}")
+                if not session.alive():
+                    session.discard()
+                return page_url, None
 
-    driver.quit()
-    
-     
-get_partnum(url = url)    
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, manager.size))) as executor:
+            return dict(executor.map(fetch, urls))
+    finally:
+        if own_manager:
+            manager.close()
 
+def get_partnum(url = url, manager: Optional[DriverManager] = None) -> Optional[List[str]]:
+    """Part numbers listed on one assembly page."""
+    return get_partnums([url], manager=manager)[url]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print the part numbers listed on Kia assembly pages")
+    parser.add_argument("urls", nargs="*", default=[url], help="Assembly page URLs (default: a sample page)")
+    parser.add_argument("--file", help="Text file with one assembly URL per line")
+    parser.add_argument("--workers", type=int, default=1, help="Browsers to use in parallel (default: 1)")
+    args = parser.parse_args()
+
+    urls = args.urls
+    if args.file:
+        with open(args.file, 'r') as f:
+            urls = [line.strip() for line in f if line.strip()]
+    for page_url, parts_list in get_partnums(urls, workers=args.workers).items():
+        print(page_url)
+        print(parts_list)
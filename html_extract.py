@@ -0,0 +1,184 @@
+from typing import Dict, List, Optional
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:  # lxml is optional, only needed for the "lxml" backend
+    lxml = None
+    etree = None
+
+DEFAULT_BASE_URL = "https://parts.kia.com"
+
+BACKENDS = ("bs4", "strainer", "lxml")
+DEFAULT_BACKEND = "bs4"
+
+_default_backend = DEFAULT_BACKEND
+
+
+def set_default_backend(backend: str):
+    """Select the backend used when callers do not ask for one."""
+    global _default_backend
+    _check_backend(backend)
+    _default_backend = backend
+
+
+def get_default_backend() -> str:
+    return _default_backend
+
+
+def _check_backend(backend: str):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown extraction backend {backend!r}, expected one of {', '.join(BACKENDS)}")
+    if backend == "lxml" and lxml is None:
+        raise ValueError("The lxml backend needs the lxml package: pip install lxml")
+
+
+# --- BeautifulSoup backends ---------------------------------------------------
+
+# Only build tree nodes for the part rows and the breadcrumb
+_PARTS_STRAINER = SoupStrainer(["li", "ol"], attrs={"class": ["assemblyProdDetails", "breadcrumb"]})
+_CARDS_STRAINER = SoupStrainer("div", attrs={"class": "assemblyCard"})
+
+
+def _soup_parts(soup, url: str, assembly_name: Optional[str], base_url: str) -> List[Dict]:
+    if assembly_name is None:
+        assembly_name = ""
+        breadcrumb = soup.select_one("ol.breadcrumb")
+        if breadcrumb:
+            crumbs = breadcrumb.find_all("li")
+            if crumbs:
+                assembly_name = crumbs[-1].get_text(" ", strip=True)
+
+    parts_data = []
+    for part in soup.find_all("li", class_="assemblyProdDetails"):
+        name_tag = part.find("div", class_="assemblyProductDescription")
+        number_tag = part.find("a", class_="btn btn-tertiary")
+        price_tag = part.find("div", class_="money-4")
+        qty_tag = part.find("input", {"class": "form-control input-sm text-center"})
+
+        parts_data.append({
+            "Assembly": assembly_name,
+            "Part Name": name_tag.get_text(strip=True) if name_tag else None,
+            "Part Number": number_tag.get_text(strip=True) if number_tag else None,
+            "Price": price_tag.get_text(strip=True).replace("(Current price)", "").strip() if price_tag else None,
+            "Quantity": qty_tag["value"] if qty_tag else None,
+            "Product URL": f"{base_url}{number_tag['href']}" if number_tag and number_tag.get('href') else None,
+            "Assembly URL": url
+        })
+    return parts_data
+
+
+def _soup_links(soup) -> List[str]:
+    hrefs = []
+    for card in soup.find_all('div', class_='assemblyCard'):
+        link = card.find('a', class_='assemblyCardLink')
+        if link and link.get('href'):
+            hrefs.append(link['href'])
+    return hrefs
+
+
+# --- lxml backend ---------------------------------------------------------------
+
+def _has_class(name: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+# BeautifulSoup's get_text() leaves out script/style/template strings
+_TEXT = ".//text()[not(ancestor::script or ancestor::style or ancestor::template)]"
+
+if etree is not None:
+    _XP_PARTS = etree.XPath(f"//li[{_has_class('assemblyProdDetails')}]")
+    _XP_BREADCRUMB_ITEMS = etree.XPath(f"(//ol[{_has_class('breadcrumb')}])[1]//li")
+    _XP_NAME = etree.XPath(f"(.//div[{_has_class('assemblyProductDescription')}])[1]")
+    # class_="btn btn-tertiary" in BeautifulSoup matches the whole attribute value
+    _XP_NUMBER = etree.XPath("(.//a[normalize-space(@class)='btn btn-tertiary'])[1]")
+    _XP_PRICE = etree.XPath(f"(.//div[{_has_class('money-4')}])[1]")
+    _XP_QTY = etree.XPath("(.//input[normalize-space(@class)='form-control input-sm text-center'])[1]")
+    _XP_TEXT = etree.XPath(_TEXT)
+    _XP_CARDS = etree.XPath(f"//div[{_has_class('assemblyCard')}]")
+    _XP_CARD_LINK = etree.XPath(f"(.//a[{_has_class('assemblyCardLink')}])[1]")
+
+
+def _lxml_text(element, separator: str = "") -> str:
+    return separator.join(s for s in (t.strip() for t in _XP_TEXT(element)) if s)
+
+
+def _lxml_tree(page_source: str):
+    # Parse bytes so pages that carry an XML encoding declaration are accepted
+    parser = lxml.html.HTMLParser(encoding="utf-8")
+    return lxml.html.document_fromstring(page_source.encode("utf-8"), parser=parser)
+
+
+def _first(xpath, element):
+    found = xpath(element)
+    return found[0] if found else None
+
+
+def _lxml_parts(page_source: str, url: str, assembly_name: Optional[str], base_url: str) -> List[Dict]:
+    tree = _lxml_tree(page_source)
+    if assembly_name is None:
+        crumbs = _XP_BREADCRUMB_ITEMS(tree)
+        assembly_name = _lxml_text(crumbs[-1], " ") if crumbs else ""
+
+    parts_data = []
+    for part in _XP_PARTS(tree):
+        name_tag = _first(_XP_NAME, part)
+        number_tag = _first(_XP_NUMBER, part)
+        price_tag = _first(_XP_PRICE, part)
+        qty_tag = _first(_XP_QTY, part)
+        href = number_tag.get("href") if number_tag is not None else None
+
+        parts_data.append({
+            "Assembly": assembly_name,
+            "Part Name": _lxml_text(name_tag) if name_tag is not None else None,
+            "Part Number": _lxml_text(number_tag) if number_tag is not None else None,
+            "Price": _lxml_text(price_tag).replace("(Current price)", "").strip() if price_tag is not None else None,
+            "Quantity": qty_tag.attrib["value"] if qty_tag is not None else None,
+            "Product URL": f"{base_url}{href}" if href else None,
+            "Assembly URL": url
+        })
+    return parts_data
+
+
+def _lxml_links(page_source: str) -> List[str]:
+    hrefs = []
+    for card in _XP_CARDS(_lxml_tree(page_source)):
+        link = _first(_XP_CARD_LINK, card)
+        if link is not None and link.get("href"):
+            hrefs.append(link.get("href"))
+    return hrefs
+
+
+# --- Public API ---------------------------------------------------------------------
+
+def extract_parts(page_source: str, url: str, assembly_name: Optional[str] = None,
+                  backend: Optional[str] = None, base_url: str = DEFAULT_BASE_URL) -> List[Dict]:
+    """Extract part rows from an assembly page.
+
+    All backends return the same list of dicts; ``assembly_name`` defaults to
+    the last breadcrumb item.
+    """
+    backend = backend or _default_backend
+    _check_backend(backend)
+    if backend == "lxml":
+        return _lxml_parts(page_source, url, assembly_name, base_url)
+    if backend == "strainer":
+        soup = BeautifulSoup(page_source, "html.parser", parse_only=_PARTS_STRAINER)
+    else:
+        soup = BeautifulSoup(page_source, "html.parser")
+    return _soup_parts(soup, url, assembly_name, base_url)
+
+
+def extract_assembly_links(page_source: str, backend: Optional[str] = None) -> List[str]:
+    """Return the ``a.assemblyCardLink`` hrefs of every ``div.assemblyCard`` on a category page."""
+    backend = backend or _default_backend
+    _check_backend(backend)
+    if backend == "lxml":
+        return _lxml_links(page_source)
+    if backend == "strainer":
+        soup = BeautifulSoup(page_source, "html.parser", parse_only=_CARDS_STRAINER)
+    else:
+        soup = BeautifulSoup(page_source, "html.parser")
+    return _soup_links(soup)
@@ -0,0 +1,194 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import timer
+from rate_limiter import get_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+# Cookies are exported from the warm browsers a DriverManager leases out (profiles
+# under .pw_user_undetected_workers/worker_N, or --profile-root), so the Cloudflare
+# clearance they earned can be reused by plain HTTP requests. The file itself is
+# kept outside those profiles, so every profile root of the machine shares it.
+DEFAULT_COOKIES_FILE = os.path.join(os.path.abspath(".pw_user_undetected"), "exported_cookies.json")
+
+DEFAULT_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"
+)
+
+# Markers found on Cloudflare interstitial / challenge pages
+CHALLENGE_MARKERS = (
+    "cf-chl",
+    "challenge-platform",
+    "cf_chl_opt",
+    "<title>Just a moment...</title>",
+    "Attention Required! | Cloudflare",
+)
+
+# The class attribute may be double-quoted, single-quoted or unquoted
+PARTS_MARKUP = re.compile(r'<li\b[^>]*\bclass\s*=\s*["\']?[^"\'>]*\bassemblyProdDetails\b', re.IGNORECASE)
+
+
+def is_challenge_page(status_code: int, headers, text: str) -> bool:
+    """Return True if the response looks like a Cloudflare challenge."""
+    if headers.get("cf-mitigated") == "challenge":
+        return True
+    if status_code in (403, 429, 503) and "cloudflare" in headers.get("Server", "").lower():
+        return True
+    head = text[:20000]
+    return any(marker in head for marker in CHALLENGE_MARKERS)
+
+
+def has_parts_markup(text: str) -> bool:
+    """Cheap check for ``li.assemblyProdDetails`` without building a parse tree."""
+    return PARTS_MARKUP.search(text) is not None
+
+
+class HttpPageFetcher:
+    """Fetch assembly pages over a pooled keep-alive session, reporting when a browser is needed."""
+
+    def __init__(self, cookies_file: str = DEFAULT_COOKIES_FILE, timeout: float = 20,
+                 pool_size: int = 10, proxy_pool=None):
+        self.cookies_file = cookies_file
+        self.timeout = timeout
+        # Optional ProxyPool; each request goes out through its healthiest proxy
+        self.proxy_pool = proxy_pool
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "User-Agent": DEFAULT_USER_AGENT,
+            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+            "Accept-Language": "en-US,en;q=0.9",
+        })
+
+        self._lock = threading.Lock()
+        self.http_hits = 0
+        self.challenges = 0
+        self.misses = 0
+
+        self.load_cookies()
+
+    def load_cookies(self) -> bool:
+        """Load cookies (and the matching user agent) previously exported from the browser."""
+        if not os.path.exists(self.cookies_file):
+            return False
+        try:
+            with open(self.cookies_file, 'r') as f:
+                exported = json.load(f)
+        except Exception as e:
+            logger.warning(f"Could not read exported cookies from {self.cookies_file}: {e}")
+            return False
+
+        self._apply(exported.get("cookies", []), exported.get("user_agent"))
+        logger.info(f"Loaded {len(exported.get('cookies', []))} browser cookies from {self.cookies_file}")
+        return True
+
+    def export_cookies(self, driver) -> None:
+        """Copy the driver's cookies and user agent into the session and persist them."""
+        try:
+            cookies = driver.get_cookies()
+            user_agent = driver.execute_script("return navigator.userAgent")
+        except Exception as e:
+            logger.warning(f"Could not export cookies from browser: {e}")
+            return
+
+        self._apply(cookies, user_agent)
+        try:
+            os.makedirs(os.path.dirname(self.cookies_file), exist_ok=True)
+            tmp_file = f"{self.cookies_file}.tmp"
+            with open(tmp_file, 'w') as f:
+                json.dump({"user_agent": user_agent, "cookies": cookies}, f)
+            os.replace(tmp_file, self.cookies_file)
+        except Exception as e:
+            logger.warning(f"Could not save exported cookies to {self.cookies_file}: {e}")
+
+    def _apply(self, cookies, user_agent: Optional[str]):
+        with self._lock:
+            for cookie in cookies:
+                self.session.cookies.set(
+                    cookie["name"], cookie["value"],
+                    domain=cookie.get("domain", ""), path=cookie.get("path", "/")
+                )
+            # Cloudflare ties its clearance cookie to the user agent that earned it
+            if user_agent:
+                self.session.headers["User-Agent"] = user_agent
+
+    def fetch(self, url: str) -> Optional[str]:
+        """Return the page HTML, or None if the page needs a real browser.
+
+        None is returned for challenge pages, pages without ``li.assemblyProdDetails``
+        and any network error.
+        """
+        proxy = self.proxy_pool.acquire("http") if self.proxy_pool else None
+        try:
+            return self._fetch(url, proxy)
+        finally:
+            if proxy:
+                self.proxy_pool.release(proxy)
+
+    def _fetch(self, url: str, proxy: Optional[str]) -> Optional[str]:
+        limiter = get_rate_limiter(url, via=proxy)
+        limiter.acquire()
+        start = time.monotonic()
+        try:
+            with timer("http_fetch"):
+                response = self.session.get(url, timeout=self.timeout,
+                                            proxies={"http": proxy, "https": proxy} if proxy else None)
+        except requests.Timeout as e:
+            logger.warning(f"HTTP fetch timed out for {url}: {e}")
+            limiter.record_backoff("HTTP timeout")
+            if proxy:
+                self.proxy_pool.record_failure(proxy, "timeout")
+            self._count("misses")
+            return None
+        except requests.RequestException as e:
+            logger.warning(f"HTTP fetch failed for {url}: {e}")
+            if proxy:
+                self.proxy_pool.record_failure(proxy, "connection error")
+            self._count("misses")
+            return None
+
+        latency = time.monotonic() - start
+        text = response.text
+        if is_challenge_page(response.status_code, response.headers, text):
+            logger.info(f"Challenge page over HTTP, falling back to browser: {url}")
+            limiter.record_backoff("challenge page")
+            if proxy:
+                self.proxy_pool.record_challenge(proxy, latency=latency)
+            self._count("challenges")
+            return None
+
+        if response.status_code == 429 or response.status_code >= 500:
+            limiter.record_backoff(f"HTTP {response.status_code}")
+            if proxy:
+                self.proxy_pool.record_failure(proxy, f"HTTP {response.status_code}", latency=latency)
+        elif proxy:
+            self.proxy_pool.record_success(proxy, latency=latency)
+
+        if response.status_code != 200 or not has_parts_markup(text):
+            logger.info(f"No parts markup over HTTP (status {response.status_code}), falling back to browser: {url}")
+            self._count("misses")
+            return None
+
+        limiter.record_success(latency)
+        self._count("http_hits")
+        return text
+
+    def _count(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def close(self):
+        self.session.close()
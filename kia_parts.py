@@ -1,12 +1,27 @@
 import os
+import argparse
 from navigate_kia_parts_undetected import KiaPartsScraper
-from scrape_kia_parts_undetected import scrape_parts_from_page, setup_driver
-import pandas as pd
-import json
+from worker_pool import ScraperWorkerPool
+from http_fetcher import HttpPageFetcher
+from rate_limiter import DEFAULT_LIMITS, set_default_limits
+from page_cache import PageCache
+from proxy_pool import DEFAULT_PROXIES_FILE, ProxyPool
+from lean_browser import PageLoadStats
+from driver_manager import DEFAULT_PROFILE_ROOT, DriverManager, claim_profile_root
+from metrics import enable_metrics, get_metrics, write_run_metrics
+from checkpoint import RunCheckpoint, write_part_outputs
+from html_extract import BACKENDS, DEFAULT_BACKEND, set_default_backend
+from columnar_output import write_columnar
+from run_delta import SnapshotStore
+from work_queue import WorkQueue
+from part_store import PartStore
+from parse_pool import ParsePool
+from retry_scheduler import RetryPolicy, set_breaker_defaults
+from scrape_kia_parts_undetected import EXTRACTION_MODES, parse_parts_from_html
 import logging
-from datetime import datetime
 import time
-import random
+from datetime import datetime
+from typing import Callable, Iterator, List, Optional
 
 def setup_logging(output_dir: str) -> logging.Logger:
     """Set up logging configuration."""
@@ -21,137 +36,510 @@ def setup_logging(output_dir: str) -> logging.Logger:
     )
     return logging.getLogger(__name__)
 
+def get_vin_directory(vin: str) -> str:
+    """Return the output directory path for a VIN without creating it."""
+    base_output_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "output")
+    return os.path.join(base_output_dir, vin)
+
 def create_vin_directory(vin: str) -> str:
     """Create directory structure for VIN and return the path."""
-    # Create main output directory if it doesn't exist
-    base_output_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "output")
-    os.makedirs(base_output_dir, exist_ok=True)
-    
-    # Create VIN-specific directory
-    vin_dir = os.path.join(base_output_dir, vin)
+    # Create VIN-specific directory (and the main output directory if needed)
+    vin_dir = get_vin_directory(vin)
     os.makedirs(vin_dir, exist_ok=True)
     
     return vin_dir
 
+def add_scrape_arguments(parser: argparse.ArgumentParser):
+    """Options shared by every entry point that scrapes parts pages."""
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of parallel browser workers for parts scraping (default: 1)")
+    parser.add_argument("--rate", type=float, default=0.2,
+                        help="Starting request rate per host in requests/sec (default: 0.2)")
+    parser.add_argument("--max-rate", type=float, default=1.0,
+                        help="Upper bound the adaptive rate limiter may reach (default: 1.0)")
+    parser.add_argument("--browser-only", action="store_true",
+                        help="Load every assembly page in Chrome instead of trying plain HTTP first")
+    parser.add_argument("--parser", choices=BACKENDS, default=DEFAULT_BACKEND,
+                        help="HTML extraction backend (default: bs4); see benchmark_extract.py")
+    parser.add_argument("--extract", choices=EXTRACTION_MODES, default="html",
+                        help="How rows are read from pages loaded in Chrome: html (page_source + parser), "
+                             "script (one in-page script), or compare (both, timings logged side by side)")
+    parser.add_argument("--parse-workers", type=int, default=0,
+                        help="Parse assembly and category pages in this many worker processes instead of the "
+                             "scraping threads (default: 0)")
+    parser.add_argument("--max-in-flight", type=int,
+                        help="Pages waiting for a parse worker before scraping pauses (default: twice "
+                             "--parse-workers)")
+    parser.add_argument("--cache-dir",
+                        help="Page cache directory (default: page_cache/ inside the output directory)")
+    parser.add_argument("--cache-ttl", type=float, default=168,
+                        help="Hours a cached page stays fresh (default: 168)")
+    parser.add_argument("--cache-max-mb", type=int, default=512,
+                        help="Page cache size cap in MB, least recently used pages are evicted first (default: 512)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Do not read or write the page cache")
+    parser.add_argument("--columnar", choices=["parquet", "arrow"],
+                        help="Also write a columnar copy of the parts data (needs pyarrow)")
+    parser.add_argument("--proxies", nargs="?", const=DEFAULT_PROXIES_FILE, metavar="FILE",
+                        help="Route browsers and HTTP fetches through a health-scored pool of the proxies in FILE "
+                             "(default: proxies.txt)")
+    parser.add_argument("--lean", action="store_true",
+                        help="Block images, fonts, media and trackers in Chrome and stop waiting for the load event; "
+                             "per-page bytes and time-to-selector are logged")
+    parser.add_argument("--load-stats", action="store_true",
+                        help="Log per-page bytes and time-to-selector without lean mode, as a baseline")
+    parser.add_argument("--profile-root", default=DEFAULT_PROFILE_ROOT, metavar="DIR",
+                        help="Directory for the browser workers' Chrome profiles "
+                             "(default: .pw_user_undetected_workers); when another process on this machine is "
+                             "using it, DIR_1, DIR_2... are used instead")
+    parser.add_argument("--browser-max-pages", type=int, default=250,
+                        help="Restart a browser after it has loaded this many pages (default: 250)")
+    parser.add_argument("--browser-max-memory", type=int, default=2048,
+                        help="Restart a browser once it uses more than this many MB (default: 2048)")
+    parser.add_argument("--delta", action="store_true",
+                        help="Store the run in snapshots/ as changes against the VIN's previous run instead of "
+                             "writing full CSV/JSON files (rebuild them with run_delta.py reconstruct; parts_index.py "
+                             "and consolidate.py read the store directly)")
+    parser.add_argument("--retries", type=int, default=2,
+                        help="Extra tries for a page that timed out or hit a challenge, after a jittered exponential "
+                             "delay; missing pages are not retried (default: 2)")
+    parser.add_argument("--retry-delay", type=float, default=5,
+                        help="Base retry delay in seconds, doubled on every further attempt (default: 5)")
+    parser.add_argument("--breaker-threshold", type=float, default=0.5,
+                        help="Pause all workers when this share of the last 20 pages failed (default: 0.5)")
+    parser.add_argument("--breaker-cooldown", type=float, default=60,
+                        help="Seconds to pause before a probe request checks whether the site is back (default: 60)")
+    parser.add_argument("--metrics", action="store_true",
+                        help="Time each scraping stage and count pages, parts, failures and retries; the run's "
+                             "numbers are logged and written to metrics_<run>.json and metrics_<run>.prom")
+
+def check_scrape_arguments(parser: argparse.ArgumentParser, args):
+    """Reject option values added by ``add_scrape_arguments`` that only fail once scraping has started."""
+    if not 0 < args.rate <= args.max_rate:
+        parser.error(f"--rate ({args.rate:g}) must be above 0 and at most --max-rate ({args.max_rate:g})")
+    if args.rate < DEFAULT_LIMITS["min_rate"]:
+        parser.error(f"--rate must be at least {DEFAULT_LIMITS['min_rate']:g} requests per second")
+
+def parse_args():
+    """Parse command line options."""
+    parser = argparse.ArgumentParser(description="Scrape Kia parts data for a VIN")
+    parser.add_argument("--vin", help="VIN number (prompted for if omitted)")
+    add_scrape_arguments(parser)
+    parser.add_argument("--offline", action="store_true",
+                        help="Rebuild the CSV/JSON outputs for an already scraped VIN from the page cache only")
+    parser.add_argument("--queue", metavar="DB",
+                        help="Work from a shared SQLite job queue so several processes or hosts can scrape one VIN: "
+                             "the first worker fills it with the VIN's assembly URLs, later ones lease URLs from it, "
+                             "and whichever finishes last writes the outputs")
+    parser.add_argument("--lease-seconds", type=float, default=600,
+                        help="How long a leased URL stays reserved for a worker that stopped reporting (default: 600)")
+    parser.add_argument("--max-attempts", type=int, default=3,
+                        help="Attempts per URL before the queue marks it failed (default: 3)")
+    args = parser.parse_args()
+    check_scrape_arguments(parser, args)
+    return args
+
+def open_page_cache(args, output_dir: str) -> PageCache:
+    """Create the page cache configured on the command line."""
+    cache_dir = args.cache_dir or os.path.join(output_dir, "page_cache")
+    return PageCache(cache_dir, ttl=args.cache_ttl * 3600, max_bytes=args.cache_max_mb * 1024 * 1024)
+
+def open_proxy_pool(args) -> Optional[ProxyPool]:
+    """Load the proxy pool given with ``--proxies`` and start re-probing quarantined proxies."""
+    if not args.proxies:
+        return None
+    proxy_pool = ProxyPool.from_file(args.proxies)
+    proxy_pool.start_probing()
+    logging.getLogger(__name__).info(f"Proxy pool: {proxy_pool.summary()}")
+    return proxy_pool
+
+def open_retry_policy(args) -> RetryPolicy:
+    """Retry policy for failed pages; also configures the per-host circuit breakers."""
+    set_breaker_defaults(failure_threshold=args.breaker_threshold, cooldown=args.breaker_cooldown)
+    return RetryPolicy(max_attempts=args.retries + 1, base_delay=args.retry_delay)
+
+def open_parse_pool(args) -> Optional[ParsePool]:
+    """Worker processes for HTML parsing when ``--parse-workers`` is given; open it before any other threads."""
+    if not args.parse_workers:
+        return None
+    parse_pool = ParsePool(args.parse_workers, args.max_in_flight)
+    logging.getLogger(__name__).info(f"Parsing pages in {parse_pool.workers} worker processes")
+    return parse_pool
+
+def open_driver_manager(args, proxy_pool: Optional[ProxyPool]) -> DriverManager:
+    """Browser sessions shared by discovery and the worker pool, one per worker, in this process's own profiles."""
+    return DriverManager(size=args.workers, profile_root=claim_profile_root(args.profile_root),
+                         max_pages=args.browser_max_pages, max_memory_mb=args.browser_max_memory, lean=args.lean,
+                         proxy_pool=proxy_pool)
+
+def page_load_stats(args, pages: str) -> Optional[PageLoadStats]:
+    """Collector for ``--lean``/``--load-stats`` page load reports, labelled with page type and mode."""
+    if not (args.lean or args.load_stats):
+        return None
+    return PageLoadStats(f"{pages}, {'lean' if args.lean else 'full'}")
+
+def write_columnar_copy(parts, csv_file: str, fmt: Optional[str], vin: str, logger: logging.Logger):
+    """Write the Parquet/Arrow file next to ``csv_file`` when ``--columnar`` was given."""
+    if not fmt:
+        return
+    columnar_file = f"{os.path.splitext(csv_file)[0]}.{fmt}"
+    try:
+        count = write_columnar(parts, columnar_file, vin=vin)
+    except RuntimeError as e:
+        logger.error(f"Skipping columnar output: {e}")
+        return
+    logger.info(f"Columnar data ({count} rows) saved to {columnar_file}")
+
+def record_delta(output_dir: str, run_id: str, records, logger: logging.Logger):
+    """Add a finished run's (index, url, parts) records to the VIN's snapshot store and log what changed."""
+    entry = SnapshotStore(output_dir).record_run(run_id, records)
+    logger.info(f"Stored run as {entry['kind']} snapshot: {entry['unchanged']}/{entry['assemblies']} assemblies "
+                f"unchanged, {entry['changed']} changed, {entry['new']} new, {entry['dropped']} dropped, "
+                f"{entry['price_changes']} price changes")
+
+def report_metrics(output_dir: str, run_id: str, logger: logging.Logger):
+    """Log the ``--metrics`` summary and write the JSON and Prometheus files for the run."""
+    metrics_files = write_run_metrics(output_dir, run_id)
+    if metrics_files:
+        logger.info(get_metrics().summary())
+        logger.info(f"Metrics saved to {metrics_files[0]} and {metrics_files[1]}")
+
+def log_run_stats(pool: ScraperWorkerPool, http_fetcher: Optional[HttpPageFetcher], page_cache: Optional[PageCache],
+                  proxy_pool: Optional[ProxyPool], drivers: DriverManager, logger: logging.Logger):
+    """Log how pages were fetched once the worker pool is done."""
+    if http_fetcher:
+        logger.info(f"HTTP fetch: {http_fetcher.http_hits} pages over HTTP, "
+                    f"{http_fetcher.challenges} challenges, {http_fetcher.misses} other browser fallbacks")
+    if page_cache:
+        logger.info(f"Page cache: {page_cache.hits} hits, {page_cache.misses} misses")
+    if proxy_pool:
+        logger.info(f"Proxy pool: {proxy_pool.summary()}")
+    if pool.load_stats:
+        logger.info(pool.load_stats.summary())
+    logger.info(drivers.summary())
+
+def work_through_queue(work_queue: WorkQueue, queue_name: str, pool: ScraperWorkerPool, logger: logging.Logger):
+    """Lease URLs in small batches and scrape them with ``pool`` until none are left pending."""
+    while True:
+        jobs = work_queue.lease(queue_name, pool.num_workers * 2)
+        if not jobs:
+            return
+        open_jobs = {job.url: job for job in jobs}
+        
+        def on_result(index, url, parts_data):
+            job = open_jobs.pop(url)
+            if parts_data:
+                work_queue.complete(job, parts_data)
+            else:
+                state = work_queue.fail(job, "no part rows")
+                logger.warning(f"No data scraped from {url} (attempt {job.attempts}/{work_queue.max_attempts}, "
+                               f"now {state})")
+            # A slow batch must not lose the URLs it has not reached yet to another worker
+            work_queue.renew(list(open_jobs.values()))
+        
+        pool.run([job.url for job in jobs], on_result=on_result, keep_results=False)
+        logger.info(work_queue.summary(queue_name))
+
+def finish_queue_run(work_queue: WorkQueue, vin: str, output_dir: str, args, logger: logging.Logger):
+    """Write the VIN's outputs from the queue if this worker is the one that drained it."""
+    if not work_queue.claim_finalize(vin):
+        logger.info(f"{work_queue.summary(vin)}; the worker that finishes last writes the outputs")
+        return
+    run_id = work_queue.run_id(vin)
+    output_file = os.path.join(output_dir, f"kia_parts_data_{run_id}.csv")
+    counts = work_queue.counts(vin)
+    if counts["done"]:
+        write_columnar_copy(work_queue.iter_parts(vin), output_file, args.columnar, vin, logger)
+        if args.delta:
+            record_delta(output_dir, run_id, work_queue.iter_records(vin), logger)
+        else:
+            count = write_part_outputs(work_queue.iter_parts(vin), output_file,
+                                       os.path.join(output_dir, f"kia_parts_compressed_{run_id}.csv"),
+                                       os.path.join(output_dir, f"kia_parts_data_{run_id}.json"))
+            logger.info(f"Final data ({count} parts) saved to {output_file} and its compressed/JSON copies")
+    
+    failed = work_queue.failed(vin)
+    if failed:
+        failed_file = os.path.join(output_dir, "failed_urls.txt")
+        with open(failed_file, 'w') as f:
+            for url, _, _ in failed:
+                f.write(f"{url}\n")
+        logger.warning(f"{len(failed)} URLs failed after {work_queue.max_attempts} attempts, saved to {failed_file} "
+                       f"(python work_queue.py {args.queue} retry {vin} puts them back)")
+    logger.info(f"Queue run {run_id} finished: {work_queue.summary(vin)}")
+
+def stream_assembly_urls(link_scraper: KiaPartsScraper, category_links: List[str], urls_file: str,
+                         on_done: Callable[[], None], logger: logging.Logger,
+                         on_saved: Optional[Callable[[], None]] = None,
+                         on_page: Optional[Callable[[], None]] = None) -> Iterator[str]:
+    """Yield assembly URLs as each category page is parsed, so workers can start before discovery ends.
+
+    The list is written to ``urls_file`` only once every category page has
+    been read, so an interrupted discovery is never mistaken for a complete
+    one when resuming. ``on_page`` runs for every category page read,
+    ``on_saved`` once the list is written, and ``on_done`` when the
+    generator finishes or is closed, e.g. to hand the discovery browser back
+    to the workers.
+    """
+    partial_file = f"{urls_file}.partial"
+    count = 0
+    try:
+        with open(partial_file, 'w') as f:
+            for category_url, assembly_urls in link_scraper.iter_category_pages(category_links):
+                if on_page:
+                    on_page()
+                f.write("".join(f"{url}\n" for url in assembly_urls))
+                f.flush()
+                count += len(assembly_urls)
+                logger.info(f"Discovered {count} assembly URLs so far ({category_url})")
+                yield from assembly_urls
+        os.replace(partial_file, urls_file)
+        logger.info(f"Saved {count} assembly URLs to {urls_file}")
+        if on_saved:
+            on_saved()
+    finally:
+        on_done()
+
+def reparse_from_cache(vin: str, args):
+    """Offline mode: rebuild a VIN's outputs from cached pages without opening a browser."""
+    output_dir = create_vin_directory(vin)
+    logger = setup_logging(output_dir)
+    
+    urls_file = os.path.join(output_dir, "assembly_urls.txt")
+    if not os.path.exists(urls_file):
+        logger.error(f"No {urls_file}; run a normal scrape for this VIN first")
+        return
+    with open(urls_file, 'r') as f:
+        assembly_urls = [line.strip() for line in f if line.strip()]
+    
+    cache = open_page_cache(args, output_dir)
+    all_parts_data = PartStore()
+    missing = 0
+    parse_pool = open_parse_pool(args)
+    try:
+        for url in assembly_urls:
+            # Stale pages are still better than nothing when re-parsing offline
+            page_source = cache.get(url, allow_stale=True)
+            if page_source is None:
+                missing += 1
+                logger.warning(f"Not in page cache: {url}")
+                continue
+            if parse_pool is None:
+                all_parts_data.extend(parse_parts_from_html(page_source, url))
+                continue
+            # Workers parse while the next page is read from the cache; rows are kept in URL order
+            parse_pool.submit_parts(url, page_source, url)
+            for _, parts_data in parse_pool.completed():
+                all_parts_data.extend(parts_data)
+        if parse_pool is not None:
+            for _, parts_data in parse_pool.completed(wait=True):
+                all_parts_data.extend(parts_data)
+    finally:
+        if parse_pool is not None:
+            parse_pool.close()
+    
+    logger.info(f"Re-parsed {len(assembly_urls) - missing}/{len(assembly_urls)} assembly pages from cache, "
+                f"{len(all_parts_data)} parts")
+    if all_parts_data:
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        output_file = os.path.join(output_dir, f"kia_parts_data_{timestamp}.csv")
+        compressed_file = os.path.join(output_dir, f"kia_parts_compressed_{timestamp}.csv")
+        json_file = os.path.join(output_dir, f"kia_parts_data_{timestamp}.json")
+        write_part_outputs(all_parts_data, output_file, compressed_file, json_file)
+        logger.info(f"Rebuilt outputs: {output_file}, {compressed_file}, {json_file}")
+        write_columnar_copy(all_parts_data, output_file, args.columnar, vin, logger)
+
 def main():
+    args = parse_args()
+
     # Get VIN from user
-    vin = input("Please enter the VIN number: ").strip()
+    vin = (args.vin or input("Please enter the VIN number: ")).strip()
     if not vin:
         print("VIN number is required.")
         return
     
+    set_default_backend(args.parser)
+    if args.metrics:
+        enable_metrics()
+    
+    if args.offline:
+        reparse_from_cache(vin, args)
+        return
+    
     # Initialize KiaPartsScraper first to validate VIN
+    run_start = time.monotonic()
     logger = logging.getLogger(__name__)
     logger.info(f"Starting process for VIN: {vin}")
     
+    set_default_limits(initial_rate=args.rate, max_rate=args.max_rate)
+    parse_pool = open_parse_pool(args)
+    proxy_pool = open_proxy_pool(args)
+    http_fetcher = None if args.browser_only else HttpPageFetcher(proxy_pool=proxy_pool)
+    drivers = open_driver_manager(args, proxy_pool)
+    retry_policy = open_retry_policy(args)
+    work_queue = (WorkQueue(args.queue, lease_seconds=args.lease_seconds, max_attempts=args.max_attempts)
+                  if args.queue else None)
+    # Set once scraping starts, so a URL list saved by discovery can be tied to this run
+    checkpoint = None
+    
+    def url_list_saved():
+        if checkpoint is not None:
+            checkpoint.mark_url_list_saved()
+    
     try:
-        # Step 1: Use KiaPartsScraper to get assembly URLs and validate VIN
-        logger.info("Initializing KIA parts scraper...")
-        link_scraper = KiaPartsScraper()
-        
-        try:
-            # Search for VIN and get model URL
-            logger.info("Searching for VIN...")
-            model_url = link_scraper.search_vin(vin)
-            
-            # Only create directory if VIN is valid
-            if not model_url:
-                logger.error("Invalid VIN: Could not find vehicle with provided VIN")
-                return
-                
-            # Create VIN-specific directory after validation
+        vin_dir = get_vin_directory(vin)
+        urls_file = os.path.join(vin_dir, "assembly_urls.txt")
+        if work_queue and work_queue.exists(vin):
+            # Another worker already discovered this VIN; help work through its queue
             output_dir = create_vin_directory(vin)
-            
-            # Set up file logging now that we have a valid directory
             logger = setup_logging(output_dir)
-            logger.info(f"VIN validated successfully. Created output directory.")
-            
-            if not model_url:
-                logger.error("Could not find vehicle with provided VIN")
-                return
-            
-            # Generate and scrape category links
-            logger.info("Generating category links...")
-            category_links = link_scraper.generate_category_links(model_url)
+            assembly_urls = []
+            logger.info(f"Joining {args.queue}: {work_queue.summary(vin)}")
+            page_cache = None if args.no_cache else open_page_cache(args, output_dir)
+        elif not work_queue and RunCheckpoint.is_resumable(vin_dir, with_url_list=True) and os.path.exists(urls_file):
+            # An unfinished run for this VIN that finished discovery: reuse its assembly URLs
+            output_dir = vin_dir
+            logger = setup_logging(output_dir)
+            with open(urls_file, 'r') as f:
+                assembly_urls = [line.strip() for line in f if line.strip()]
+            logger.info(f"Resuming unfinished run with {len(assembly_urls)} assembly URLs from {urls_file}")
+            page_cache = None if args.no_cache else open_page_cache(args, output_dir)
+        else:
+            # Step 1: Use KiaPartsScraper to get assembly URLs and validate VIN
+            logger.info("Initializing KIA parts scraper...")
+            # Discovery gets a browser of its own while it streams URLs, so the workers' browsers stay
+            # free; afterwards it stays warm for the first worker that has not started one yet
+            drivers.resize(args.workers + 1)
+            session = drivers.acquire()
+            category_stats = page_load_stats(args, "category")
+            link_scraper = KiaPartsScraper(proxy=session.proxy, lean=args.lean, load_stats=category_stats,
+                                           driver=session.driver, retry_policy=retry_policy,
+                                           parse_pool=parse_pool)
             
-            logger.info("Scraping assembly URLs...")
-            assembly_urls = link_scraper.scrape_category_pages(category_links)
+            def finish_discovery():
+                link_scraper.close()
+                drivers.release(session)
+                drivers.resize(args.workers)
+                if category_stats:
+                    logger.info(category_stats.summary())
             
-            # Save assembly URLs to VIN-specific directory
-            urls_file = os.path.join(output_dir, "assembly_urls.txt")
-            with open(urls_file, 'w') as f:
-                for url in assembly_urls:
-                    f.write(f"{url}\n")
-            logger.info(f"Saved {len(assembly_urls)} assembly URLs to {urls_file}")
+            def count_category_page():
+                session.pages += 1
             
-        finally:
-            link_scraper.close()
+            handed_over = False
+            try:
+                # Search for VIN and get model URL
+                logger.info("Searching for VIN...")
+                model_url = link_scraper.search_vin(vin)
+                
+                # Only create directory if VIN is valid
+                if not model_url:
+                    logger.error("Invalid VIN: Could not find vehicle with provided VIN")
+                    return
+                    
+                # Create VIN-specific directory after validation
+                output_dir = create_vin_directory(vin)
+                
+                # Set up file logging now that we have a valid directory
+                logger = setup_logging(output_dir)
+                logger.info(f"VIN validated successfully. Created output directory.")
+                
+                if not model_url:
+                    logger.error("Could not find vehicle with provided VIN")
+                    return
+                
+                page_cache = None if args.no_cache else open_page_cache(args, output_dir)
+                link_scraper.cache = page_cache
+                
+                # Only the categories the model page links to are crawled
+                logger.info("Reading category links from the model page...")
+                category_links = link_scraper.discover_category_links(model_url)
+                # The model page; category pages are counted as discovery reads them
+                session.pages += 1
+                
+                # Reuse the discovery browser's session cookies for plain HTTP fetches
+                if http_fetcher:
+                    http_fetcher.export_cookies(link_scraper.driver)
+                
+                # Steps 1 and 2 overlap: assembly URLs reach the workers as each category page is parsed
+                logger.info("Scraping assembly URLs...")
+                assembly_urls = stream_assembly_urls(link_scraper, category_links,
+                                                     os.path.join(output_dir, "assembly_urls.txt"),
+                                                     finish_discovery, logger, on_saved=url_list_saved,
+                                                     on_page=count_category_page)
+                handed_over = True
+                
+            finally:
+                if not handed_over:
+                    finish_discovery()
+        
+        pool = ScraperWorkerPool(num_workers=args.workers, http_fetcher=http_fetcher, page_cache=page_cache,
+                                 extraction_mode=args.extract, proxy_pool=proxy_pool, lean=args.lean,
+                                 load_stats=page_load_stats(args, "assembly"), driver_manager=drivers,
+                                 retry_policy=retry_policy, parse_pool=parse_pool)
+        
+        if work_queue:
+            # Step 2, shared: the queue replaces the local run log and ledger
+            assembly_urls = list(assembly_urls)
+            if assembly_urls:
+                added = work_queue.add(vin, assembly_urls)
+                logger.info(f"Queued {added} assembly URLs in {args.queue}")
+            logger.info(f"Working through the queue with {args.workers} worker(s)...")
+            work_through_queue(work_queue, vin, pool, logger)
+            log_run_stats(pool, http_fetcher, page_cache, proxy_pool, drivers, logger)
+            finish_queue_run(work_queue, vin, output_dir, args, logger)
+            report_metrics(output_dir, f"{work_queue.run_id(vin)}_{os.getpid()}", logger)
+            return
         
         # Step 2: Use scraping functionality to get parts data
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        output_file = os.path.join(output_dir, f"kia_parts_data_{timestamp}.csv")
-        compressed_file = os.path.join(output_dir, f"kia_parts_compressed_{timestamp}.csv")
+        checkpoint = RunCheckpoint(output_dir)
+        output_paths = checkpoint.output_paths()
         
-        all_parts_data = []
-        successful_urls = set()
+        successful_urls = set(checkpoint.completed_urls)
         failed_urls = set()
+        completed = len(successful_urls)
+        first_parts = False
         
-        logger.info("Starting parts data scraping...")
-        driver = setup_driver()
+        def on_result(index, url, parts_data):
+            nonlocal completed, first_parts
+            completed += 1
+            if parts_data:
+                checkpoint.record(index, url, parts_data)
+                successful_urls.add(url)
+                if not first_parts:
+                    first_parts = True
+                    logger.info(f"First parts scraped {time.monotonic() - run_start:.1f}s after start")
+            else:
+                failed_urls.add(url)
+                logger.warning(f"No data scraped from {url}")
+            
+            if completed % 5 == 0:
+                # While discovery is still running, the total is what it has found so far
+                logger.info(f"Progress: {completed}/{len(pool.results)} URLs processed")
         
+        logger.info(f"Starting parts data scraping with {args.workers} worker(s), "
+                    f"{completed} URLs already done...")
         try:
-            # Process each assembly URL
-            total_urls = len(assembly_urls)
-            for i, url in enumerate(assembly_urls, 1):
-                try:
-                    logger.info(f"Processing URL {i}/{total_urls}")
-                    parts_data = scrape_parts_from_page(driver, url)
-                    
-                    if parts_data:
-                        all_parts_data.extend(parts_data)
-                        successful_urls.add(url)
-                        
-                        # Save progress periodically (every 5 URLs)
-                        if i % 5 == 0:
-                            df = pd.DataFrame(all_parts_data)
-                            df.to_csv(output_file, index=False)
-                            # Also save the compressed version
-                            compressed_df = df[['Assembly', 'Part Name', 'Part Number']].copy()
-                            compressed_df.to_csv(compressed_file, index=False)
-                            logger.info(f"Progress saved: {i}/{total_urls} URLs processed")
-                    else:
-                        failed_urls.add(url)
-                        logger.warning(f"No data scraped from {url}")
-                    
-                    # Random delay between requests (3-7 seconds)
-                    delay = 3 + random.random() * 4
-                    time.sleep(delay)
-                    
-                except Exception as e:
-                    logger.error(f"Failed to process URL {url}: {e}")
-                    failed_urls.add(url)
-                    continue
-                    
+            pool.run(assembly_urls, on_result=on_result, skip=checkpoint.completed_urls, keep_results=False)
         finally:
-            driver.quit()
+            checkpoint.close()
+        total_urls = len(pool.results)
+        logger.info(f"Discovery and scraping took {time.monotonic() - run_start:.1f}s")
         
-        # Save final results
-        if all_parts_data:
-            # Save full data to CSV
-            df = pd.DataFrame(all_parts_data)
-            df.to_csv(output_file, index=False)
-            logger.info(f"Final data saved to {output_file}")
-            
-            # Save compressed version
-            compressed_df = df[['Assembly', 'Part Name', 'Part Number']].copy()
-            compressed_df.to_csv(compressed_file, index=False)
-            logger.info(f"Compressed data saved to {compressed_file}")
-            
-            # Save as JSON for backup
-            json_file = os.path.join(output_dir, f"kia_parts_data_{timestamp}.json")
-            with open(json_file, 'w') as f:
-                json.dump(all_parts_data, f, indent=4)
-            logger.info(f"Backup JSON saved to {json_file}")
+        log_run_stats(pool, http_fetcher, page_cache, proxy_pool, drivers, logger)
+        
+        # Save final results, streamed from the record log in assembly URL order
+        if successful_urls:
+            write_columnar_copy(checkpoint.iter_parts(), output_paths['csv'], args.columnar, vin, logger)
+            if args.delta:
+                record_delta(output_dir, checkpoint.run_id, checkpoint.iter_records(), logger)
+        # A delta run's log is dropped here, its rows now live in snapshots/
+        parts_count = checkpoint.finalize(write_outputs=not args.delta)
+        wrote_outputs = parts_count and not args.delta
+        if wrote_outputs:
+            logger.info(f"Final data saved to {output_paths['csv']}")
+            logger.info(f"Compressed data saved to {output_paths['compressed']}")
+            logger.info(f"Backup JSON saved to {output_paths['json']}")
         
         # Save failed URLs if any
         if failed_urls:
@@ -169,16 +557,27 @@ def main():
         Total URLs: {total_urls}
         Successfully scraped: {len(successful_urls)}
         Failed: {len(failed_urls)}
-        Total parts collected: {len(all_parts_data)}
+        Total parts collected: {parts_count}
         Output directory: {output_dir}
-        Output CSV: {output_file}
-        Compressed CSV: {compressed_file}
-        Output JSON: {json_file if all_parts_data else 'N/A'}
+        Output CSV: {output_paths['csv'] if wrote_outputs else 'N/A'}
+        Compressed CSV: {output_paths['compressed'] if wrote_outputs else 'N/A'}
+        Output JSON: {output_paths['json'] if wrote_outputs else 'N/A'}
         """)
+        report_metrics(output_dir, checkpoint.run_id, logger)
         
     except Exception as e:
         logger.error(f"Critical error in main process: {e}")
         raise
+    finally:
+        drivers.close()
+        if http_fetcher:
+            http_fetcher.close()
+        if proxy_pool:
+            proxy_pool.stop()
+        if parse_pool:
+            parse_pool.close()
+        if work_queue:
+            work_queue.close()
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,91 @@
+import logging
+import threading
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Patterns for Chrome's Network.setBlockedURLs ("*" matches anything). Only
+# what the scraper never reads is blocked: images, fonts, media and
+# analytics/ad scripts. Documents, first-party scripts and stylesheets still
+# load, and nothing served from Cloudflare's challenge paths matches, so the
+# bot check keeps working. If a challenge page shows up anyway, blocking is
+# lifted for that browser (see relax_blocking).
+LEAN_BLOCKED_URLS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.bmp", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*.mp4", "*.webm", "*.mp3",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*", "*googleadservices.com*",
+    "*facebook.net*", "*facebook.com/tr*", "*bat.bing.com*", "*hotjar.com*", "*clarity.ms*",
+    "*newrelic.com*", "*nr-data.net*", "*criteo*", "*adsrvr.org*", "*pinterest.com*", "*tiktok.com*",
+]
+
+# Sums transfer sizes from the Resource Timing API. Cross-origin responses
+# without Timing-Allow-Origin report 0 bytes, and blocked requests never
+# appear, so this is a lower bound of what went over the wire.
+PAGE_TRANSFER_SCRIPT = """
+var nav = performance.getEntriesByType('navigation')[0];
+var resources = performance.getEntriesByType('resource');
+var bytes = nav ? nav.transferSize : 0;
+for (var i = 0; i < resources.length; i++) bytes += resources[i].transferSize || 0;
+return [bytes, resources.length + 1];
+"""
+
+
+def enable_lean_mode(driver) -> bool:
+    """Start blocking LEAN_BLOCKED_URLS in ``driver`` over CDP; returns False if CDP is unavailable."""
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": LEAN_BLOCKED_URLS})
+    except Exception as e:
+        logger.warning(f"Lean mode unavailable, loading full pages: {e}")
+        return False
+    return True
+
+
+def relax_blocking(driver):
+    """Stop blocking anything, e.g. after a challenge page appeared in lean mode."""
+    try:
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": []})
+        logger.warning("Challenge page in lean mode, resource blocking lifted for this browser")
+    except Exception as e:
+        logger.warning(f"Could not lift resource blocking: {e}")
+
+
+def page_transfer(driver) -> Optional[Dict]:
+    """Bytes transferred and request count for the current page, or None if unavailable."""
+    try:
+        transferred, requests = driver.execute_script(PAGE_TRANSFER_SCRIPT)
+    except Exception:
+        return None
+    return {"bytes": int(transferred or 0), "requests": int(requests or 0)}
+
+
+class PageLoadStats:
+    """Per-page load reports (bytes transferred, time to selector) and their running totals."""
+
+    def __init__(self, label: str = "full"):
+        self.label = label
+        self._lock = threading.Lock()
+        self.pages = 0
+        self.bytes = 0
+        self.requests = 0
+        self.selector_seconds = 0.0
+
+    def add(self, url: str, selector_seconds: float, transfer: Optional[Dict]):
+        transferred = transfer["bytes"] if transfer else 0
+        requests = transfer["requests"] if transfer else 0
+        with self._lock:
+            self.pages += 1
+            self.bytes += transferred
+            self.requests += requests
+            self.selector_seconds += selector_seconds
+        logger.info(f"Page load ({self.label}): {transferred / 1024:.0f} KB in {requests} requests, "
+                    f"selector after {selector_seconds * 1000:.0f} ms: {url}")
+
+    def summary(self) -> str:
+        with self._lock:
+            if not self.pages:
+                return f"Page loads ({self.label}): none"
+            return (f"Page loads ({self.label}): {self.pages} pages, "
+                    f"{self.bytes / self.pages / 1024:.0f} KB and {self.requests / self.pages:.0f} requests per page, "
+                    f"selector after {self.selector_seconds / self.pages * 1000:.0f} ms on average")
@@ -0,0 +1,219 @@
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+from typing import Dict, List, Optional, Tuple
+
+PREFIX = "kia_parts"
+
+# Upper bounds in seconds for the stage latency histograms. Stages range from
+# sub-millisecond parses to page loads that wait out a 30 second timeout.
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+COUNTER_HELP = {
+    "pages": "Assembly pages scraped, by where the page came from.",
+    "parts": "Part rows extracted.",
+    "failures": "Pages or steps that failed, by stage.",
+    "retries": "Pages tried again, by reason.",
+    "category_pages": "Category pages scanned for assembly links.",
+    "circuit_breaker_trips": "Times a host's circuit breaker opened and paused all workers, by host.",
+}
+
+
+class Histogram:
+    """Fixed-bucket latency histogram, the same shape Prometheus expects."""
+
+    def __init__(self, bounds=STAGE_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        index = 0
+        for bound in self.bounds:
+            if seconds <= bound:
+                break
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the ``q`` quantile (the max for the overflow bucket)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self) -> Dict:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "max": round(self.max, 6),
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "buckets": {str(bound): count for bound, count in zip(self.bounds, self.counts)},
+            "overflow": self.counts[-1],
+        }
+
+
+class _StageTimer:
+    __slots__ = ("metrics", "stage", "start")
+
+    def __init__(self, metrics: "Metrics", stage: str):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+    """Per-stage latency histograms and labelled counters for one run."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._start = time.monotonic()
+        self._lock = threading.Lock()
+        self.stages: Dict[str, Histogram] = {}
+        self.counters: Dict[Tuple[str, Tuple], float] = {}
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = Histogram()
+            histogram.observe(seconds)
+
+    def timer(self, stage: str) -> _StageTimer:
+        return _StageTimer(self, stage)
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            counters: Dict[str, List[Dict]] = {}
+            for (name, labels), value in sorted(self.counters.items()):
+                counters.setdefault(name, []).append({"labels": dict(labels), "value": value})
+            return {
+                "started_at": self.started_at,
+                "duration_seconds": round(time.monotonic() - self._start, 3),
+                "stages": {stage: histogram.to_dict() for stage, histogram in sorted(self.stages.items())},
+                "counters": counters,
+            }
+
+    def write_json(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=4)
+
+    def write_prometheus(self, path: str):
+        """Write the run in the Prometheus text exposition format, e.g. for node_exporter's textfile collector."""
+        lines = [
+            f"# HELP {PREFIX}_run_duration_seconds Wall-clock length of the run.",
+            f"# TYPE {PREFIX}_run_duration_seconds gauge",
+            f"{PREFIX}_run_duration_seconds {time.monotonic() - self._start:.3f}",
+            f"# HELP {PREFIX}_stage_seconds Time spent in each scraping stage.",
+            f"# TYPE {PREFIX}_stage_seconds histogram",
+        ]
+        with self._lock:
+            for stage, histogram in sorted(self.stages.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.bounds, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{PREFIX}_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{PREFIX}_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{PREFIX}_stage_seconds_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+                lines.append(f'{PREFIX}_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+
+            counters: Dict[str, List[str]] = {}
+            for (name, labels), value in sorted(self.counters.items()):
+                label_text = ",".join(f'{key}="{val}"' for key, val in labels)
+                sample = f"{PREFIX}_{name}_total{{{label_text}}}" if label_text else f"{PREFIX}_{name}_total"
+                counters.setdefault(name, []).append(f"{sample} {value:g}")
+        for name, samples in counters.items():
+            lines.append(f"# HELP {PREFIX}_{name}_total {COUNTER_HELP.get(name, name)}")
+            lines.append(f"# TYPE {PREFIX}_{name}_total counter")
+            lines.extend(samples)
+
+        with open(path, 'w') as f:
+            f.write("\n".join(lines) + "\n")
+
+    def summary(self) -> str:
+        """Multi-line table of stage timings followed by the counters."""
+        data = self.to_dict()
+        lines = [f"Run metrics ({data['duration_seconds']:.1f}s):"]
+        for stage, histogram in data["stages"].items():
+            lines.append(f"  {stage:<18} {histogram['count']:>7} calls  total {histogram['sum']:9.2f}s  "
+                         f"p50 <= {histogram['p50'] * 1000:7.0f} ms  p95 <= {histogram['p95'] * 1000:7.0f} ms  "
+                         f"max {histogram['max'] * 1000:7.0f} ms")
+        for name, samples in data["counters"].items():
+            values = ", ".join(
+                f"{','.join(f'{k}={v}' for k, v in sample['labels'].items()) or 'total'} {sample['value']:g}"
+                for sample in samples
+            )
+            lines.append(f"  {name}: {values}")
+        return "\n".join(lines)
+
+
+# Disabled unless enable_metrics() is called; the helpers below then cost one
+# global lookup and a None check per call.
+_metrics: Optional[Metrics] = None
+_NULL_TIMER = nullcontext()
+
+
+def enable_metrics() -> Metrics:
+    """Start recording for this process and return the registry (an existing one is kept)."""
+    global _metrics
+    if _metrics is None:
+        _metrics = Metrics()
+    return _metrics
+
+
+def get_metrics() -> Optional[Metrics]:
+    return _metrics
+
+
+def timer(stage: str):
+    """``with timer("driver_get"):`` adds the block's duration to that stage's histogram."""
+    if _metrics is None:
+        return _NULL_TIMER
+    return _StageTimer(_metrics, stage)
+
+
+def observe(stage: str, seconds: float):
+    if _metrics is not None:
+        _metrics.observe(stage, seconds)
+
+
+def inc(name: str, amount: float = 1, **labels):
+    if _metrics is not None:
+        _metrics.inc(name, amount, **labels)
+
+
+def write_run_metrics(output_dir: str, run_id: str) -> Optional[Tuple[str, str]]:
+    """Write ``metrics_<run_id>.json`` and ``.prom`` into ``output_dir``; None when metrics are off."""
+    if _metrics is None:
+        return None
+    json_file = os.path.join(output_dir, f"metrics_{run_id}.json")
+    prom_file = os.path.join(output_dir, f"metrics_{run_id}.prom")
+    _metrics.write_json(json_file)
+    _metrics.write_prometheus(prom_file)
+    return json_file, prom_file
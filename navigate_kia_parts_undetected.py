@@ -2,20 +2,60 @@ import undetected_chromedriver as uc
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from bs4 import BeautifulSoup
+from html_extract import extract_assembly_links
 import time
 import os
 import re
-import random
+from rate_limiter import get_rate_limiter
+from lean_browser import enable_lean_mode, page_transfer
+from metrics import inc, timer
+from retry_scheduler import PERMANENT, RetryPolicy, classify_page_failure, get_circuit_breaker
+
+BASE_URL = "https://parts.kia.com"
+
+# Every model's parts are split over these category pages
+CATEGORIES = [
+    "Body-and-Trim",
+    "Chassis",
+    "Electric",
+    "Engine-and-Motor",
+    "Transmission"
+]
+
 
 class KiaPartsScraper:
-    def __init__(self):
-        self.setup_driver()
+    def __init__(self, cache=None, proxy=None, lean=False, load_stats=None, driver=None, base_url=BASE_URL,
+                 retry_policy=None, parse_pool=None):
+        # Site root, e.g. a local stand-in site (see standin_site.py) instead of parts.kia.com
+        self.base_url = base_url.rstrip("/")
+        # How often a failed VIN search is tried again, and how long to wait in between
+        self.retry_policy = retry_policy or RetryPolicy()
+        # Optional PageCache consulted before loading category pages
+        self.cache = cache
+        # Optional proxy URL the browser's traffic goes through
+        self.proxy = proxy
+        # Lean mode blocks images, fonts and trackers and does not wait for the load event
+        self.lean = lean
+        # Optional PageLoadStats that category page loads are reported to
+        self.load_stats = load_stats
+        # Optional ParsePool whose worker processes parse category pages
+        self.parse_pool = parse_pool
+        # A driver leased from a DriverManager is used as is and left running on close()
+        self.owns_driver = driver is None
+        if driver is None:
+            self.setup_driver()
+        else:
+            self.driver = driver
+            self.wait = WebDriverWait(self.driver, 30)
     
     def setup_driver(self):
         """Initialize the undetected-chromedriver with anti-detection measures"""
         options = uc.ChromeOptions()
         options.add_argument('--start-maximized')
+        if self.proxy:
+            options.add_argument(f'--proxy-server={self.proxy}')
+        if self.lean:
+            options.page_load_strategy = 'eager'
         
         # Create user data directory if it doesn't exist
         user_data_dir = os.path.abspath(".pw_user_undetected")
@@ -27,14 +67,34 @@ class KiaPartsScraper:
             user_data_dir=user_data_dir,
             headless=False  # Headless mode often doesn't work well with Cloudflare
         )
+        if self.lean:
+            enable_lean_mode(self.driver)
         
         self.wait = WebDriverWait(self.driver, 30)
 
     def search_vin(self, vin):
-        """Search for a vehicle by VIN and return the model URL"""
+        """Search for a vehicle by VIN and return the model URL, retrying timeouts and challenges"""
+        breaker = get_circuit_breaker(self.base_url)
+        for attempt in range(1, self.retry_policy.max_attempts + 1):
+            breaker.before_request()
+            model_url = self._search_vin_once(vin)
+            failure = None if model_url else classify_page_failure(self.driver)
+            breaker.record(failure in (None, PERMANENT))
+            if model_url or not self.retry_policy.should_retry(failure, attempt):
+                return model_url
+            
+            delay = self.retry_policy.delay(failure, attempt)
+            print(f"VIN search failed ({failure}), retrying in {delay:.0f}s "
+                  f"(attempt {attempt + 1}/{self.retry_policy.max_attempts})...")
+            inc("retries", reason=f"vin_search_{failure}")
+            time.sleep(delay)
+        return None
+
+    def _search_vin_once(self, vin):
         try:
-            print("Navigating to parts.kia.com...")
-            self.driver.get("https://parts.kia.com")
+            print(f"Navigating to {self.base_url}...")
+            with timer("driver_get"):
+                self.driver.get(self.base_url)
             
             # Wait for and locate the VIN input field
             print("Entering VIN number...")
@@ -52,9 +112,10 @@ class KiaPartsScraper:
             
             # Wait for the results link to appear
             print("Waiting for results...")
-            result_link = self.wait.until(
-                EC.presence_of_element_located((By.CLASS_NAME, "vin-result-link"))
-            )
+            with timer("vin_search_wait"):
+                result_link = self.wait.until(
+                    EC.presence_of_element_located((By.CLASS_NAME, "vin-result-link"))
+                )
             
             # Get the href attribute
             model_url = result_link.get_attribute('href')
@@ -70,47 +131,62 @@ class KiaPartsScraper:
         """Generate category links from the model URL"""
         try:
             # Validate the input URL format
-            if not model_url.startswith('https://parts.kia.com/Kia_'):
+            if not model_url.startswith(f'{self.base_url}/Kia_'):
                 raise ValueError("Invalid Kia parts URL format")
             
             # Extract the base model identifier
-            match = re.search(r'https://parts\.kia\.com/(Kia_[^\.]+)\.html', model_url)
+            match = re.search(rf'{re.escape(self.base_url)}/(Kia_[^\.]+)\.html', model_url)
             if not match:
                 raise ValueError("Could not extract model identifier from URL")
             
             base_model = match.group(1)
             
-            # Define the category suffixes
-            categories = [
-                "Body-and-Trim",
-                "Chassis", 
-                "Electric",
-                "Engine-and-Motor",
-                "Transmission"
-            ]
-            
             # Generate the full URLs
-            return [f"https://parts.kia.com/{base_model}/{category}.html" 
-                   for category in categories]
+            return [f"{self.base_url}/{base_model}/{category}.html" 
+                   for category in CATEGORIES]
             
         except Exception as e:
             print(f"Error generating category links: {str(e)}")
             return []
 
+    def discover_category_links(self, model_url):
+        """Read the category links the model page lists, falling back to the fixed category list"""
+        default_links = self.generate_category_links(model_url)
+        if not default_links:
+            return []
+        base_model = default_links[0][len(self.base_url) + 1:].split("/")[0]
+        
+        try:
+            limiter = get_rate_limiter(model_url, via=self.proxy)
+            limiter.acquire()
+            with timer("driver_get"):
+                self.driver.get(model_url)
+            category_links = self.extract_category_links(self.driver.page_source, base_model)
+        except Exception as e:
+            print(f"Error reading category links from {model_url}: {str(e)}")
+            category_links = []
+        
+        if not category_links:
+            print("No category links on the model page, using the default categories")
+            return default_links
+        print(f"Model page lists {len(category_links)} categories")
+        return category_links
+
+    def extract_category_links(self, page_source, base_model):
+        """Category page URLs linked from a model page, in page order and without duplicates"""
+        pattern = rf'href="(?:https?://[^/"]+)?/{re.escape(base_model)}/([A-Za-z0-9-]+)\.html"'
+        categories = dict.fromkeys(re.findall(pattern, page_source))
+        return [f"{self.base_url}/{base_model}/{category}.html" for category in categories]
+
     def extract_assembly_urls(self, page_source):
-        """Extract assembly URLs from page source using BeautifulSoup"""
+        """Extract assembly URLs from page source using the configured html_extract backend"""
         try:
-            soup = BeautifulSoup(page_source, 'html.parser')
-            assembly_cards = soup.find_all('div', class_='assemblyCard')
-            
-            urls = []
-            for card in assembly_cards:
-                link = card.find('a', class_='assemblyCardLink')
-                if link and link.get('href'):
-                    full_url = f"https://parts.kia.com{link['href']}"
-                    urls.append(full_url)
-            
-            return urls
+            if self.parse_pool is not None:
+                hrefs = self.parse_pool.extract_assembly_links(page_source)
+            else:
+                with timer("parse_category"):
+                    hrefs = extract_assembly_links(page_source)
+            return [f"{self.base_url}{href}" for href in hrefs]
             
         except Exception as e:
             print(f"Error extracting assembly URLs: {str(e)}")
@@ -118,37 +194,62 @@ class KiaPartsScraper:
 
     def scrape_category_pages(self, category_links):
         """Visit each category page and extract assembly URLs"""
-        all_assembly_urls = []
-        
+        return [url for _, assembly_urls in self.iter_category_pages(category_links) for url in assembly_urls]
+
+    def iter_category_pages(self, category_links):
+        """Yield (category URL, assembly URLs) as soon as each category page is parsed; failed pages are skipped"""
         for category_url in category_links:
             print(f"\nScraping category: {category_url}")
             
+            if self.cache is not None:
+                page_source = self.cache.get(category_url)
+                if page_source is not None:
+                    assembly_urls = self.extract_assembly_urls(page_source)
+                    if assembly_urls:
+                        inc("category_pages", source="cache")
+                        print(f"Found {len(assembly_urls)} assembly URLs (cached)")
+                        yield category_url, assembly_urls
+                        continue
+            
+            limiter = get_rate_limiter(category_url, via=self.proxy)
+            limiter.acquire()
+            start = time.monotonic()
+            
             try:
                 # Navigate to category page
-                self.driver.get(category_url)
+                with timer("driver_get"):
+                    self.driver.get(category_url)
                 
                 # Wait for assembly cards to load
-                self.wait.until(
-                    EC.presence_of_element_located((By.CLASS_NAME, "assemblyCard"))
-                )
+                with timer("wait_category"):
+                    self.wait.until(
+                        EC.presence_of_element_located((By.CLASS_NAME, "assemblyCard"))
+                    )
+                if self.load_stats is not None:
+                    self.load_stats.add(category_url, time.monotonic() - start, page_transfer(self.driver))
                 
                 # Extract URLs from the page
-                assembly_urls = self.extract_assembly_urls(self.driver.page_source)
-                all_assembly_urls.extend(assembly_urls)
+                page_source = self.driver.page_source
+                assembly_urls = self.extract_assembly_urls(page_source)
+                if self.cache is not None and assembly_urls:
+                    self.cache.put(category_url, page_source)
                 
                 print(f"Found {len(assembly_urls)} assembly URLs")
-                
-                # Random delay between requests
-                time.sleep(random.uniform(2, 4))
+                limiter.record_success(time.monotonic() - start)
+                inc("category_pages", source="browser")
                 
             except Exception as e:
                 print(f"Error processing category {category_url}: {str(e)}")
+                limiter.record_backoff("category page did not load")
+                inc("failures", stage="category_page")
                 continue
-        
-        return all_assembly_urls
+            
+            yield category_url, assembly_urls
 
     def close(self):
         """Close the browser"""
+        if not self.owns_driver:
+            return
         try:
             self.driver.quit()
         except:
@@ -166,9 +267,9 @@ def main():
         # model_url = "https://parts.kia.com/Kia_2024_Sorento.html"
         
         if model_url:
-            # Generate category links
-            print("\nGenerating category links...")
-            category_links = scraper.generate_category_links(model_url)
+            # Read the category links from the model page
+            print("\nReading category links...")
+            category_links = scraper.discover_category_links(model_url)
             print(f"Found {len(category_links)} categories")
             
             # Scrape assembly URLs from each category
@@ -0,0 +1,144 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Iterator, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+logger = logging.getLogger(__name__)
+
+# Query parameters that change between visits without changing the page
+VOLATILE_PARAMS = {"assemblysearchguid"}
+
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def normalize_url(url: str) -> str:
+    """Canonical form of a page URL used as the cache key.
+
+    Drops volatile query parameters such as ``assemblySearchGuid``, sorts the
+    remaining ones and lowercases the scheme and host.
+    """
+    parts = urlsplit(url.strip())
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key.lower() not in VOLATILE_PARAMS
+    )
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, urlencode(query), ""))
+
+
+class PageCache:
+    """On-disk cache of gzip-compressed page sources with a TTL and an LRU size cap.
+
+    Entries live in ``<cache_dir>/<key[:2]>/<key>.json.gz`` where ``key`` is the
+    SHA-256 of the normalized URL. A file's mtime is its last use, which is what
+    LRU eviction sorts on.
+    """
+
+    def __init__(self, cache_dir: str, ttl: Optional[float] = DEFAULT_TTL,
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._total_bytes = sum(os.path.getsize(path) for path, _ in self._scan())
+
+    @staticmethod
+    def key(url: str) -> str:
+        return hashlib.sha256(normalize_url(url).encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json.gz")
+
+    def _scan(self) -> Iterator[Tuple[str, float]]:
+        """Yield (path, mtime) for every cache entry on disk."""
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".json.gz"):
+                    path = os.path.join(root, name)
+                    try:
+                        yield path, os.path.getmtime(path)
+                    except OSError:
+                        continue
+
+    def _read(self, path: str) -> Optional[dict]:
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Dropping unreadable cache entry {path}: {e}")
+            self._remove(path)
+            return None
+
+    def _remove(self, path: str):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        with self._lock:
+            self._total_bytes -= size
+
+    def get(self, url: str, allow_stale: bool = False) -> Optional[str]:
+        """Return the cached page source for ``url`` or None if missing or expired."""
+        path = self._path(self.key(url))
+        entry = self._read(path)
+        if entry is None or (not allow_stale and self.ttl is not None
+                             and time.time() - entry["fetched_at"] > self.ttl):
+            # Shared by every worker thread; counted under the lock like the byte total
+            with self._lock:
+                self.misses += 1
+            return None
+
+        try:
+            # Mark as recently used for LRU eviction
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return entry["page_source"]
+
+    def put(self, url: str, page_source: str):
+        """Store ``page_source`` for ``url`` and evict old entries if over the size cap."""
+        path = self._path(self.key(url))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = {"url": url, "fetched_at": time.time(), "page_source": page_source}
+
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(entry, f)
+        new_size = os.path.getsize(tmp_path)
+        try:
+            old_size = os.path.getsize(path)
+        except OSError:
+            old_size = 0
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._total_bytes += new_size - old_size
+            over_cap = self._total_bytes > self.max_bytes
+        if over_cap:
+            self._evict()
+
+    def _evict(self):
+        """Delete least recently used entries until the cache is back under 90% of its cap."""
+        target = self.max_bytes * 0.9
+        removed = 0
+        for path, _ in sorted(self._scan(), key=lambda item: item[1]):
+            if self._total_bytes <= target:
+                break
+            self._remove(path)
+            removed += 1
+        if removed:
+            logger.info(f"Page cache evicted {removed} entries, now {self._total_bytes / 1e6:.1f} MB")
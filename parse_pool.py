@@ -0,0 +1,137 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Hashable, Iterator, List, Optional, Tuple
+
+from html_extract import DEFAULT_BASE_URL, extract_assembly_links, extract_parts, get_default_backend, \
+    set_default_backend
+from metrics import observe
+
+logger = logging.getLogger(__name__)
+
+
+# --- Worker process side --------------------------------------------------------
+
+def _init_worker(backend: str):
+    set_default_backend(backend)
+
+
+def _parse_parts(page_source: str, url: str, assembly_name: Optional[str], base_url: str) -> Tuple[List, float]:
+    start = time.perf_counter()
+    return extract_parts(page_source, url, assembly_name, base_url=base_url), time.perf_counter() - start
+
+
+def _parse_links(page_source: str) -> Tuple[List[str], float]:
+    start = time.perf_counter()
+    return extract_assembly_links(page_source), time.perf_counter() - start
+
+
+# --- Caller side ----------------------------------------------------------------------
+
+class ParsePool:
+    """Parses assembly and category pages in worker processes while the browser moves on.
+
+    ``submit_parts()`` hands a page's HTML to a worker and returns at once;
+    ``completed()`` gives back the parsed rows in submission order, however
+    the workers finish. At most ``max_in_flight`` pages are submitted but not
+    yet parsed: further submissions block until a worker catches up, which
+    caps the page sources held in memory. ``parse_parts()`` and
+    ``extract_assembly_links()`` are blocking versions for callers that need
+    the rows straight away; they still take the parsing off the caller's
+    thread, so browser worker threads do not hold the GIL while parsing.
+
+    The ordered calls are meant for one producing thread; the blocking ones
+    may be used from any number of threads. Workers are started when the pool
+    is created, so create it before any browser or worker threads.
+    """
+
+    def __init__(self, workers: Optional[int] = None, max_in_flight: Optional[int] = None,
+                 backend: Optional[str] = None, base_url: str = DEFAULT_BASE_URL):
+        self.workers = workers or max(1, min(4, (os.cpu_count() or 2) - 1))
+        self.max_in_flight = max_in_flight or 2 * self.workers
+        self.base_url = base_url
+        # Fork where available so workers do not re-import the entry script
+        context = multiprocessing.get_context("fork") if "fork" in multiprocessing.get_all_start_methods() else None
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                             initializer=_init_worker, initargs=(backend or get_default_backend(),))
+        self._slots = threading.BoundedSemaphore(self.max_in_flight)
+        # (key, future, metrics stage, what is being parsed) in submission order
+        self._ordered: "deque[Tuple[Hashable, Future, Optional[str], str]]" = deque()
+        # Start every worker now, before the caller starts threads of its own
+        for future in [self._executor.submit(time.sleep, 0) for _ in range(self.workers)]:
+            future.result()
+
+    def _submit(self, fn: Callable, *args) -> Future:
+        start = time.perf_counter()
+        self._slots.acquire()
+        waited = time.perf_counter() - start
+        if waited > 0.001:
+            observe("parse_backpressure", waited)
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    @staticmethod
+    def _result(future: Future, stage: str, what: str) -> List:
+        try:
+            rows, seconds = future.result()
+        except Exception as e:
+            logger.error(f"Parsing {what} failed: {e}")
+            return []
+        observe(stage, seconds)
+        return rows
+
+    def submit_parts(self, key: Hashable, page_source: str, url: str, assembly_name: Optional[str] = None):
+        """Queue an assembly page for parsing; its rows come back from ``completed()`` under ``key``."""
+        future = self._submit(_parse_parts, page_source, url, assembly_name, self.base_url)
+        self._ordered.append((key, future, "parse", url))
+
+    def submit_links(self, key: Hashable, page_source: str):
+        """Queue a category page; its assembly hrefs come back from ``completed()`` under ``key``."""
+        self._ordered.append((key, self._submit(_parse_links, page_source), "parse_category", "category page"))
+
+    def add_result(self, key: Hashable, result: Any):
+        """Slot a result that needed no parsing (a failed page, say) into the ordered output."""
+        future = Future()
+        future.set_result(result)
+        self._ordered.append((key, future, None, ""))
+
+    def pending(self) -> int:
+        return len(self._ordered)
+
+    def completed(self, wait: bool = False) -> Iterator[Tuple[Hashable, Any]]:
+        """Yield ``(key, result)`` in submission order for as long as the next one is ready.
+
+        With ``wait``, block until everything submitted so far is yielded.
+        """
+        while self._ordered:
+            key, future, stage, what = self._ordered[0]
+            if not (wait or future.done()):
+                return
+            self._ordered.popleft()
+            yield key, future.result() if stage is None else self._result(future, stage, what)
+
+    def parse_parts(self, page_source: str, url: str, assembly_name: Optional[str] = None) -> List:
+        """Parse an assembly page in a worker and wait for its rows."""
+        return self._result(self._submit(_parse_parts, page_source, url, assembly_name, self.base_url), "parse", url)
+
+    def extract_assembly_links(self, page_source: str) -> List[str]:
+        """Parse a category page in a worker and wait for its assembly hrefs."""
+        return self._result(self._submit(_parse_links, page_source), "parse_category", "category page")
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,91 @@
+import sys
+from array import array
+from typing import Dict, Hashable, Iterable, Iterator, List, Optional
+
+from checkpoint import PART_FIELDS
+
+
+class StringTable:
+    """Stores each distinct value once; rows refer to values by their number (0 is None)."""
+
+    __slots__ = ("values", "_ids")
+
+    def __init__(self):
+        self.values: List[Optional[Hashable]] = [None]
+        self._ids: Dict[Hashable, int] = {}
+
+    def id(self, value: Optional[Hashable]) -> int:
+        if value is None:
+            return 0
+        ident = self._ids.get(value)
+        if ident is None:
+            ident = self._ids[value] = len(self.values)
+            self.values.append(value)
+        return ident
+
+    def __len__(self) -> int:
+        return len(self.values) - 1
+
+
+class PartStore:
+    """Part rows held as columns of ids into per-field interned value tables.
+
+    A row costs four bytes per field plus the strings it is the first to use,
+    instead of a 7-key dict with its own copies of the assembly name, part
+    name and product URL. The rows of one assembly page share their assembly
+    URL, and part names, prices and product URLs repeat across assemblies.
+    Iterating yields the usual part dicts in ``PART_FIELDS`` order, so a
+    store can be passed to ``write_part_outputs()`` or ``write_columnar()``
+    wherever a list of rows was.
+    """
+
+    def __init__(self, parts: Iterable[Dict] = (), fields: List[str] = PART_FIELDS):
+        self.fields = list(fields)
+        self._tables = [StringTable() for _ in self.fields]
+        self._columns = [array("I") for _ in self.fields]
+        self.extend(parts)
+
+    def append(self, part: Dict):
+        for field, table, column in zip(self.fields, self._tables, self._columns):
+            column.append(table.id(part.get(field)))
+
+    def extend(self, parts: Iterable[Dict]):
+        for part in parts:
+            self.append(part)
+
+    def __len__(self) -> int:
+        return len(self._columns[0])
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def __getitem__(self, index: int) -> Dict:
+        return {field: table.values[column[index]]
+                for field, table, column in zip(self.fields, self._tables, self._columns)}
+
+    def __iter__(self) -> Iterator[Dict]:
+        values = [table.values for table in self._tables]
+        for ids in zip(*self._columns):
+            yield {field: table[ident] for field, table, ident in zip(self.fields, values, ids)}
+
+    def column(self, field: str) -> List:
+        """Every row's value of ``field``, in row order."""
+        index = self.fields.index(field)
+        values = self._tables[index].values
+        return [values[ident] for ident in self._columns[index]]
+
+    def to_columns(self, fields: Optional[List[str]] = None) -> Dict[str, List]:
+        """``{field: values}`` for ``pandas.DataFrame``, which builds much faster from columns than from dicts."""
+        return {field: self.column(field) for field in (fields or self.fields)}
+
+    def distinct(self, field: str) -> int:
+        """Number of distinct non-empty values stored for ``field``."""
+        return len(self._tables[self.fields.index(field)])
+
+    def memory_bytes(self) -> int:
+        """Approximate memory held by the store: id columns, interned values and their lookup dicts."""
+        total = sum(column.buffer_info()[1] * column.itemsize for column in self._columns)
+        for table in self._tables:
+            total += sys.getsizeof(table.values) + sys.getsizeof(table._ids)
+            total += sum(sys.getsizeof(value) for value in table.values[1:])
+        return total
@@ -0,0 +1,324 @@
+import argparse
+import csv
+import glob
+import json
+import os
+import re
+import sqlite3
+import time
+from typing import Dict, Iterator, List, Optional
+
+from checkpoint import iter_json_array
+from columnar_output import parse_price, parse_quantity
+from run_delta import MANIFEST_FILE, SNAPSHOT_DIR, SnapshotStore
+
+DEFAULT_OUTPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "output")
+DEFAULT_DB = os.path.join(DEFAULT_OUTPUT_DIR, "parts_index.sqlite")
+
+VIN_PATTERN = re.compile(r"^[A-HJ-NPR-Z0-9]{17}$")
+RUN_PATTERN = re.compile(r"kia_parts_(?:data|compressed)_(\d{8}_\d{6}(?:_\d+)?)\.(json|csv)$")
+# Runs stored with --delta: output/<VIN>/snapshots/full_<run>.json.gz or delta_<run>.json.gz
+SNAPSHOT_PATTERN = re.compile(r"(?:full|delta)_(\d{8}_\d{6}(?:_\d+)?)\.json\.gz$")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    directory TEXT NOT NULL,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    vin TEXT,
+    run TEXT NOT NULL,
+    latest INTEGER NOT NULL DEFAULT 0,
+    rows INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS parts (
+    id INTEGER PRIMARY KEY,
+    source_id INTEGER NOT NULL REFERENCES sources(id),
+    assembly TEXT,
+    part_name TEXT,
+    part_number TEXT,
+    price TEXT,
+    price_cents INTEGER,
+    price_is_msrp INTEGER,
+    quantity INTEGER,
+    product_url TEXT,
+    assembly_url TEXT
+);
+CREATE INDEX IF NOT EXISTS parts_part_number ON parts(part_number);
+CREATE INDEX IF NOT EXISTS parts_assembly ON parts(assembly);
+CREATE INDEX IF NOT EXISTS parts_source_assembly ON parts(source_id, assembly);
+CREATE INDEX IF NOT EXISTS sources_vin ON sources(vin);
+CREATE VIRTUAL TABLE IF NOT EXISTS parts_fts USING fts5(
+    part_name, content='parts', content_rowid='id', prefix='2 3 4'
+);
+"""
+
+RESULT_COLUMNS = """
+    s.vin AS vin, s.run AS run, p.assembly AS assembly, p.part_name AS part_name,
+    p.part_number AS part_number, p.price AS price, p.price_cents AS price_cents,
+    p.price_is_msrp AS price_is_msrp, p.quantity AS quantity,
+    p.product_url AS product_url, p.assembly_url AS assembly_url
+"""
+
+
+def snapshot_run(path: str) -> Optional[str]:
+    """Run id of a snapshot store file (``<dir>/snapshots/full_<run>.json.gz`` or ``delta_...``), else None."""
+    match = SNAPSHOT_PATTERN.search(os.path.basename(path))
+    if match and os.path.basename(os.path.dirname(path)) == SNAPSHOT_DIR:
+        return match.group(1)
+    return None
+
+
+def source_directory(path: str) -> str:
+    """Output directory a run belongs to; runs in a snapshot store belong to the directory holding it."""
+    directory = os.path.dirname(path)
+    return os.path.dirname(directory) if snapshot_run(path) else directory
+
+
+def discover_sources(output_dir: str) -> Dict[str, str]:
+    """Pick one file per run under ``output_dir``: the JSON backup, else the full CSV, else the compressed CSV.
+
+    Runs stored with ``--delta`` have no such files; they come from the
+    directory's snapshot store, as the run's full or delta snapshot file,
+    unless the run has also been reconstructed. Returns ``{path: run}``.
+    """
+    preference = {"json": 0, "csv": 1, "compressed": 2, "snapshot": 3}
+    candidates = []
+    for path in glob.glob(os.path.join(output_dir, "**", "kia_parts_*"), recursive=True):
+        match = RUN_PATTERN.search(os.path.basename(path))
+        if match:
+            run, ext = match.groups()
+            candidates.append((path, run, "compressed" if "_compressed_" in os.path.basename(path) else ext))
+    for manifest_file in glob.glob(os.path.join(output_dir, "**", SNAPSHOT_DIR, MANIFEST_FILE), recursive=True):
+        with open(manifest_file, 'r') as f:
+            entries = json.load(f)["runs"]
+        for entry in entries:
+            path = os.path.join(os.path.dirname(manifest_file), entry["file"])
+            if os.path.exists(path):
+                candidates.append((path, entry["run"], "snapshot"))
+
+    best = {}
+    for path, run, kind in candidates:
+        key = (source_directory(path), run)
+        if key not in best or preference[kind] < preference[best[key][1]]:
+            best[key] = (path, kind)
+    return {path: run for (_, run), (path, _) in best.items()}
+
+
+def vin_for_path(path: str) -> Optional[str]:
+    """Per-VIN outputs live in output/<VIN>/; top-level outputs have no VIN."""
+    name = os.path.basename(source_directory(path))
+    return name if VIN_PATTERN.match(name) else None
+
+
+def read_rows(path: str) -> Iterator[Dict]:
+    """Yield part dicts from a kia_parts JSON backup or CSV output, or a run of a snapshot store."""
+    run = snapshot_run(path)
+    if run:
+        yield from SnapshotStore(source_directory(path)).iter_parts(run)
+    elif path.endswith(".json"):
+        yield from iter_json_array(path)
+    else:
+        with open(path, 'r', newline='') as f:
+            for row in csv.DictReader(f):
+                # Empty CSV cells stand for missing values
+                yield {key: (value if value != "" else None) for key, value in row.items()}
+
+
+class PartsIndex:
+    """SQLite index over every run's part rows, with full-text search on part names."""
+
+    def __init__(self, db_path: str = DEFAULT_DB):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    # --- Ingestion -------------------------------------------------------------
+
+    def update(self, output_dir: str = DEFAULT_OUTPUT_DIR) -> Dict[str, int]:
+        """Ingest new or changed run outputs and drop ones that disappeared."""
+        stats = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0, "rows": 0}
+        sources = discover_sources(output_dir)
+        known = {row["path"]: row for row in self.conn.execute("SELECT id, path, mtime, size FROM sources")}
+
+        with self.conn:
+            for path in set(known) - set(sources):
+                self._remove_source(known[path]["id"])
+                stats["removed"] += 1
+
+            for path, run in sorted(sources.items()):
+                stat = os.stat(path)
+                existing = known.get(path)
+                if existing and existing["mtime"] == stat.st_mtime and existing["size"] == stat.st_size:
+                    stats["unchanged"] += 1
+                    continue
+                if existing:
+                    self._remove_source(existing["id"])
+                    stats["updated"] += 1
+                else:
+                    stats["added"] += 1
+                stats["rows"] += self._ingest(path, run, stat)
+
+            self._mark_latest()
+        return stats
+
+    def _remove_source(self, source_id: int):
+        # External-content FTS rows have to be deleted with their original values
+        self.conn.execute(
+            "INSERT INTO parts_fts(parts_fts, rowid, part_name) "
+            "SELECT 'delete', id, part_name FROM parts WHERE source_id = ?", (source_id,)
+        )
+        self.conn.execute("DELETE FROM parts WHERE source_id = ?", (source_id,))
+        self.conn.execute("DELETE FROM sources WHERE id = ?", (source_id,))
+
+    def _ingest(self, path: str, run: str, stat) -> int:
+        cursor = self.conn.execute(
+            "INSERT INTO sources(path, directory, mtime, size, vin, run) VALUES (?, ?, ?, ?, ?, ?)",
+            (path, source_directory(path), stat.st_mtime, stat.st_size, vin_for_path(path), run)
+        )
+        source_id = cursor.lastrowid
+        self.conn.executemany(
+            "INSERT INTO parts(source_id, assembly, part_name, part_number, price, price_cents, "
+            "price_is_msrp, quantity, product_url, assembly_url) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (self._row_values(source_id, row) for row in read_rows(path))
+        )
+        self.conn.execute(
+            "INSERT INTO parts_fts(rowid, part_name) SELECT id, part_name FROM parts WHERE source_id = ?",
+            (source_id,)
+        )
+        count = self.conn.execute("SELECT COUNT(*) FROM parts WHERE source_id = ?", (source_id,)).fetchone()[0]
+        self.conn.execute("UPDATE sources SET rows = ? WHERE id = ?", (count, source_id))
+        return count
+
+    @staticmethod
+    def _row_values(source_id: int, row: Dict):
+        cents, is_msrp = parse_price(row.get("Price"))
+        return (
+            source_id, row.get("Assembly"), row.get("Part Name"), row.get("Part Number"),
+            row.get("Price"), cents, int(is_msrp), parse_quantity(row.get("Quantity")),
+            row.get("Product URL"), row.get("Assembly URL"),
+        )
+
+    def _mark_latest(self):
+        """Flag the newest run of every output directory."""
+        self.conn.execute("UPDATE sources SET latest = 0")
+        self.conn.execute("""
+            UPDATE sources SET latest = 1 WHERE run = (
+                SELECT MAX(run) FROM sources AS newer WHERE newer.directory = sources.directory
+            )
+        """)
+
+    # --- Queries -------------------------------------------------------------------
+
+    def _query(self, where: str, params, latest_only: bool, limit: Optional[int],
+               tables: str = "parts AS p") -> List[Dict]:
+        sql = f"SELECT {RESULT_COLUMNS} FROM {tables} JOIN sources AS s ON s.id = p.source_id WHERE {where}"
+        if latest_only:
+            sql += " AND s.latest = 1"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def by_part_number(self, part_number: str, latest_only: bool = True,
+                       limit: Optional[int] = None) -> List[Dict]:
+        """Every row, across VINs and assemblies, for one part number."""
+        return self._query("p.part_number = ?", (part_number.strip(),), latest_only, limit)
+
+    def by_name_prefix(self, prefix: str, latest_only: bool = True, limit: Optional[int] = 50) -> List[Dict]:
+        """Full-text match on part names; the last word is treated as a prefix.
+
+        ``"screw tap"`` matches names containing SCREW and a word starting with TAP.
+        """
+        words = re.findall(r"\w+", prefix)
+        if not words:
+            return []
+        match = " ".join(f'"{word}"' for word in words[:-1]) + f' "{words[-1]}"*'
+        # Driving the join from the FTS side lets LIMIT stop the scan early
+        return self._query(
+            "parts_fts MATCH ?", (match.strip(),), latest_only, limit,
+            tables="parts_fts CROSS JOIN parts AS p ON p.id = parts_fts.rowid"
+        )
+
+    def by_assembly(self, assembly: str, vin: Optional[str] = None, latest_only: bool = True,
+                    limit: Optional[int] = None) -> List[Dict]:
+        """Rows of one assembly, optionally for a single VIN."""
+        if vin:
+            # Phrased as a source_id lookup so SQLite seeks the (source_id, assembly) index
+            return self._query("p.source_id IN (SELECT id FROM sources WHERE vin = ?) AND p.assembly = ?",
+                               (vin, assembly), latest_only, limit)
+        return self._query("p.assembly = ?", (assembly,), latest_only, limit)
+
+    def by_vin(self, vin: str, latest_only: bool = True, limit: Optional[int] = None) -> List[Dict]:
+        """All rows scraped for one VIN."""
+        return self._query("s.vin = ?", (vin,), latest_only, limit)
+
+
+def print_rows(rows: List[Dict], as_json: bool):
+    if as_json:
+        print(json.dumps(rows, indent=4))
+        return
+    for row in rows:
+        price = f"{row['price_cents'] / 100:.2f}" if row["price_cents"] is not None else "-"
+        print(f"{row['part_number'] or '-':<16} {price:>9}{' MSRP' if row['price_is_msrp'] else '     '} "
+              f"x{row['quantity'] if row['quantity'] is not None else '-':<3} {row['vin'] or '-':<17} "
+              f"{row['assembly'] or '-'} | {row['part_name'] or '-'}")
+    print(f"{len(rows)} rows")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index and query scraped Kia parts across all runs")
+    parser.add_argument("--db", default=DEFAULT_DB, help=f"Index database (default: {DEFAULT_DB})")
+    query_options = argparse.ArgumentParser(add_help=False)
+    query_options.add_argument("--json", action="store_true", help="Print results as JSON")
+    query_options.add_argument("--all-runs", action="store_true",
+                               help="Include older runs, not just the latest per output directory")
+    query_options.add_argument("--limit", type=int, help="Maximum rows to print")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    update = commands.add_parser("update", help="Ingest new or changed outputs")
+    update.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR)
+    commands.add_parser("part", parents=[query_options], help="Look up a part number").add_argument("part_number")
+    commands.add_parser("name", parents=[query_options],
+                        help="Search part names (last word is a prefix)").add_argument("prefix")
+    assembly = commands.add_parser("assembly", parents=[query_options], help="List an assembly's parts")
+    assembly.add_argument("assembly")
+    assembly.add_argument("--vin")
+    commands.add_parser("vin", parents=[query_options], help="List a VIN's parts").add_argument("vin")
+
+    args = parser.parse_args()
+    index = PartsIndex(args.db)
+    try:
+        if args.command == "update":
+            start = time.perf_counter()
+            print(index.update(args.output_dir))
+            print(f"({time.perf_counter() - start:.1f} s)")
+            return
+
+        latest_only = not args.all_runs
+        start = time.perf_counter()
+        if args.command == "part":
+            rows = index.by_part_number(args.part_number, latest_only, args.limit)
+        elif args.command == "name":
+            rows = index.by_name_prefix(args.prefix, latest_only, args.limit or 50)
+        elif args.command == "assembly":
+            rows = index.by_assembly(args.assembly, args.vin, latest_only, args.limit)
+        else:
+            rows = index.by_vin(args.vin, latest_only, args.limit)
+        elapsed = (time.perf_counter() - start) * 1000
+        print_rows(rows, args.json)
+        if not args.json:
+            print(f"({elapsed:.2f} ms)")
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,463 @@
+import argparse
+import asyncio
+import glob
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from checkpoint import iter_json_array, write_part_outputs
+from driver_manager import DriverManager
+from html_extract import set_default_backend
+from http_fetcher import HttpPageFetcher
+from kia_parts import (add_scrape_arguments, check_scrape_arguments, open_driver_manager, open_page_cache,
+                       open_parse_pool, open_proxy_pool, open_retry_policy)
+from metrics import enable_metrics, get_metrics
+from navigate_kia_parts_undetected import BASE_URL, KiaPartsScraper
+from page_cache import PageCache, normalize_url
+from parse_pool import ParsePool
+from parts_index import DEFAULT_OUTPUT_DIR, VIN_PATTERN
+from rate_limiter import set_default_limits
+from retry_scheduler import RetryPolicy
+from worker_pool import ScraperWorkerPool
+
+logger = logging.getLogger(__name__)
+
+
+class ResultCache:
+    """Finished results kept for ``ttl`` seconds, least recently used dropped beyond ``max_entries``."""
+
+    def __init__(self, ttl: float = 3600, max_entries: int = 256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key: str, result: Dict):
+        self._entries[key] = (time.monotonic() + self.ttl, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class PartsService:
+    """Asyncio API for "parts for VIN X" and "parts on assembly page Y" on top of the blocking scraper.
+
+    Jobs run on a thread pool (at most ``max_jobs`` at once) and share one
+    ``DriverManager``, page cache and HTTP fetcher, so browsers stay warm
+    across requests and assembly pages already fetched for another VIN of
+    the same model come from the page cache. Concurrent requests for the same
+    VIN or assembly page share one crawl. Successful results are kept for
+    ``cache_ttl`` seconds; with ``output_dir`` every VIN crawl also writes the
+    usual CSV/JSON files to ``<output_dir>/<VIN>/``, and a JSON backup there
+    that is younger than ``cache_ttl`` (from this service or ``kia_parts.py``)
+    answers a request without crawling.
+
+    Results are shared between callers and must not be modified. Call the
+    coroutines from one event loop.
+    """
+
+    def __init__(self, drivers: DriverManager, http_fetcher: Optional[HttpPageFetcher] = None,
+                 page_cache: Optional[PageCache] = None, retry_policy: Optional[RetryPolicy] = None,
+                 parse_pool: Optional[ParsePool] = None, extraction_mode: str = "html", workers_per_vin: int = 1,
+                 max_jobs: int = 2, cache_ttl: float = 3600, max_cached: int = 256,
+                 output_dir: Optional[str] = None, base_url: str = BASE_URL):
+        self.drivers = drivers
+        self.http_fetcher = http_fetcher
+        self.page_cache = page_cache
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.parse_pool = parse_pool
+        self.extraction_mode = extraction_mode
+        self.workers_per_vin = workers_per_vin
+        self.cache_ttl = cache_ttl
+        self.output_dir = output_dir
+        self.base_url = base_url.rstrip("/")
+
+        self.results = ResultCache(cache_ttl, max_cached)
+        self.stats = {"requests": 0, "memory_hits": 0, "coalesced": 0, "jobs": 0, "disk_hits": 0, "failed_jobs": 0}
+        # Running job per key, and whether it ignores cached results
+        self._in_flight: Dict[str, Tuple[asyncio.Future, bool]] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_jobs, thread_name_prefix="parts-service")
+
+    # --- Async API -------------------------------------------------------------------
+
+    async def parts_for_vin(self, vin: str, refresh: bool = False) -> Dict:
+        """Every part of a VIN: ``{"vin", "status", "model_url", "parts", "failed_urls", ...}``.
+
+        ``status`` is ``ok``, ``invalid_vin`` or ``failed`` (no parts at all).
+        With ``refresh``, cached results are ignored.
+        """
+        result, _ = await self.lookup_vin(vin, refresh)
+        return result
+
+    async def parts_for_vins(self, vins: Iterable[str], refresh: bool = False) -> Dict[str, Dict]:
+        """Results for several VINs, crawled concurrently up to ``max_jobs`` at a time."""
+        vins = [vin.strip().upper() for vin in vins]
+        results = await asyncio.gather(*(self.parts_for_vin(vin, refresh) for vin in vins))
+        return dict(zip(vins, results))
+
+    async def parts_for_assembly(self, url: str, refresh: bool = False) -> Dict:
+        """Rows of one assembly page: ``{"url", "status", "parts"}``."""
+        result, _ = await self.lookup_assembly(url, refresh)
+        return result
+
+    async def lookup_vin(self, vin: str, refresh: bool = False, wait: bool = True) -> Tuple[Dict, str]:
+        """Like ``parts_for_vin()``, also saying where the result came from.
+
+        The second value is ``memory``, ``coalesced`` (joined a crawl already
+        running; with ``refresh``, only one that was also started with
+        ``refresh``, otherwise a fresh crawl follows the running one),
+        ``disk``, ``crawl`` or, with ``wait=False`` and nothing
+        cached, ``running``: the crawl is started and ``{"vin", "status":
+        "running"}`` returned at once.
+        """
+        vin = vin.strip().upper()
+        if not VIN_PATTERN.match(vin):
+            raise ValueError(f"Not a VIN: {vin!r}")
+        return await self._lookup(f"vin:{vin}", self._vin_job, vin, refresh, wait, {"vin": vin})
+
+    async def lookup_assembly(self, url: str, refresh: bool = False, wait: bool = True) -> Tuple[Dict, str]:
+        """Like ``parts_for_assembly()``, also saying where the result came from (see ``lookup_vin()``)."""
+        if not url.startswith(("http://", "https://")):
+            raise ValueError(f"Not an assembly page URL: {url!r}")
+        return await self._lookup(f"assembly:{normalize_url(url)}", self._assembly_job, url, refresh, wait,
+                                  {"url": url})
+
+    async def _lookup(self, key: str, job: Callable[[str, bool], Dict], arg: str, refresh: bool, wait: bool,
+                      running: Dict) -> Tuple[Dict, str]:
+        self.stats["requests"] += 1
+        if not refresh:
+            cached = self.results.get(key)
+            if cached is not None:
+                self.stats["memory_hits"] += 1
+                return cached, "memory"
+
+        running_job = self._in_flight.get(key)
+        how = "coalesced"
+        if running_job is not None and (running_job[1] or not refresh):
+            future = running_job[0]
+            self.stats["coalesced"] += 1
+        else:
+            how = None
+            self.stats["jobs"] += 1
+            if running_job is None:
+                future = asyncio.get_running_loop().run_in_executor(self._executor, job, arg, refresh)
+            else:
+                # The running job may answer from disk; crawl afresh once it is done rather than alongside it
+                future = asyncio.ensure_future(self._after(running_job[0], job, arg))
+            self._in_flight[key] = (future, refresh)
+            future.add_done_callback(lambda done: self._settle(key, done))
+        if not wait:
+            return dict(running, status="running"), "running"
+
+        # A caller that goes away does not cancel the crawl other callers are waiting for
+        result = await asyncio.shield(future)
+        return result, how or result.get("source", "crawl")
+
+    async def _after(self, previous: asyncio.Future, job: Callable[[str, bool], Dict], arg: str) -> Dict:
+        try:
+            await asyncio.shield(previous)
+        except asyncio.CancelledError:
+            # The job before it was cancelled, not this one
+            if not previous.cancelled():
+                raise
+        except Exception:
+            pass
+        return await asyncio.get_running_loop().run_in_executor(self._executor, job, arg, True)
+
+    def _settle(self, key: str, future: asyncio.Future):
+        # A refresh job chained after this one has taken its place
+        if self._in_flight.get(key, (None,))[0] is future:
+            del self._in_flight[key]
+        if future.cancelled() or future.exception() is not None:
+            self.stats["failed_jobs"] += 1
+            if not future.cancelled():
+                logger.error(f"Job {key} failed: {future.exception()}")
+            return
+        if future.result().get("source") == "disk":
+            self.stats["disk_hits"] += 1
+        if future.result().get("status") == "ok":
+            self.results.put(key, future.result())
+
+    # --- Blocking jobs, run on the executor ---------------------------------------------
+
+    def _vin_job(self, vin: str, refresh: bool) -> Dict:
+        if not refresh:
+            saved = self._load_saved(vin)
+            if saved is not None:
+                return saved
+        return self.crawl_vin(vin)
+
+    def _assembly_job(self, url: str, refresh: bool) -> Dict:
+        parts = self._scrape_urls([url])[0]
+        return {"url": url, "status": "ok" if parts else "failed", "parts": parts or [], "source": "crawl"}
+
+    def _scrape_urls(self, urls: List[str], num_workers: int = 1) -> List[Optional[List[Dict]]]:
+        pool = ScraperWorkerPool(num_workers=num_workers, http_fetcher=self.http_fetcher, page_cache=self.page_cache,
+                                 extraction_mode=self.extraction_mode, driver_manager=self.drivers,
+                                 retry_policy=self.retry_policy, parse_pool=self.parse_pool)
+        return pool.run(urls)
+
+    def crawl_vin(self, vin: str) -> Dict:
+        """Search the VIN, discover its assembly pages and scrape them; blocks until done."""
+        start = time.monotonic()
+        session = self.drivers.acquire()
+        link_scraper = KiaPartsScraper(cache=self.page_cache, proxy=session.proxy, driver=session.driver,
+                                       base_url=self.base_url, retry_policy=self.retry_policy,
+                                       parse_pool=self.parse_pool)
+        try:
+            model_url = link_scraper.search_vin(vin)
+            if not model_url:
+                return {"vin": vin, "status": "invalid_vin", "parts": [], "source": "crawl"}
+            category_links = link_scraper.discover_category_links(model_url)
+            session.pages += 1
+            assembly_urls = []
+            for _, urls in link_scraper.iter_category_pages(category_links):
+                session.pages += 1
+                assembly_urls.extend(urls)
+            if self.http_fetcher:
+                self.http_fetcher.export_cookies(link_scraper.driver)
+        finally:
+            link_scraper.close()
+            self.drivers.release(session)
+
+        results = self._scrape_urls(assembly_urls, self.workers_per_vin)
+        parts = [part for rows in results if rows for part in rows]
+        result = {
+            "vin": vin,
+            "status": "ok" if parts else "failed",
+            "model_url": model_url,
+            "assemblies": len(assembly_urls),
+            "failed_urls": [url for url, rows in zip(assembly_urls, results) if rows is None],
+            "parts": parts,
+            "scraped_at": datetime.now().isoformat(timespec="seconds"),
+            "seconds": round(time.monotonic() - start, 1),
+            "source": "crawl",
+        }
+        logger.info(f"Crawled {vin}: {len(parts)} parts from {len(assembly_urls)} assembly pages "
+                    f"in {result['seconds']:.0f}s")
+        if parts and self.output_dir:
+            self._save(result)
+        return result
+
+    def _save(self, result: Dict):
+        vin_dir = os.path.join(self.output_dir, result["vin"])
+        os.makedirs(vin_dir, exist_ok=True)
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        json_file = os.path.join(vin_dir, f"kia_parts_data_{timestamp}.json")
+        write_part_outputs(result["parts"], os.path.join(vin_dir, f"kia_parts_data_{timestamp}.csv"),
+                           os.path.join(vin_dir, f"kia_parts_compressed_{timestamp}.csv"), json_file)
+        logger.info(f"Saved {result['vin']} to {json_file}")
+
+    def _load_saved(self, vin: str) -> Optional[Dict]:
+        """The VIN's newest JSON backup under ``output_dir`` if it is younger than ``cache_ttl``."""
+        if not self.output_dir:
+            return None
+        paths = glob.glob(os.path.join(self.output_dir, vin, "kia_parts_data_*.json"))
+        if not paths:
+            return None
+        path = max(paths, key=os.path.getmtime)
+        modified = os.path.getmtime(path)
+        if time.time() - modified > self.cache_ttl:
+            return None
+        try:
+            parts = list(iter_json_array(path))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable {path}: {e}")
+            return None
+        return {
+            "vin": vin,
+            "status": "ok" if parts else "failed",
+            "parts": parts,
+            "scraped_at": datetime.fromtimestamp(modified).isoformat(timespec="seconds"),
+            "source": "disk",
+            "path": path,
+        }
+
+    def status(self) -> Dict:
+        return {
+            "stats": dict(self.stats),
+            "cached_results": len(self.results),
+            "in_flight": sorted(self._in_flight),
+            "browsers": self.drivers.summary(),
+        }
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+# --- HTTP/JSON front end -------------------------------------------------------------
+
+REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           500: "Internal Server Error"}
+
+
+class PartsHTTPServer:
+    """Minimal HTTP/1.1 JSON server for a ``PartsService`` on asyncio streams.
+
+    ``GET /vin/<VIN>`` returns the VIN's result, ``GET /assembly?url=<page URL>``
+    one assembly page's rows and ``GET /status`` the service counters. Add
+    ``refresh=1`` to skip cached results and ``wait=0`` to get a 202 while a
+    crawl runs instead of waiting for it. The ``X-Cache`` header says where
+    a result came from. Every response closes the connection.
+    """
+
+    def __init__(self, service: PartsService, host: str = "127.0.0.1", port: int = 8765):
+        self.service = service
+        self.host = host
+        self.port = port
+        self._server: Optional[asyncio.AbstractServer] = None
+        # Encoded bodies of cached results, so repeat requests skip JSON encoding
+        self._bodies: Dict[str, Tuple[Dict, bytes]] = {}
+
+    async def start(self) -> str:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return f"http://{self.host}:{self.port}"
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            # Headers are not needed; read past them
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            status, body, headers = await self._route(request_line)
+        except Exception as e:
+            logger.error(f"Request failed: {e}")
+            status, body, headers = 500, json.dumps({"error": str(e)}).encode(), {}
+        head = [f"HTTP/1.1 {status} {REASONS.get(status, '')}", "Content-Type: application/json",
+                f"Content-Length: {len(body)}", "Connection: close"]
+        head += [f"{name}: {value}" for name, value in headers.items()]
+        try:
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def _route(self, request_line: List[str]) -> Tuple[int, bytes, Dict[str, str]]:
+        if len(request_line) < 2:
+            return 400, b'{"error": "bad request line"}', {}
+        if request_line[0] != "GET":
+            return 405, b'{"error": "only GET is supported"}', {}
+        target = urlsplit(request_line[1])
+        query = {key: values[-1] for key, values in parse_qs(target.query).items()}
+        refresh = query.get("refresh") in ("1", "true", "yes")
+        wait = query.get("wait") not in ("0", "false", "no")
+
+        try:
+            if target.path.startswith("/vin/"):
+                key = target.path[len("/vin/"):]
+                result, how = await self.service.lookup_vin(key, refresh, wait)
+            elif target.path == "/assembly" and "url" in query:
+                key = query["url"]
+                result, how = await self.service.lookup_assembly(key, refresh, wait)
+            elif target.path == "/status":
+                status = self.service.status()
+                metrics = get_metrics()
+                if metrics:
+                    status["metrics"] = metrics.to_dict()
+                return 200, json.dumps(status, indent=4).encode(), {}
+            else:
+                return 404, b'{"error": "use /vin/<VIN>, /assembly?url=... or /status"}', {}
+        except ValueError as e:
+            return 400, json.dumps({"error": str(e)}).encode(), {}
+
+        if how == "running":
+            return 202, json.dumps(result).encode(), {"X-Cache": how}
+        return 200, self._encode(f"{target.path}?{key}", result), {"X-Cache": how}
+
+    def _encode(self, key: str, result: Dict) -> bytes:
+        cached = self._bodies.get(key)
+        if cached is not None and cached[0] is result:
+            return cached[1]
+        body = json.dumps(result).encode()
+        self._bodies[key] = (result, body)
+        # Bodies of results the service no longer caches are dropped
+        if len(self._bodies) > self.service.results.max_entries:
+            self._bodies.pop(next(iter(self._bodies)))
+        return body
+
+
+async def serve(service: PartsService, host: str, port: int):
+    server = PartsHTTPServer(service, host, port)
+    url = await server.start()
+    logger.info(f"Serving parts on {url} (GET /vin/<VIN>, /assembly?url=..., /status)")
+    await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve Kia parts lookups over HTTP/JSON, scraping on demand")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on (default: 8765)")
+    parser.add_argument("--max-jobs", type=int, default=2,
+                        help="VIN crawls and assembly lookups running at once (default: 2)")
+    parser.add_argument("--cache-minutes", type=float, default=24 * 60,
+                        help="How long a finished VIN result is served without crawling again, from memory or "
+                             "from its saved JSON under output/ (default: 1440)")
+    parser.add_argument("--max-cached", type=int, default=256,
+                        help="Results kept in memory, least recently used dropped first (default: 256)")
+    parser.add_argument("--base-url", default=BASE_URL,
+                        help="Site to scrape, e.g. a local standin_site.py (default: parts.kia.com)")
+    add_scrape_arguments(parser)
+    args = parser.parse_args()
+    check_scrape_arguments(parser, args)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    set_default_limits(initial_rate=args.rate, max_rate=args.max_rate)
+    set_default_backend(args.parser)
+    if args.metrics:
+        enable_metrics()
+    parse_pool = open_parse_pool(args)
+    proxy_pool = open_proxy_pool(args)
+    http_fetcher = None if args.browser_only else HttpPageFetcher(proxy_pool=proxy_pool)
+    drivers = open_driver_manager(args, proxy_pool)
+    page_cache = None if args.no_cache else open_page_cache(args, DEFAULT_OUTPUT_DIR)
+    service = PartsService(drivers, http_fetcher=http_fetcher, page_cache=page_cache,
+                           retry_policy=open_retry_policy(args), parse_pool=parse_pool, extraction_mode=args.extract,
+                           workers_per_vin=args.workers, max_jobs=args.max_jobs, cache_ttl=args.cache_minutes * 60,
+                           max_cached=args.max_cached, output_dir=DEFAULT_OUTPUT_DIR, base_url=args.base_url)
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        logger.info("Service stopped")
+    finally:
+        service.close()
+        drivers.close()
+        if http_fetcher:
+            http_fetcher.close()
+        if proxy_pool:
+            proxy_pool.stop()
+        if parse_pool:
+            parse_pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+from typing import Dict, List, Optional
+
+import requests
+
+from http_fetcher import is_challenge_page
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROXIES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "proxies.txt")
+DEFAULT_SCORES_FILE = os.path.abspath(".proxy_scores.json")
+DEFAULT_PROBE_URL = "https://parts.kia.com/"
+
+
+def load_proxies(proxies_file: str) -> List[str]:
+    """Read one proxy URL per line, skipping blanks and comments; bare host:port means http://."""
+    proxies = []
+    with open(proxies_file, 'r') as f:
+        for line in f:
+            proxy = line.split("#", 1)[0].strip()
+            if not proxy:
+                continue
+            if "://" not in proxy:
+                proxy = f"http://{proxy}"
+            if proxy not in proxies:
+                proxies.append(proxy)
+    return proxies
+
+
+class ProxyHealth:
+    """Observed health of one proxy, kept as moving averages so old results fade out."""
+
+    ALPHA = 0.2
+
+    def __init__(self, proxy: str):
+        self.proxy = proxy
+        # Unknown proxies start out looking healthy so they get tried
+        self.success_rate = 1.0
+        self.challenge_rate = 0.0
+        self.latency = 0.0
+        self.samples = 0
+        self.consecutive_failures = 0
+        self.strikes = 0
+        self.quarantined_until = 0.0
+        self.in_use = 0
+
+    def score(self) -> float:
+        """Higher is better: success rate, discounted by challenges and by latency in seconds."""
+        return self.success_rate * (1 - self.challenge_rate) / (1 + self.latency / 5)
+
+    def observe(self, ok: bool, challenge: bool = False, latency: Optional[float] = None):
+        self.samples += 1
+        self.success_rate += self.ALPHA * ((1.0 if ok else 0.0) - self.success_rate)
+        self.challenge_rate += self.ALPHA * ((1.0 if challenge else 0.0) - self.challenge_rate)
+        if latency is not None:
+            self.latency = latency if self.samples == 1 else self.latency + self.ALPHA * (latency - self.latency)
+
+    def quarantined(self, now: float) -> bool:
+        return self.quarantined_until > now
+
+    def to_dict(self) -> Dict:
+        return {
+            "success_rate": round(self.success_rate, 4),
+            "challenge_rate": round(self.challenge_rate, 4),
+            "latency": round(self.latency, 3),
+            "samples": self.samples,
+            "consecutive_failures": self.consecutive_failures,
+            "strikes": self.strikes,
+            "quarantined_until": self.quarantined_until,
+        }
+
+    def update_from(self, saved: Dict):
+        for key, value in saved.items():
+            if hasattr(self, key):
+                setattr(self, key, value)
+
+
+class ProxyPool:
+    """Health-scored pool of proxies shared by browser and HTTP workers.
+
+    ``acquire()`` hands out a proxy that is not quarantined, picking among the
+    least busy ones weighted by score; it returns None when every proxy is
+    quarantined, meaning "connect directly". Callers report each
+    request with ``record_success``/``record_failure``/``record_challenge`` and
+    give the proxy back with ``release``. ``max_failures`` failures in a row
+    quarantine a proxy for ``base_cooldown`` seconds, doubling with every
+    repeat offence up to ``max_cooldown``. A background thread re-probes
+    proxies whose cooldown ran out before they get traffic again. Health is
+    saved to ``scores_file`` so the next run starts from what this one learned.
+    """
+
+    def __init__(self, proxies: List[str], scores_file: Optional[str] = DEFAULT_SCORES_FILE,
+                 max_failures: int = 3, base_cooldown: float = 60, max_cooldown: float = 3600,
+                 probe_url: str = DEFAULT_PROBE_URL, probe_interval: float = 15, probe_timeout: float = 10):
+        if not proxies:
+            raise ValueError("Proxy pool needs at least one proxy")
+        self.scores_file = scores_file
+        self.max_failures = max_failures
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        self.probe_url = probe_url
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+
+        self._health = {proxy: ProxyHealth(proxy) for proxy in proxies}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._prober: Optional[threading.Thread] = None
+        self._warned_direct = False
+        self._load_scores()
+
+    @classmethod
+    def from_file(cls, proxies_file: str = DEFAULT_PROXIES_FILE, **kwargs) -> "ProxyPool":
+        return cls(load_proxies(proxies_file), **kwargs)
+
+    # --- Persistence -----------------------------------------------------------------
+
+    def _load_scores(self):
+        if not self.scores_file or not os.path.exists(self.scores_file):
+            return
+        try:
+            with open(self.scores_file, 'r') as f:
+                saved = json.load(f)
+        except Exception as e:
+            logger.warning(f"Could not read proxy scores from {self.scores_file}: {e}")
+            return
+        for proxy, health in self._health.items():
+            if proxy in saved:
+                health.update_from(saved[proxy])
+        logger.info(f"Loaded scores for {sum(p in saved for p in self._health)}/{len(self._health)} proxies")
+
+    def save(self):
+        if not self.scores_file:
+            return
+        with self._lock:
+            data = {proxy: health.to_dict() for proxy, health in self._health.items()}
+        try:
+            tmp_file = f"{self.scores_file}.tmp"
+            with open(tmp_file, 'w') as f:
+                json.dump(data, f, indent=4)
+            os.replace(tmp_file, self.scores_file)
+        except Exception as e:
+            logger.warning(f"Could not save proxy scores to {self.scores_file}: {e}")
+
+    # --- Assignment ------------------------------------------------------------------
+
+    def _usable(self, health: ProxyHealth, now: float) -> bool:
+        if health.quarantined(now):
+            return False
+        # Without the prober, an expired cooldown is the only way back in
+        return health.strikes == 0 or health.consecutive_failures < self.max_failures or self._prober is None
+
+    def acquire(self, kind: str = "http") -> Optional[str]:
+        """Take an available proxy for one request or browser (``kind`` is only used for logging)."""
+        now = time.time()
+        with self._lock:
+            candidates = [h for h in self._health.values() if self._usable(h, now)]
+            if not candidates:
+                if not self._warned_direct:
+                    logger.warning(f"All {len(self._health)} proxies are quarantined, {kind} traffic goes direct")
+                    self._warned_direct = True
+                return None
+            self._warned_direct = False
+            # Spread traffic over the least busy proxies, favouring the healthier ones
+            least_busy = min(h.in_use for h in candidates)
+            candidates = [h for h in candidates if h.in_use == least_busy]
+            chosen = random.choices(candidates, weights=[max(h.score(), 0.01) ** 2 for h in candidates])[0]
+            chosen.in_use += 1
+            return chosen.proxy
+
+    def release(self, proxy: Optional[str]):
+        if proxy is None:
+            return
+        with self._lock:
+            health = self._health[proxy]
+            health.in_use = max(0, health.in_use - 1)
+
+    def is_available(self, proxy: Optional[str]) -> bool:
+        """False once ``proxy`` has been quarantined; a worker holding it should switch."""
+        if proxy is None:
+            return True
+        with self._lock:
+            return self._usable(self._health[proxy], time.time())
+
+    # --- Outcomes --------------------------------------------------------------------
+
+    def record_success(self, proxy: Optional[str], latency: Optional[float] = None):
+        if proxy is None:
+            return
+        with self._lock:
+            health = self._health[proxy]
+            health.observe(True, latency=latency)
+            health.consecutive_failures = 0
+            health.strikes = 0
+
+    def record_failure(self, proxy: Optional[str], reason: str, latency: Optional[float] = None):
+        self._record_bad(proxy, reason, challenge=False, latency=latency)
+
+    def record_challenge(self, proxy: Optional[str], latency: Optional[float] = None):
+        self._record_bad(proxy, "challenge page", challenge=True, latency=latency)
+
+    def _record_bad(self, proxy: Optional[str], reason: str, challenge: bool, latency: Optional[float]):
+        if proxy is None:
+            return
+        with self._lock:
+            health = self._health[proxy]
+            health.observe(False, challenge=challenge, latency=latency)
+            health.consecutive_failures += 1
+            if health.consecutive_failures >= self.max_failures and not health.quarantined(time.time()):
+                self._quarantine(health, reason)
+
+    def _quarantine(self, health: ProxyHealth, reason: str):
+        cooldown = min(self.base_cooldown * (2 ** health.strikes), self.max_cooldown)
+        health.strikes += 1
+        health.quarantined_until = time.time() + cooldown
+        logger.warning(f"Quarantining proxy {health.proxy} for {cooldown:.0f}s after "
+                       f"{health.consecutive_failures} failures ({reason}), score {health.score():.2f}")
+
+    # --- Re-probing ------------------------------------------------------------------
+
+    def start_probing(self):
+        """Re-probe quarantined proxies in a background thread once their cooldown expires."""
+        if self._prober is not None:
+            return
+        self._stop.clear()
+        self._prober = threading.Thread(target=self._probe_loop, name="proxy-prober", daemon=True)
+        self._prober.start()
+
+    def _probe_loop(self):
+        while not self._stop.wait(self.probe_interval):
+            now = time.time()
+            with self._lock:
+                due = [h.proxy for h in self._health.values()
+                       if h.strikes and h.consecutive_failures >= self.max_failures and not h.quarantined(now)]
+            for proxy in due:
+                if self._stop.is_set():
+                    return
+                self.probe(proxy)
+            if due:
+                self.save()
+
+    def probe(self, proxy: str) -> bool:
+        """Send one request through ``proxy``; on success it rejoins the pool, otherwise its cooldown doubles."""
+        start = time.monotonic()
+        try:
+            response = requests.get(self.probe_url, proxies={"http": proxy, "https": proxy},
+                                    timeout=self.probe_timeout)
+            challenge = is_challenge_page(response.status_code, response.headers, response.text)
+            ok = response.status_code < 500 and not challenge
+        except requests.RequestException as e:
+            challenge, ok = False, False
+            logger.debug(f"Probe through {proxy} failed: {e}")
+        latency = time.monotonic() - start
+
+        with self._lock:
+            health = self._health[proxy]
+            health.observe(ok, challenge=challenge, latency=latency)
+            if ok:
+                # Back on probation: the next real failures quarantine it again
+                health.consecutive_failures = self.max_failures - 1
+                logger.info(f"Proxy {proxy} passed its probe in {latency:.1f}s, back in the pool")
+            else:
+                self._quarantine(health, "probe failed")
+        return ok
+
+    def stop(self):
+        """Stop the prober and persist the scores."""
+        self._stop.set()
+        if self._prober is not None:
+            self._prober.join(timeout=self.probe_timeout + 1)
+            self._prober = None
+        self.save()
+
+    def summary(self) -> str:
+        now = time.time()
+        with self._lock:
+            healthy = sum(1 for h in self._health.values() if not h.quarantined(now))
+            best = max(self._health.values(), key=lambda h: h.score())
+        return f"{healthy}/{len(self._health)} proxies healthy, best {best.proxy} (score {best.score():.2f})"
@@ -0,0 +1,134 @@
+import logging
+import random
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+from metrics import observe
+
+logger = logging.getLogger(__name__)
+
+# Defaults used for limiters created through get_rate_limiter(); roughly the
+# old fixed 3-7 second delay to start with.
+DEFAULT_LIMITS = {
+    "initial_rate": 0.2,
+    "min_rate": 0.05,
+    "max_rate": 1.0,
+}
+
+
+def check_limits(initial_rate: float, min_rate: float, max_rate: float):
+    """Raise ValueError unless 0 < min_rate <= initial_rate <= max_rate."""
+    if not 0 < min_rate <= initial_rate <= max_rate:
+        raise ValueError(f"Rates must satisfy 0 < min_rate ({min_rate:g}) <= initial_rate ({initial_rate:g}) "
+                         f"<= max_rate ({max_rate:g})")
+
+
+class AdaptiveRateLimiter:
+    """Token bucket whose rate adapts AIMD-style to how the host responds.
+
+    Every clean, fast response adds ``increase_step`` requests/sec to the rate;
+    every back-off signal (timeout, empty page, challenge) multiplies it by
+    ``decrease_factor``.
+    """
+
+    def __init__(self, host: str, initial_rate: float = 0.2, min_rate: float = 0.05,
+                 max_rate: float = 1.0, burst: float = 1.0, increase_step: float = 0.02,
+                 decrease_factor: float = 0.5, slow_response: float = 10.0,
+                 jitter: float = 0.25, log_every: int = 10):
+        check_limits(initial_rate, min_rate, max_rate)
+        self.host = host
+        self.rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.slow_response = slow_response
+        self.jitter = jitter
+        self.log_every = log_every
+
+        self.requests = 0
+        self.backoffs = 0
+
+        self._tokens = burst
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Block until the next request to this host may be sent; return the time waited."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+            self._last_refill = now
+            # Take the token even if it is not there yet; the deficit is our place in line
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            wait += random.uniform(0, self.jitter / self.rate)
+
+            self.requests += 1
+            if self.log_every and self.requests % self.log_every == 0:
+                logger.info(f"Rate limiter [{self.host}]: {self.rate:.3f} req/s after "
+                            f"{self.requests} requests, {self.backoffs} back-offs")
+
+        time.sleep(wait)
+        observe("rate_limit_wait", wait)
+        return wait
+
+    def record_success(self, latency: float):
+        """Additive increase, but only for responses that came back quickly."""
+        if latency > self.slow_response:
+            logger.info(f"Rate limiter [{self.host}]: slow response ({latency:.1f}s), holding at {self.rate:.3f} req/s")
+            return
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase_step)
+
+    def record_backoff(self, reason: str):
+        """Multiplicative decrease and drop any saved-up tokens."""
+        with self._lock:
+            old_rate = self.rate
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+            self._tokens = min(self._tokens, 0.0)
+            self.backoffs += 1
+        logger.warning(f"Rate limiter [{self.host}]: back-off ({reason}), "
+                       f"{old_rate:.3f} -> {self.rate:.3f} req/s")
+
+
+_limiters: Dict[str, AdaptiveRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def set_default_limits(initial_rate: Optional[float] = None, min_rate: Optional[float] = None,
+                       max_rate: Optional[float] = None):
+    """Change the settings used for limiters created from now on.
+
+    Raises ValueError, leaving the settings unchanged, if the result would be
+    rejected by every limiter created with it.
+    """
+    check_limits(DEFAULT_LIMITS["initial_rate"] if initial_rate is None else initial_rate,
+                 DEFAULT_LIMITS["min_rate"] if min_rate is None else min_rate,
+                 DEFAULT_LIMITS["max_rate"] if max_rate is None else max_rate)
+    if initial_rate is not None:
+        DEFAULT_LIMITS["initial_rate"] = initial_rate
+    if min_rate is not None:
+        DEFAULT_LIMITS["min_rate"] = min_rate
+    if max_rate is not None:
+        DEFAULT_LIMITS["max_rate"] = max_rate
+
+
+def get_rate_limiter(url_or_host: str, via: Optional[str] = None) -> AdaptiveRateLimiter:
+    """Return the limiter shared by every worker talking to this host.
+
+    Traffic sent through a proxy (``via``) leaves from another IP, so it gets
+    a limiter of its own per proxy.
+    """
+    host = urlparse(url_or_host).netloc or url_or_host
+    if via:
+        host = f"{host} via {urlparse(via).netloc or via}"
+    with _limiters_lock:
+        limiter = _limiters.get(host)
+        if limiter is None:
+            limiter = AdaptiveRateLimiter(host, **DEFAULT_LIMITS)
+            _limiters[host] = limiter
+        return limiter
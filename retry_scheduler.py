@@ -0,0 +1,281 @@
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, Generic, List, Optional, TypeVar
+from urllib.parse import urlparse
+
+from http_fetcher import is_challenge_page
+from metrics import inc, observe
+
+logger = logging.getLogger(__name__)
+
+# How a failed page load is treated
+TRANSIENT = "transient"    # timeouts, dropped connections, 5xx: worth another try later
+CHALLENGE = "challenge"    # Cloudflare interstitial: retry, but give the host more time
+PERMANENT = "permanent"    # 404/410 and similar: the page will not get better
+
+# Status of the last navigation as Chrome saw it (0 when unknown, e.g. older Chrome)
+NAVIGATION_STATUS_SCRIPT = """
+var nav = performance.getEntriesByType('navigation')[0];
+return nav && nav.responseStatus ? nav.responseStatus : 0;
+"""
+
+PERMANENT_STATUSES = (400, 401, 404, 410)
+
+
+def classify_status(status_code: int) -> str:
+    """Failure kind for an HTTP status code that did not give us a page."""
+    if status_code in PERMANENT_STATUSES:
+        return PERMANENT
+    if status_code in (403, 429):
+        return CHALLENGE
+    return TRANSIENT
+
+
+def classify_page_failure(driver) -> str:
+    """Failure kind for a browser page that produced no part rows, judged from what it is showing."""
+    try:
+        if is_challenge_page(200, {}, driver.page_source):
+            return CHALLENGE
+        status = driver.execute_script(NAVIGATION_STATUS_SCRIPT) or 0
+    except Exception:
+        # A browser that cannot answer is restarted; the page itself is fine to retry
+        return TRANSIENT
+    return classify_status(status) if status >= 400 else TRANSIENT
+
+
+class RetryPolicy:
+    """How often and how long to wait before a failed page is tried again.
+
+    Delays grow exponentially from ``base_delay`` and are drawn uniformly
+    below that bound ("full jitter"), so workers that failed together do not
+    retry together. Challenge pages wait ``challenge_factor`` times longer.
+    Permanent failures are never retried.
+    """
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 5.0, max_delay: float = 120.0,
+                 challenge_factor: float = 4.0):
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.challenge_factor = challenge_factor
+
+    def should_retry(self, kind: str, attempt: int) -> bool:
+        """Whether a page that failed on its ``attempt``-th try (1-based) gets another one."""
+        return kind != PERMANENT and attempt < self.max_attempts
+
+    def delay(self, kind: str, attempt: int) -> float:
+        bound = self.base_delay * 2 ** (attempt - 1)
+        if kind == CHALLENGE:
+            bound *= self.challenge_factor
+        return random.uniform(0, min(self.max_delay, bound))
+
+
+T = TypeVar("T")
+
+
+class RetryQueue(Generic[T]):
+    """Work queue whose items can come back after a delay.
+
+    Items may keep arriving while workers consume them; ``close()`` marks the
+    end of the input. ``get()`` blocks while more input may come, retries are
+    still waiting or other workers are busy (their items may yet be retried),
+    and returns None once the queue is closed and nothing is queued, waiting
+    or in flight. Every item handed out must be given back through
+    ``done()``, ``retry()`` or ``requeue()``.
+
+    With ``maxsize``, ``put()`` waits while that many items are ready, so a
+    fast producer cannot run far ahead of the workers.
+    """
+
+    def __init__(self, maxsize: int = 0):
+        self.maxsize = maxsize
+        self._ready: "deque[T]" = deque()
+        self._delayed: List = []
+        self._in_flight = 0
+        self._closed = False
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def put(self, item: T, block: bool = True, timeout: Optional[float] = None) -> bool:
+        """Add ``item``; return False if the queue stayed full for ``timeout`` seconds."""
+        with self._cond:
+            if block and self.maxsize:
+                if not self._cond.wait_for(lambda: len(self._ready) < self.maxsize, timeout):
+                    return False
+            self._ready.append(item)
+            self._cond.notify_all()
+            return True
+
+    def close(self):
+        """No more items will be put; idle workers may stop once the rest is done."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def get(self) -> Optional[T]:
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                while self._delayed and self._delayed[0][0] <= now:
+                    self._ready.append(heapq.heappop(self._delayed)[2])
+                if self._ready:
+                    self._in_flight += 1
+                    # Room for a waiting producer
+                    self._cond.notify_all()
+                    return self._ready.popleft()
+                if self._closed and not self._delayed and not self._in_flight:
+                    return None
+                self._cond.wait(self._delayed[0][0] - now if self._delayed else None)
+
+    def done(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def retry(self, item: T, delay: float):
+        """Hand ``item`` back to be picked up again in ``delay`` seconds."""
+        with self._cond:
+            self._in_flight -= 1
+            heapq.heappush(self._delayed, (time.monotonic() + delay, next(self._seq), item))
+            self._cond.notify_all()
+
+    def requeue(self, item: T):
+        """Hand ``item`` back untouched, e.g. when its worker is giving up."""
+        with self._cond:
+            self._in_flight -= 1
+            self._ready.appendleft(item)
+            self._cond.notify_all()
+
+    def drain(self) -> List[T]:
+        """Remove and return everything still queued or waiting."""
+        with self._cond:
+            items = list(self._ready) + [entry[2] for entry in sorted(self._delayed)]
+            self._ready.clear()
+            self._delayed = []
+            self._cond.notify_all()
+            return items
+
+
+class CircuitBreaker:
+    """Pauses every worker talking to a host when too many recent pages failed.
+
+    The breaker trips once at least ``failure_threshold`` of the last
+    ``window`` outcomes (and ``min_requests`` of them) were failures. While
+    open, ``before_request()`` blocks. After ``cooldown`` seconds one caller
+    is let through as a probe and the rest keep waiting: a successful probe
+    closes the breaker, a failed one reopens it for twice as long, up to
+    ``max_cooldown``.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+    def __init__(self, host: str, failure_threshold: float = 0.5, window: int = 20, min_requests: int = 8,
+                 cooldown: float = 60.0, max_cooldown: float = 900.0):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.window = window
+        self.min_requests = min_requests
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+
+        self.state = self.CLOSED
+        self.trips = 0
+        self._outcomes: "deque[bool]" = deque(maxlen=window)
+        self._current_cooldown = cooldown
+        self._open_until = 0.0
+        # Thread whose request is the probe while half-open
+        self._probe: Optional[int] = None
+        self._cond = threading.Condition()
+
+    def before_request(self) -> float:
+        """Block until a request to this host may go out; return the time waited."""
+        start = time.monotonic()
+        with self._cond:
+            while True:
+                if self.state == self.CLOSED:
+                    break
+                now = time.monotonic()
+                if self.state == self.OPEN and now >= self._open_until:
+                    self.state = self.HALF_OPEN
+                    self._probe = None
+                if self.state == self.HALF_OPEN and self._probe is None:
+                    self._probe = threading.get_ident()
+                    logger.info(f"Circuit breaker [{self.host}]: sending a probe request")
+                    break
+                self._cond.wait(self._open_until - now if self.state == self.OPEN else None)
+        waited = time.monotonic() - start
+        if waited > 0.001:
+            observe("circuit_breaker_wait", waited)
+        return waited
+
+    def record(self, success: bool):
+        """Report how a request let through by ``before_request()`` went."""
+        with self._cond:
+            if self.state == self.HALF_OPEN and self._probe == threading.get_ident():
+                self._probe = None
+                if success:
+                    logger.info(f"Circuit breaker [{self.host}]: probe succeeded, resuming")
+                    self.state = self.CLOSED
+                    self._outcomes.clear()
+                    self._current_cooldown = self.cooldown
+                else:
+                    self._current_cooldown = min(self.max_cooldown, self._current_cooldown * 2)
+                    self._open("probe failed")
+                self._cond.notify_all()
+                return
+            self._outcomes.append(success)
+            if self.state == self.CLOSED and len(self._outcomes) >= self.min_requests:
+                failures = self._outcomes.count(False)
+                if failures >= self.failure_threshold * len(self._outcomes):
+                    self._open(f"{failures}/{len(self._outcomes)} recent pages failed")
+
+    def abandon(self):
+        """Give back a request that never reached the host, so another caller can probe instead."""
+        with self._cond:
+            if self.state == self.HALF_OPEN and self._probe == threading.get_ident():
+                self._probe = None
+                self._cond.notify_all()
+
+    def _open(self, reason: str):
+        self.state = self.OPEN
+        self.trips += 1
+        self._open_until = time.monotonic() + self._current_cooldown
+        inc("circuit_breaker_trips", host=self.host)
+        logger.warning(f"Circuit breaker [{self.host}]: open ({reason}), pausing requests for "
+                       f"{self._current_cooldown:.0f}s")
+
+
+# Settings used for breakers created through get_circuit_breaker()
+DEFAULT_BREAKER = {
+    "failure_threshold": 0.5,
+    "cooldown": 60.0,
+}
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def set_breaker_defaults(failure_threshold: Optional[float] = None, cooldown: Optional[float] = None):
+    """Change the settings used for breakers created from now on."""
+    if failure_threshold is not None:
+        DEFAULT_BREAKER["failure_threshold"] = failure_threshold
+    if cooldown is not None:
+        DEFAULT_BREAKER["cooldown"] = cooldown
+
+
+def get_circuit_breaker(url_or_host: str) -> CircuitBreaker:
+    """Return the breaker shared by every worker talking to this host."""
+    host = urlparse(url_or_host).netloc or url_or_host
+    with _breakers_lock:
+        breaker = _breakers.get(host)
+        if breaker is None:
+            breaker = CircuitBreaker(host, **DEFAULT_BREAKER)
+            _breakers[host] = breaker
+        return breaker
@@ -0,0 +1,299 @@
+import argparse
+import difflib
+import glob
+import gzip
+import hashlib
+import json
+import os
+import re
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from checkpoint import write_part_outputs
+from page_cache import normalize_url
+
+SNAPSHOT_DIR = "snapshots"
+MANIFEST_FILE = "manifest.json"
+
+# Assembly and Assembly URL are the same on every row of a page, so they are stored once per assembly
+ROW_FIELDS = ["Part Name", "Part Number", "Price", "Quantity", "Product URL"]
+PRICE_COLUMN = ROW_FIELDS.index("Price")
+
+
+def group_records(records: Iterable[Tuple[int, str, List[Dict]]]) -> "OrderedDict[str, Dict]":
+    """Turn checkpoint records into ``{normalized url: {"url", "assembly", "rows"}}`` in page order."""
+    state: "OrderedDict[str, Dict]" = OrderedDict()
+    for _, url, parts in records:
+        state[normalize_url(url)] = {
+            "url": url,
+            "assembly": parts[0]["Assembly"] if parts else None,
+            "rows": [[part.get(field) for field in ROW_FIELDS] for part in parts],
+        }
+    return state
+
+
+def records_from_json(json_file: str) -> List[Tuple[int, str, List[Dict]]]:
+    """Checkpoint-style records from a kia_parts_data_*.json snapshot, one per assembly URL."""
+    with open(json_file, 'r') as f:
+        rows = json.load(f)
+    grouped: "OrderedDict[str, List[Dict]]" = OrderedDict()
+    for row in rows:
+        grouped.setdefault(row["Assembly URL"], []).append(row)
+    return [(index, url, parts) for index, (url, parts) in enumerate(grouped.items())]
+
+
+def fingerprint(entry: Dict) -> str:
+    """Hash of an assembly's name and rows; the volatile search GUID in its URL is left out."""
+    payload = json.dumps([entry["assembly"], entry["rows"]], separators=(",", ":"))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _row_identity(row: List) -> Tuple:
+    return tuple(value for column, value in enumerate(row) if column != PRICE_COLUMN)
+
+
+def diff_rows(old: List[List], new: List[List]) -> Dict:
+    """Describe ``new`` relative to ``old`` as removed indices, added rows and price changes.
+
+    ``removed`` holds indices into ``old``; ``added`` and ``prices`` hold
+    indices into ``new``, so applying them in order rebuilds ``new`` exactly.
+    """
+    change = {"removed": [], "added": [], "prices": []}
+    matcher = difflib.SequenceMatcher(a=[_row_identity(r) for r in old], b=[_row_identity(r) for r in new],
+                                      autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            for i, j in zip(range(i1, i2), range(j1, j2)):
+                if old[i][PRICE_COLUMN] != new[j][PRICE_COLUMN]:
+                    change["prices"].append([j, old[i][PRICE_COLUMN], new[j][PRICE_COLUMN]])
+        else:
+            change["removed"].extend(range(i1, i2))
+            change["added"].extend([j, new[j]] for j in range(j1, j2))
+    return change
+
+
+def apply_rows(old: List[List], change: Dict) -> List[List]:
+    removed = set(change["removed"])
+    rows = [list(row) for i, row in enumerate(old) if i not in removed]
+    for j, row in change["added"]:
+        rows.insert(j, row)
+    for j, _, price in change["prices"]:
+        rows[j][PRICE_COLUMN] = price
+    return rows
+
+
+def _write_gz(path: str, data: Dict):
+    tmp_path = f"{path}.tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def _read_gz(path: str) -> Dict:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return json.load(f, object_pairs_hook=OrderedDict)
+
+
+class SnapshotStore:
+    """Per-VIN history of runs kept as periodic full snapshots plus deltas against the previous run.
+
+    Everything lives in ``<vin dir>/snapshots/``: ``full_<run>.json.gz``,
+    ``delta_<run>.json.gz`` and ``manifest.json``, which lists every run with
+    the full snapshot it builds on and the per-assembly fingerprints of the
+    newest run.
+    """
+
+    def __init__(self, vin_dir: str, full_every: int = 10):
+        self.directory = os.path.join(vin_dir, SNAPSHOT_DIR)
+        self.full_every = full_every
+        self.manifest_file = os.path.join(self.directory, MANIFEST_FILE)
+        os.makedirs(self.directory, exist_ok=True)
+        if os.path.exists(self.manifest_file):
+            with open(self.manifest_file, 'r') as f:
+                self.manifest = json.load(f, object_pairs_hook=OrderedDict)
+        else:
+            self.manifest = {"runs": [], "fingerprints": {}}
+
+    @property
+    def runs(self) -> List[str]:
+        return [entry["run"] for entry in self.manifest["runs"]]
+
+    def _save_manifest(self):
+        tmp_path = f"{self.manifest_file}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.manifest, f, indent=4)
+        os.replace(tmp_path, self.manifest_file)
+
+    def record_run(self, run_id: str, records: Iterable[Tuple[int, str, List[Dict]]]) -> Dict:
+        """Store a finished run and return its manifest entry with change counts."""
+        if self.runs and self.runs[-1] == run_id:
+            # A resumed run that already got this far; replace its entry
+            self._drop_last()
+
+        state = group_records(records)
+        fingerprints = {key: fingerprint(entry) for key, entry in state.items()}
+        previous_fingerprints = self.manifest["fingerprints"]
+        last_full = next((e for e in reversed(self.manifest["runs"]) if e["kind"] == "full"), None)
+        since_full = len(self.manifest["runs"]) - self.manifest["runs"].index(last_full) if last_full else 0
+
+        entry = {
+            "run": run_id,
+            "parts": sum(len(e["rows"]) for e in state.values()),
+            "assemblies": len(state),
+            "unchanged": sum(1 for key, fp in fingerprints.items() if previous_fingerprints.get(key) == fp),
+            "changed": 0, "new": 0, "dropped": 0,
+            "added_parts": 0, "removed_parts": 0, "price_changes": 0,
+        }
+        if last_full is None or since_full >= self.full_every:
+            entry.update(kind="full", file=f"full_{run_id}.json.gz", base=run_id)
+            _write_gz(os.path.join(self.directory, entry["file"]), {"order": list(state), "assemblies": state})
+        else:
+            previous = self.materialize()
+            delta = self._delta(previous, state, fingerprints, previous_fingerprints, entry)
+            entry.update(kind="delta", file=f"delta_{run_id}.json.gz", base=last_full["run"],
+                         previous=self.runs[-1])
+            _write_gz(os.path.join(self.directory, entry["file"]), delta)
+
+        self.manifest["runs"].append(entry)
+        self.manifest["fingerprints"] = fingerprints
+        self._save_manifest()
+        return entry
+
+    @staticmethod
+    def _delta(previous: "OrderedDict[str, Dict]", state: "OrderedDict[str, Dict]", fingerprints: Dict,
+               previous_fingerprints: Dict, entry: Dict) -> Dict:
+        delta = {"assemblies": OrderedDict(), "new": OrderedDict(), "dropped": [k for k in previous if k not in state]}
+        if list(previous) != list(state):
+            delta["order"] = list(state)
+        for key, current in state.items():
+            old = previous.get(key)
+            if old is None:
+                delta["new"][key] = current
+                continue
+            change = {}
+            if old["url"] != current["url"]:
+                change["url"] = current["url"]
+            if previous_fingerprints.get(key) != fingerprints[key]:
+                if old["assembly"] != current["assembly"]:
+                    change["assembly"] = current["assembly"]
+                change.update(diff_rows(old["rows"], current["rows"]))
+                entry["changed"] += 1
+                entry["added_parts"] += len(change["added"])
+                entry["removed_parts"] += len(change["removed"])
+                entry["price_changes"] += len(change["prices"])
+            if change:
+                delta["assemblies"][key] = change
+        entry["new"] = len(delta["new"])
+        entry["dropped"] = len(delta["dropped"])
+        return delta
+
+    def _drop_last(self):
+        entry = self.manifest["runs"].pop()
+        path = os.path.join(self.directory, entry["file"])
+        if os.path.exists(path):
+            os.remove(path)
+        self.manifest["fingerprints"] = (
+            {key: fingerprint(e) for key, e in self.materialize().items()} if self.manifest["runs"] else {}
+        )
+
+    def materialize(self, run_id: Optional[str] = None) -> "OrderedDict[str, Dict]":
+        """Rebuild the assembly state of ``run_id`` (default: newest) from its full snapshot and deltas."""
+        runs = self.manifest["runs"]
+        if not runs:
+            raise ValueError("No runs recorded")
+        target = len(runs) - 1 if run_id is None else self.runs.index(run_id)
+        start = max(i for i in range(target + 1) if runs[i]["kind"] == "full")
+
+        full = _read_gz(os.path.join(self.directory, runs[start]["file"]))
+        state = OrderedDict((key, full["assemblies"][key]) for key in full["order"])
+        for entry in runs[start + 1:target + 1]:
+            delta = _read_gz(os.path.join(self.directory, entry["file"]))
+            for key in delta["dropped"]:
+                del state[key]
+            for key, change in delta["assemblies"].items():
+                old = state[key]
+                state[key] = {
+                    "url": change.get("url", old["url"]),
+                    "assembly": change.get("assembly", old["assembly"]),
+                    "rows": apply_rows(old["rows"], change) if "removed" in change else old["rows"],
+                }
+            state.update(delta["new"])
+            if "order" in delta:
+                state = OrderedDict((key, state[key]) for key in delta["order"])
+        return state
+
+    def iter_parts(self, run_id: Optional[str] = None):
+        """Part dicts of a run in the same shape as the scraper's output rows."""
+        for entry in self.materialize(run_id).values():
+            for row in entry["rows"]:
+                part = {"Assembly": entry["assembly"]}
+                part.update(zip(ROW_FIELDS, row))
+                part["Assembly URL"] = entry["url"]
+                yield part
+
+    def reconstruct(self, run_id: Optional[str] = None, output_dir: Optional[str] = None) -> Tuple[str, int]:
+        """Write a run's kia_parts_data/compressed CSV and JSON; returns (csv path, part count)."""
+        run_id = run_id or self.runs[-1]
+        output_dir = output_dir or os.path.dirname(self.directory)
+        os.makedirs(output_dir, exist_ok=True)
+        csv_file = os.path.join(output_dir, f"kia_parts_data_{run_id}.csv")
+        count = write_part_outputs(
+            self.iter_parts(run_id),
+            csv_file,
+            os.path.join(output_dir, f"kia_parts_compressed_{run_id}.csv"),
+            os.path.join(output_dir, f"kia_parts_data_{run_id}.json"),
+        )
+        return csv_file, count
+
+    def storage_bytes(self) -> int:
+        return sum(os.path.getsize(path) for path in glob.glob(os.path.join(self.directory, "*")))
+
+
+def describe(entry: Dict) -> str:
+    return (f"{entry['run']} {entry['kind']:<5} {entry['parts']:>6} parts, {entry['assemblies']} assemblies: "
+            f"{entry['unchanged']} unchanged, {entry['changed']} changed, {entry['new']} new, "
+            f"{entry['dropped']} dropped (+{entry['added_parts']}/-{entry['removed_parts']} parts, "
+            f"{entry['price_changes']} price changes)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and rebuild a VIN's delta-encoded run history")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    show = commands.add_parser("list", help="List recorded runs and their changes")
+    show.add_argument("vin_dir")
+
+    rebuild = commands.add_parser("reconstruct", help="Write the CSV/JSON snapshot of a recorded run")
+    rebuild.add_argument("vin_dir")
+    rebuild.add_argument("run", nargs="?", help="Run id (default: newest)")
+    rebuild.add_argument("--output-dir", help="Where to write the files (default: the VIN directory)")
+
+    load = commands.add_parser("import", help="Record existing kia_parts_data_*.json snapshots, oldest first")
+    load.add_argument("vin_dir")
+    load.add_argument("--full-every", type=int, default=10, help="Store a full snapshot every N runs (default: 10)")
+
+    args = parser.parse_args()
+    if args.command == "import":
+        store = SnapshotStore(args.vin_dir, full_every=args.full_every)
+        snapshot_bytes = 0
+        for json_file in sorted(glob.glob(os.path.join(args.vin_dir, "kia_parts_data_*.json"))):
+            run_id = re.search(r"kia_parts_data_(.+)\.json$", json_file).group(1)
+            if run_id in store.runs:
+                continue
+            entry = store.record_run(run_id, records_from_json(json_file))
+            snapshot_bytes += sum(os.path.getsize(path) for path in glob.glob(
+                os.path.join(args.vin_dir, f"kia_parts_*_{run_id}.*")))
+            print(describe(entry))
+        print(f"Snapshot store: {store.storage_bytes() / 1e3:.0f} kB "
+              f"(imported full CSV/JSON snapshots: {snapshot_bytes / 1e3:.0f} kB)")
+    elif args.command == "reconstruct":
+        store = SnapshotStore(args.vin_dir)
+        csv_file, count = store.reconstruct(args.run, args.output_dir)
+        print(f"Wrote {count} parts to {csv_file} and its compressed CSV/JSON")
+    else:
+        for entry in SnapshotStore(args.vin_dir).manifest["runs"]:
+            print(describe(entry))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,32 +2,46 @@ import undetected_chromedriver as uc
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from bs4 import BeautifulSoup
+from html_extract import extract_parts
 import pandas as pd
 import time
 import logging
 import os
-import random
 from datetime import datetime
-from typing import List, Dict, Optional
-import json
+from typing import List, Dict, Optional, Tuple
+import argparse
+from metrics import enable_metrics, get_metrics, inc, timer, write_run_metrics
+from rate_limiter import get_rate_limiter
+from retry_scheduler import PERMANENT, RetryPolicy, classify_page_failure, get_circuit_breaker
+from work_queue import PENDING, WorkQueue
+from checkpoint import COMPRESSED_FIELDS, PART_FIELDS, write_part_outputs
+from part_store import PartStore
+from parse_pool import ParsePool
+from http_fetcher import is_challenge_page
+from lean_browser import PageLoadStats, enable_lean_mode, page_transfer, relax_blocking
+
+BASE_URL = "https://parts.kia.com"
 
-# Create output directory if it doesn't exist
 output_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "output")
-os.makedirs(output_dir, exist_ok=True)
-
-# Set up logging
-log_filename = os.path.join(output_dir, f"kia_parts_scraper_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(log_filename),
-        logging.StreamHandler()
-    ]
-)
+
 logger = logging.getLogger(__name__)
 
+def setup_logging():
+    """Create the output directory and log to a timestamped file in it as well as the console.
+
+    Only the standalone scraper does this; modules importing its helpers keep their own logging.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    log_filename = os.path.join(output_dir, f"kia_parts_scraper_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(log_filename),
+            logging.StreamHandler()
+        ]
+    )
+
 def read_assembly_urls(filename: str) -> List[str]:
     """Read assembly URLs from file."""
     try:
@@ -42,8 +56,15 @@ def read_assembly_urls(filename: str) -> List[str]:
         logger.error(f"Error reading URLs file: {e}")
         raise
 
-def setup_driver():
-    """Initialize undetected-chromedriver with anti-detection measures."""
+def setup_driver(user_data_dir: Optional[str] = None, proxy: Optional[str] = None, lean: bool = False):
+    """Initialize undetected-chromedriver with anti-detection measures.
+
+    Pass ``user_data_dir`` to give the browser its own persistent profile,
+    e.g. when several drivers run side by side, and ``proxy`` (a URL such as
+    ``http://host:port``) to send its traffic through a proxy. ``lean`` blocks
+    images, fonts, media and trackers and returns from ``driver.get()`` once
+    the DOM is ready instead of waiting for the load event.
+    """
     options = uc.ChromeOptions()
     options.add_argument('--no-sandbox')
     options.add_argument('--window-size=1920,1080')
@@ -53,127 +74,439 @@ def setup_driver():
     # Add random user agent and other headers to appear more human-like
     options.add_argument('--disable-blink-features=AutomationControlled')
     
-    driver = uc.Chrome(options=options)
+    if proxy:
+        options.add_argument(f'--proxy-server={proxy}')
+    if lean:
+        options.page_load_strategy = 'eager'
+    
+    if user_data_dir:
+        os.makedirs(user_data_dir, exist_ok=True)
+        driver = uc.Chrome(options=options, user_data_dir=user_data_dir)
+    else:
+        driver = uc.Chrome(options=options)
     driver.set_window_size(1920, 1080)  # Full HD resolution
+    # Remembered on the driver so a challenge page can switch blocking off again
+    driver.lean_mode = lean and enable_lean_mode(driver)
     return driver
 
-def scrape_parts_from_page(driver, url: str, wait_time: int = 30) -> List[Dict]:
-    """Scrape parts data from a single page using Selenium with undetected-chromedriver."""
-    parts_data = []
-    try:
-        logger.info(f"Navigating to {url}")
-        driver.get(url)
-        
-        # Wait for the main content to load
-        wait = WebDriverWait(driver, wait_time)
-        parts_elements = wait.until(
+def parse_parts_from_html(page_source: str, url: str, assembly_name: Optional[str] = None,
+                          backend: Optional[str] = None, parse_pool: Optional[ParsePool] = None) -> List[Dict]:
+    """Parse part rows out of an assembly page's HTML.
+
+    When ``assembly_name`` is not given it is read from the last breadcrumb item.
+    ``backend`` picks the html_extract engine (bs4, strainer or lxml). With a
+    ``parse_pool`` the page is parsed in one of its worker processes instead.
+    """
+    if parse_pool is not None:
+        return parse_pool.parse_parts(page_source, url, assembly_name)
+    with timer("parse"):
+        return extract_parts(page_source, url, assembly_name, backend=backend, base_url=BASE_URL)
+
+EXTRACTION_MODES = ("html", "script", "compare")
+
+# Waits for the part rows and extracts them inside the page, so a scrape costs
+# one WebDriver round-trip after driver.get(). Text is gathered the way
+# BeautifulSoup's get_text(strip=True) does it, and the assembly name the way
+# Selenium's .text does, so rows match the page_source path.
+EXTRACT_PARTS_SCRIPT = """
+var timeoutMs = arguments[0], done = arguments[arguments.length - 1];
+var started = Date.now();
+
+function text(el) {
+    var out = [], walker = document.createTreeWalker(el, NodeFilter.SHOW_TEXT);
+    while (walker.nextNode()) {
+        var node = walker.currentNode;
+        if (node.parentNode.closest('script, style, template')) continue;
+        var t = node.nodeValue.trim();
+        if (t) out.push(t);
+    }
+    return out.join('');
+}
+function withClass(root, tag, cls) {
+    // Whole class attribute must match, like BeautifulSoup's class_="a b"
+    var els = root.getElementsByTagName(tag);
+    for (var i = 0; i < els.length; i++) {
+        if ((els[i].getAttribute('class') || '').trim().split(/\\s+/).join(' ') === cls) return els[i];
+    }
+    return null;
+}
+function extract() {
+    var rows = document.querySelectorAll('li.assemblyProdDetails');
+    if (!rows.length) return null;
+    var assembly = '', crumb = document.querySelector('ol.breadcrumb');
+    if (crumb) {
+        var items = crumb.getElementsByTagName('li');
+        if (items.length) assembly = items[items.length - 1].innerText.trim();
+    }
+    var parts = [];
+    for (var i = 0; i < rows.length; i++) {
+        var name = rows[i].querySelector('div.assemblyProductDescription');
+        var number = withClass(rows[i], 'a', 'btn btn-tertiary');
+        var price = rows[i].querySelector('div.money-4');
+        var qty = withClass(rows[i], 'input', 'form-control input-sm text-center');
+        parts.push([
+            name ? text(name) : null,
+            number ? text(number) : null,
+            price ? text(price) : null,
+            qty ? qty.getAttribute('value') : null,
+            number ? number.getAttribute('href') : null
+        ]);
+    }
+    return [assembly, parts];
+}
+(function poll() {
+    var result = extract();
+    if (result || Date.now() - started > timeoutMs) { done(result); return; }
+    setTimeout(poll, 100);
+})();
+"""
+
+def _rows_from_script(result, url: str) -> List[Dict]:
+    """Turn EXTRACT_PARTS_SCRIPT's compact result into the usual part dicts."""
+    assembly_name, rows = result
+    return [
+        {
+            "Assembly": assembly_name,
+            "Part Name": name,
+            "Part Number": number,
+            "Price": price.replace("(Current price)", "").strip() if price is not None else None,
+            "Quantity": qty,
+            "Product URL": f"{BASE_URL}{href}" if href else None,
+            "Assembly URL": url
+        }
+        for name, number, price, qty, href in rows
+    ]
+
+def _extract_with_script(driver, url: str, wait_time: int) -> List[Dict]:
+    driver.set_script_timeout(wait_time + 5)
+    with timer("script_extract"):
+        result = driver.execute_async_script(EXTRACT_PARTS_SCRIPT, wait_time * 1000)
+    if not result:
+        raise TimeoutError(f"No li.assemblyProdDetails after {wait_time}s")
+    return _rows_from_script(result, url)
+
+def _wait_for_page_source(driver, wait_time: int):
+    """Return (page_source, assembly name, time the rows appeared) once the part rows are on the page."""
+    # Wait for the main content to load
+    wait = WebDriverWait(driver, wait_time)
+    with timer("wait_rows"):
+        wait.until(
             EC.presence_of_all_elements_located((By.CSS_SELECTOR, "li.assemblyProdDetails"))
         )
-        
-        # Get assembly name if available
-        assembly_name = ""
-        try:
+    selector_time = time.perf_counter()
+    
+    # Get assembly name if available
+    assembly_name = ""
+    try:
+        with timer("breadcrumb"):
             breadcrumb = driver.find_element(By.CSS_SELECTOR, "ol.breadcrumb")
             crumbs = breadcrumb.find_elements(By.TAG_NAME, "li")
             if crumbs:
                 assembly_name = crumbs[-1].text.strip()
-        except Exception as e:
-            logger.warning(f"Could not get assembly name: {e}")
-        
-        # Parse the page with BeautifulSoup
-        soup = BeautifulSoup(driver.page_source, "html.parser")
-        parts = soup.find_all("li", class_="assemblyProdDetails")
+    except Exception as e:
+        logger.warning(f"Could not get assembly name: {e}")
+    
+    with timer("page_source"):
+        page_source = driver.page_source
+    return page_source, assembly_name, selector_time
+
+def _extract_with_page_source(driver, url: str, wait_time: int, parse_pool: Optional[ParsePool] = None):
+    """Return (parts, page_source, time the rows appeared) using WebDriverWait and html_extract."""
+    page_source, assembly_name, selector_time = _wait_for_page_source(driver, wait_time)
+    # Parse the page with the configured extraction backend
+    return parse_parts_from_html(page_source, url, assembly_name, parse_pool=parse_pool), page_source, selector_time
+
+def scrape_parts_from_page(driver, url: str, wait_time: int = 30, cache=None, mode: str = "html",
+                           load_stats: Optional[PageLoadStats] = None,
+                           parse_pool: Optional[ParsePool] = None) -> List[Dict]:
+    """Scrape parts data from a single page using Selenium with undetected-chromedriver.
+
+    If a ``PageCache`` is given, a fresh cached copy of the page is parsed
+    instead of loading it, and newly loaded pages are stored in it.
+
+    ``mode`` selects how rows are read from the loaded page: ``html`` pulls
+    ``page_source`` and parses it in Python, ``script`` extracts everything in
+    one injected script (no page source, so nothing is cached), and ``compare``
+    runs both on the same page and logs their timings side by side.
+
+    With ``load_stats``, the bytes the page transferred and the time from
+    navigation to the part rows appearing are reported to it. With a
+    ``parse_pool``, HTML is parsed in its worker processes.
+    """
+    if mode not in EXTRACTION_MODES:
+        raise ValueError(f"Unknown extraction mode {mode!r}, expected one of {', '.join(EXTRACTION_MODES)}")
+    
+    parts_data = []
+    if cache is not None:
+        page_source = cache.get(url)
+        if page_source is not None:
+            parts_data = parse_parts_from_html(page_source, url, parse_pool=parse_pool)
+            if parts_data:
+                logger.info(f"Loaded {len(parts_data)} parts from cache for {url}")
+                return parts_data
+    
+    try:
+        logger.info(f"Navigating to {url}")
+        navigation_start = time.perf_counter()
+        with timer("driver_get"):
+            driver.get(url)
         
-        for part in parts:
-            name_tag = part.find("div", class_="assemblyProductDescription")
-            number_tag = part.find("a", class_="btn btn-tertiary")
-            price_tag = part.find("div", class_="money-4")
-            qty_tag = part.find("input", {"class": "form-control input-sm text-center"})
+        if mode == "script":
+            parts_data = _extract_with_script(driver, url, wait_time)
+            selector_time = time.perf_counter()
+        else:
+            start = time.perf_counter()
+            parts_data, page_source, selector_time = _extract_with_page_source(driver, url, wait_time, parse_pool)
+            html_ms = (time.perf_counter() - start) * 1000
+            if cache is not None and parts_data:
+                cache.put(url, page_source)
             
-            part_data = {
-                "Assembly": assembly_name,
-                "Part Name": name_tag.get_text(strip=True) if name_tag else None,
-                "Part Number": number_tag.get_text(strip=True) if number_tag else None,
-                "Price": price_tag.get_text(strip=True).replace("(Current price)", "").strip() if price_tag else None,
-                "Quantity": qty_tag["value"] if qty_tag else None,
-                "Product URL": f"https://parts.kia.com{number_tag['href']}" if number_tag and number_tag.get('href') else None,
-                "Assembly URL": url
-            }
-            parts_data.append(part_data)
+            if mode == "compare":
+                start = time.perf_counter()
+                script_parts = _extract_with_script(driver, url, wait_time)
+                script_ms = (time.perf_counter() - start) * 1000
+                logger.info(f"Extraction timing: html {html_ms:.0f} ms ({len(page_source) / 1024:.0f} KB page source), "
+                            f"script {script_ms:.0f} ms, rows {'match' if script_parts == parts_data else 'DIFFER'}")
             
+        if load_stats is not None:
+            load_stats.add(url, selector_time - navigation_start, page_transfer(driver))
+        
+        assembly_name = parts_data[0]["Assembly"] if parts_data else ""
         logger.info(f"Successfully scraped {len(parts_data)} parts from assembly: {assembly_name}")
         return parts_data
         
     except Exception as e:
         logger.error(f"Error scraping {url}: {e}")
+        if getattr(driver, "lean_mode", False) and _showing_challenge(driver):
+            # Whatever the challenge needs must load; try the page again unblocked
+            relax_blocking(driver)
+            driver.lean_mode = False
+            inc("retries", reason="lean_challenge")
+            return scrape_parts_from_page(driver, url, wait_time, cache=cache, mode=mode, load_stats=load_stats,
+                                          parse_pool=parse_pool)
         return parts_data
 
+def load_assembly_page(driver, url: str, wait_time: int = 30,
+                       load_stats: Optional[PageLoadStats] = None) -> Tuple[Optional[str], str]:
+    """Load an assembly page and return (page_source, assembly name) without parsing it.
+
+    For callers that parse elsewhere (see ``ParsePool``) while the browser
+    moves on to the next page. Returns ``(None, "")`` when the part rows
+    never appeared.
+    """
+    try:
+        logger.info(f"Navigating to {url}")
+        navigation_start = time.perf_counter()
+        with timer("driver_get"):
+            driver.get(url)
+        page_source, assembly_name, selector_time = _wait_for_page_source(driver, wait_time)
+        if load_stats is not None:
+            load_stats.add(url, selector_time - navigation_start, page_transfer(driver))
+        return page_source, assembly_name
+    
+    except Exception as e:
+        logger.error(f"Error loading {url}: {e}")
+        if getattr(driver, "lean_mode", False) and _showing_challenge(driver):
+            relax_blocking(driver)
+            driver.lean_mode = False
+            inc("retries", reason="lean_challenge")
+            return load_assembly_page(driver, url, wait_time, load_stats)
+        return None, ""
+
+def _showing_challenge(driver) -> bool:
+    try:
+        return is_challenge_page(200, {}, driver.page_source)
+    except Exception:
+        return False
+
+def scrape_from_queue(work_queue: WorkQueue, queue_name: str, driver, retry_policy: Optional[RetryPolicy] = None):
+    """Lease one URL at a time from ``work_queue`` and scrape it until nothing is pending.
+
+    Requests wait out the host's circuit breaker. A page that failed is given
+    back for another try after ``retry_policy``'s delay, unless it is gone
+    (404/410 and the like), which fails it without spending more attempts.
+    """
+    retry_policy = retry_policy or RetryPolicy(max_attempts=work_queue.max_attempts)
+    while True:
+        jobs = work_queue.lease(queue_name)
+        if not jobs:
+            return
+        job = jobs[0]
+        limiter = get_rate_limiter(job.url)
+        breaker = get_circuit_breaker(job.url)
+        breaker.before_request()
+        limiter.acquire()
+        start = time.monotonic()
+        try:
+            parts_data = scrape_parts_from_page(driver, job.url)
+        except Exception as e:
+            logger.error(f"Failed to process URL {job.url}: {e}")
+            parts_data = []
+        
+        if parts_data:
+            breaker.record(True)
+            limiter.record_success(time.monotonic() - start)
+            work_queue.complete(job, parts_data)
+            inc("pages", source="browser")
+            inc("parts", len(parts_data))
+        else:
+            failure = classify_page_failure(driver)
+            # A missing page says nothing about how hard we are hitting the host
+            breaker.record(failure == PERMANENT)
+            if failure != PERMANENT:
+                limiter.record_backoff(f"no li.assemblyProdDetails, {failure}")
+            retry = retry_policy.should_retry(failure, job.attempts)
+            state = work_queue.fail(job, f"no part rows ({failure})", retry=retry)
+            logger.warning(f"No data scraped from {job.url} ({failure}, attempt {job.attempts}, now {state})")
+            if retry and state == PENDING:
+                delay = retry_policy.delay(failure, job.attempts)
+                inc("retries", reason=failure)
+                logger.info(f"Waiting {delay:.0f}s before the next URL")
+                time.sleep(delay)
+            else:
+                inc("failures", stage="assembly_page")
+        logger.info(work_queue.summary(queue_name))
+
 def main():
+    parser = argparse.ArgumentParser(description="Scrape parts data for the URLs in assembly_urls.txt")
+    parser.add_argument("--metrics", action="store_true",
+                        help="Record per-stage timings and counters and write metrics_<timestamp>.json/.prom")
+    parser.add_argument("--queue", metavar="DB",
+                        help="Lease URLs from a shared SQLite job queue, filled from assembly_urls.txt by the first "
+                             "worker, so several processes or hosts can split the list")
+    parser.add_argument("--queue-name", default="assembly_urls",
+                        help="Queue inside DB to work on (default: assembly_urls)")
+    parser.add_argument("--lease-seconds", type=float, default=600,
+                        help="How long a leased URL stays reserved for a worker that stopped reporting (default: 600)")
+    parser.add_argument("--max-attempts", type=int, default=3,
+                        help="Attempts per URL before the queue marks it failed (default: 3)")
+    parser.add_argument("--parse-workers", type=int, default=0,
+                        help="Parse pages in this many worker processes while Chrome loads the next URL "
+                             "(default: 0, parse in the browser loop)")
+    parser.add_argument("--max-in-flight", type=int,
+                        help="Pages loaded but not yet parsed before Chrome waits for the parsers "
+                             "(default: twice --parse-workers)")
+    args = parser.parse_args()
+    setup_logging()
+    if args.metrics:
+        enable_metrics()
+    work_queue = (WorkQueue(args.queue, lease_seconds=args.lease_seconds, max_attempts=args.max_attempts)
+                  if args.queue else None)
+    
     urls_file = "assembly_urls.txt"
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     output_file = os.path.join(output_dir, f"kia_parts_data_{timestamp}.csv")
     compressed_file = os.path.join(output_dir, f"kia_parts_compressed_{timestamp}.csv")
-    all_parts_data = []
+    all_parts_data = PartStore()
     successful_urls = set()
     failed_urls = set()
+    parse_pool = None
     
     try:
-        urls = read_assembly_urls(urls_file)
-        total_urls = len(urls)
-        
-        driver = setup_driver()
+        if work_queue:
+            if not work_queue.exists(args.queue_name):
+                added = work_queue.add(args.queue_name, read_assembly_urls(urls_file))
+                logger.info(f"Queued {added} URLs in {args.queue}")
+            driver = setup_driver()
+            try:
+                scrape_from_queue(work_queue, args.queue_name, driver, RetryPolicy(max_attempts=args.max_attempts))
+            finally:
+                driver.quit()
+            
+            # Whoever drains the queue writes everyone's results, named after the queue's run
+            if not work_queue.claim_finalize(args.queue_name):
+                logger.info(f"{work_queue.summary(args.queue_name)}; the worker that finishes last writes the outputs")
+                return
+            timestamp = work_queue.run_id(args.queue_name)
+            output_file = os.path.join(output_dir, f"kia_parts_data_{timestamp}.csv")
+            compressed_file = os.path.join(output_dir, f"kia_parts_compressed_{timestamp}.csv")
+            all_parts_data = PartStore(work_queue.iter_parts(args.queue_name))
+            successful_urls = {url for _, url, _ in work_queue.iter_records(args.queue_name)}
+            failed_urls = {url for url, _, _ in work_queue.failed(args.queue_name)}
+            total_urls = len(successful_urls) + len(failed_urls)
+        else:
+            urls = read_assembly_urls(urls_file)
+            total_urls = len(urls)
+            # Rows scraped since the last progress save, appended to the CSVs every 5 URLs
+            unsaved = []
+            
+            def record(i: int, url: str, parts_data: List[Dict], elapsed: float):
+                limiter = get_rate_limiter(url)
+                if parts_data:
+                    limiter.record_success(elapsed)
+                    all_parts_data.extend(parts_data)
+                    unsaved.extend(parts_data)
+                    successful_urls.add(url)
+                    inc("pages", source="browser")
+                    inc("parts", len(parts_data))
+                
+                    # Save progress periodically (every 5 URLs)
+                    if i % 5 == 0:
+                        with timer("periodic_save"):
+                            first_save = len(unsaved) == len(all_parts_data)
+                            df = pd.DataFrame(unsaved, columns=PART_FIELDS)
+                            df.to_csv(output_file, mode='w' if first_save else 'a', header=first_save, index=False)
+                            # Also save the compressed version
+                            df[COMPRESSED_FIELDS].to_csv(compressed_file, mode='w' if first_save else 'a',
+                                                         header=first_save, index=False)
+                            unsaved.clear()
+                        logger.info(f"Progress saved: {i}/{total_urls} URLs processed")
+                else:
+                    limiter.record_backoff("no li.assemblyProdDetails")
+                    failed_urls.add(url)
+                    inc("failures", stage="assembly_page")
+                    logger.warning(f"No data scraped from {url}")
+            
+            if args.parse_workers:
+                # Started before Chrome so the worker processes are forked from a single thread
+                parse_pool = ParsePool(args.parse_workers, args.max_in_flight)
+                logger.info(f"Parsing pages in {parse_pool.workers} worker processes, "
+                            f"at most {parse_pool.max_in_flight} pages in flight")
+            driver = setup_driver()
         
-        try:
-            # Process each URL
-            for i, url in enumerate(urls, 1):
-                try:
-                    logger.info(f"Processing URL {i}/{total_urls}")
-                    parts_data = scrape_parts_from_page(driver, url)
-                    
-                    if parts_data:
-                        all_parts_data.extend(parts_data)
-                        successful_urls.add(url)
+            try:
+                # Process each URL
+                for i, url in enumerate(urls, 1):
+                    try:
+                        logger.info(f"Processing URL {i}/{total_urls}")
+                        limiter = get_rate_limiter(url)
+                        limiter.acquire()
+                        start = time.monotonic()
+                        if parse_pool is None:
+                            record(i, url, scrape_parts_from_page(driver, url), time.monotonic() - start)
+                            continue
                         
-                        # Save progress periodically (every 5 URLs)
-                        if i % 5 == 0:
-                            df = pd.DataFrame(all_parts_data)
-                            df.to_csv(output_file, index=False)
-                            # Also save the compressed version
-                            compressed_df = df[['Assembly', 'Part Name', 'Part Number']].copy()
-                            compressed_df.to_csv(compressed_file, index=False)
-                            logger.info(f"Progress saved: {i}/{total_urls} URLs processed")
-                    else:
-                        failed_urls.add(url)
-                        logger.warning(f"No data scraped from {url}")
+                        # The page is parsed in a worker while Chrome goes on to the next URL;
+                        # results are recorded in URL order as they become ready
+                        page_source, assembly_name = load_assembly_page(driver, url)
+                        job = (i, url, time.monotonic() - start)
+                        if page_source is None:
+                            parse_pool.add_result(job, [])
+                        else:
+                            parse_pool.submit_parts(job, page_source, url, assembly_name)
+                        for (done_i, done_url, elapsed), parts_data in parse_pool.completed():
+                            record(done_i, done_url, parts_data, elapsed)
                     
-                    # Random delay between requests (3-7 seconds)
-                    delay = 3 + random.random() * 4
-                    time.sleep(delay)
-                    
-                except Exception as e:
-                    logger.error(f"Failed to process URL {url}: {e}")
-                    failed_urls.add(url)
-                    continue
+                    except Exception as e:
+                        logger.error(f"Failed to process URL {url}: {e}")
+                        failed_urls.add(url)
+                        inc("failures", stage="assembly_page")
+                        continue
                 
-        finally:
-            driver.quit()
+                if parse_pool is not None:
+                    for (done_i, done_url, elapsed), parts_data in parse_pool.completed(wait=True):
+                        record(done_i, done_url, parts_data, elapsed)
+                
+            finally:
+                driver.quit()
         
         # Save final results
         if all_parts_data:
-            # Save full data to CSV
-            df = pd.DataFrame(all_parts_data)
-            df.to_csv(output_file, index=False)
+            # Full CSV, compressed CSV (Assembly, Part Name, Part Number) and JSON backup, streamed from the store
+            json_file = os.path.join(output_dir, os.path.basename(output_file).replace('.csv', '.json'))
+            write_part_outputs(all_parts_data, output_file, compressed_file, json_file)
             logger.info(f"Final data saved to {output_file}")
-            
-            # Save compressed version with only Assembly, Part Name, and Part Number
-            compressed_df = df[['Assembly', 'Part Name', 'Part Number']].copy()
-            compressed_df.to_csv(compressed_file, index=False)
             logger.info(f"Compressed data saved to {compressed_file}")
-            
-            # Also save as JSON for backup
-            json_file = os.path.join(output_dir, os.path.basename(output_file).replace('.csv', '.json'))
-            with open(json_file, 'w') as f:
-                json.dump(all_parts_data, f, indent=4)
             logger.info(f"Backup JSON saved to {json_file}")
         
         # Save failed URLs if any
@@ -196,9 +529,19 @@ def main():
         Output JSON: {json_file if all_parts_data else 'N/A'}
         """)
         
+        metrics_files = write_run_metrics(output_dir, timestamp)
+        if metrics_files:
+            logger.info(get_metrics().summary())
+            logger.info(f"Metrics saved to {metrics_files[0]} and {metrics_files[1]}")
+        
     except Exception as e:
         logger.error(f"Critical error in main process: {e}")
         raise
+    finally:
+        if parse_pool is not None:
+            parse_pool.close()
+        if work_queue:
+            work_queue.close()
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,266 @@
+import argparse
+import glob
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from navigate_kia_parts_undetected import CATEGORIES
+from parts_index import vin_for_path
+from synthetic_pages import load_assemblies, render_assembly_page, render_category_page, site_path
+
+# Served instead of a page when a challenge is injected; http_fetcher and the
+# browser path both recognise it as Cloudflare's interstitial.
+CHALLENGE_PAGE = (
+    "<!DOCTYPE html><html><head><title>Just a moment...</title></head><body>"
+    '<div id="challenge-platform"><script src="/cdn-cgi/challenge-platform/h/b/orchestrate/chl_page/v1">'
+    "</script></div></body></html>"
+)
+
+HOME_PAGE = (
+    "<!DOCTYPE html><html><head><title>Kia Parts</title></head><body>"
+    '<form action="/vin-search" method="get">'
+    '<input id="vinInput" name="vin" type="text" placeholder="Enter VIN">'
+    '<button id="vin-input-button-submit" type="submit">Search</button>'
+    "</form></body></html>"
+)
+
+
+def default_catalogs(output_dir: str) -> Dict[str, str]:
+    """Newest kia_parts_data_*.json of every output/<VIN>/ directory, keyed by VIN."""
+    catalogs = {}
+    for path in sorted(glob.glob(os.path.join(output_dir, "*", "kia_parts_data_*.json"))):
+        vin = vin_for_path(path)
+        if vin:
+            # Run ids sort by time, so the last file seen is the newest
+            catalogs[vin] = path
+    return catalogs
+
+
+class _Model:
+    """One model's assembly pages, grouped into category pages."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.assemblies: "OrderedDict[str, List[Dict]]" = OrderedDict()
+        self.categories: Dict[str, List[str]] = {category: [] for category in CATEGORIES}
+        self._groups: Dict[str, str] = {}
+
+    def add(self, url: str, rows: List[Dict]):
+        path = urlsplit(url).path
+        if path in self.assemblies:
+            return
+        self.assemblies[path] = rows
+        # Assembly paths look like /a/Kia_2024_Sorento/_52022_10901859/...; the
+        # number after the first underscore is the part group, which stands in
+        # for the category the assembly is listed under.
+        group = path.split("/")[3].split("_")[1] if path.count("/") > 3 else ""
+        if group not in self._groups:
+            self._groups[group] = CATEGORIES[len(self._groups) % len(CATEGORIES)]
+        self.categories[self._groups[group]].append(url)
+
+
+class StandInSite:
+    """Local HTTP server imitating parts.kia.com, built from scraped JSON outputs.
+
+    Serves the VIN search (``#vinInput``, ``#vin-input-button-submit``,
+    ``.vin-result-link``), the five category pages per model and every
+    assembly page in ``catalogs`` (``{vin: kia_parts_data_*.json}``), with
+    the markup the scraper expects. Category and assembly pages can be slowed
+    down by ``latency`` seconds (plus up to ``jitter`` more), fail with a 503
+    at ``error_rate`` or show a challenge page at ``challenge_rate``; the
+    random draws are seeded so runs are repeatable.
+    """
+
+    def __init__(self, catalogs: Dict[str, str], latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, challenge_rate: float = 0.0, seed: int = 0,
+                 host: str = "127.0.0.1", port: int = 0):
+        if not catalogs:
+            raise ValueError("Stand-in site needs at least one VIN catalog")
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.challenge_rate = challenge_rate
+        self.host = host
+        self.port = port
+
+        self.vins: Dict[str, str] = {}
+        self.models: Dict[str, _Model] = {}
+        self._assembly_pages: Dict[str, Tuple[str, List[Dict]]] = {}
+        for vin, json_file in catalogs.items():
+            for url, rows in load_assemblies(json_file).items():
+                model_name = urlsplit(url).path.split("/")[2]
+                model = self.models.setdefault(model_name, _Model(model_name))
+                model.add(url, rows)
+                self.vins.setdefault(vin, model_name)
+                self._assembly_pages.setdefault(urlsplit(url).path, (model_name, rows))
+
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "pages": {}, "errors": 0, "challenges": 0, "not_found": 0}
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self) -> str:
+        """Serve in a background thread and return the base URL."""
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                site._handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="standin-site", daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    # --- Expected results ------------------------------------------------------------
+
+    def local_url(self, url: str) -> str:
+        """The stand-in's address for a parts.kia.com URL."""
+        return f"{self.base_url}{site_path(url)}"
+
+    def assembly_urls(self, vin: str) -> List[str]:
+        """Local assembly URLs for ``vin`` in category order, as discovery should find them."""
+        model = self.models[self.vins[vin]]
+        return [self.local_url(url) for category in CATEGORIES for url in model.categories[category]]
+
+    def expected_parts(self, url: str) -> List[Dict]:
+        """Rows the scraper should return for a local assembly URL."""
+        _, rows = self._assembly_pages[urlsplit(url).path]
+        return [dict(row, **{"Assembly URL": url}) for row in rows]
+
+    # --- Serving ---------------------------------------------------------------------
+
+    def _route(self, path: str, query: Dict) -> Tuple[str, int, str]:
+        """Return (page kind, status, html) for a request."""
+        if path in ("", "/"):
+            return "home", 200, HOME_PAGE
+        if path == "/vin-search":
+            vin = (query.get("vin") or [""])[0].strip().upper()
+            model_name = self.vins.get(vin)
+            if not model_name:
+                return "vin_search", 200, "<!DOCTYPE html><html><body><p>No vehicle found</p></body></html>"
+            return "vin_search", 200, (
+                "<!DOCTYPE html><html><body>"
+                f'<a class="vin-result-link" href="{self.base_url}/{escape(model_name)}.html">'
+                f"{escape(model_name.replace('_', ' '))}</a></body></html>"
+            )
+        segments = path.strip("/").split("/")
+        if len(segments) == 1 and segments[0].endswith(".html") and segments[0][:-5] in self.models:
+            # Only categories the model has parts in are linked, so discovery can skip the rest
+            model = self.models[segments[0][:-5]]
+            links = "".join(f'<a href="/{model.name}/{category}.html">{category}</a>'
+                            for category in CATEGORIES if model.categories[category])
+            return "model", 200, f"<!DOCTYPE html><html><body>{links}</body></html>"
+        if (len(segments) == 2 and segments[0] in self.models and segments[1].endswith(".html")
+                and segments[1][:-5] in CATEGORIES):
+            model = self.models[segments[0]]
+            cards = [{"name": model.assemblies[urlsplit(url).path][0]["Assembly"], "href": site_path(url)}
+                     for url in model.categories[segments[1][:-5]]]
+            return "category", 200, render_category_page(cards)
+        if path in self._assembly_pages:
+            _, rows = self._assembly_pages[path]
+            return "assembly", 200, render_assembly_page(rows)
+        return "not_found", 404, "<!DOCTYPE html><html><body>Not found</body></html>"
+
+    def _handle(self, request: BaseHTTPRequestHandler):
+        parts = urlsplit(request.path)
+        kind, status, html = self._route(parts.path, parse_qs(parts.query))
+
+        delay = 0.0
+        if kind in ("category", "assembly"):
+            with self._lock:
+                delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+                draw = self._rng.random()
+            if draw < self.error_rate:
+                status, html = 503, "<!DOCTYPE html><html><body>Service Unavailable</body></html>"
+                kind = "error"
+            elif draw < self.error_rate + self.challenge_rate:
+                status, html = 403, CHALLENGE_PAGE
+                kind = "challenge"
+        if delay:
+            time.sleep(delay)
+
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["pages"][kind] = self.stats["pages"].get(kind, 0) + 1
+            if kind == "error":
+                self.stats["errors"] += 1
+            elif kind == "challenge":
+                self.stats["challenges"] += 1
+            elif kind == "not_found":
+                self.stats["not_found"] += 1
+
+        body = html.encode("utf-8")
+        try:
+            request.send_response(status)
+            request.send_header("Content-Type", "text/html; charset=utf-8")
+            request.send_header("Content-Length", str(len(body)))
+            if kind == "challenge":
+                request.send_header("Server", "cloudflare")
+                request.send_header("cf-mitigated", "challenge")
+            request.end_headers()
+            request.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for parts.kia.com built from output/ JSON")
+    parser.add_argument("--json", nargs=2, action="append", metavar=("VIN", "FILE"),
+                        help="Serve FILE's parts for VIN (repeatable; default: newest JSON of every output/<VIN>/)")
+    parser.add_argument("--port", type=int, default=8800, help="Port to listen on (default: 8800)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every category/assembly page")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Up to this many extra random seconds per page")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of pages answered with a 503")
+    parser.add_argument("--challenge-rate", type=float, default=0.0, help="Fraction of pages answered with a challenge")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for latency and error draws (default: 0)")
+    args = parser.parse_args()
+
+    output_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "output")
+    catalogs = dict(args.json) if args.json else default_catalogs(output_dir)
+    site = StandInSite(catalogs, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                       challenge_rate=args.challenge_rate, seed=args.seed, port=args.port)
+    base_url = site.start()
+    for vin, model_name in site.vins.items():
+        print(f"{vin}: {model_name}, {len(site.models[model_name].assemblies)} assembly pages")
+    print(f"Serving on {base_url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        site.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import json
+from collections import OrderedDict
+from html import escape
+from typing import Dict, List
+from urllib.parse import urlsplit
+
+# Dealer pages carry a lot of markup around the part list; this stands in for
+# the header, menus and scripts so parse timings are realistic.
+_PAGE_CHROME = "".join(
+    f'<div class="nav-item"><a href="/c/{i}.html" class="nav-link">Menu entry {i}</a>'
+    f'<span class="badge">{i}</span></div>'
+    for i in range(400)
+)
+
+
+def load_assemblies(json_file: str) -> "OrderedDict[str, List[Dict]]":
+    """Group a kia_parts_data_*.json file's rows by assembly URL, keeping page order.
+
+    Pages rendered from these groups parse back to exactly the same rows.
+    """
+    with open(json_file, 'r') as f:
+        rows = json.load(f)
+    assemblies: "OrderedDict[str, List[Dict]]" = OrderedDict()
+    for row in rows:
+        assemblies.setdefault(row["Assembly URL"], []).append(row)
+    return assemblies
+
+
+def site_path(url: str) -> str:
+    """Path plus query of a parts.kia.com URL, as it appears in an href."""
+    parts = urlsplit(url)
+    return f"{parts.path}?{parts.query}" if parts.query else parts.path
+
+
+def _part_row(part: Dict) -> str:
+    number = escape(part["Part Number"] or "")
+    href = escape(site_path(part["Product URL"])) if part.get("Product URL") else ""
+    number_html = f'<a class="btn btn-tertiary" href="{href}">{number}</a>' if part.get("Part Number") else ""
+    price_html = ""
+    if part.get("Price"):
+        price = part["Price"]
+        # Scraped prices look like "$ 1.09MSRP": amount and label are separate nodes on the site
+        amount, label = (price[:-4], price[-4:]) if price.endswith("MSRP") else (price, "")
+        price_html = (f'<div class="money-4"><span class="amount">{escape(amount)}</span>'
+                      f'<span class="label">{escape(label)}</span>'
+                      f'<span class="sr-only">(Current price)</span></div>')
+    qty_html = ""
+    if part.get("Quantity") is not None:
+        qty_html = (f'<input type="number" class="form-control input-sm text-center" '
+                    f'value="{escape(str(part["Quantity"]))}">')
+    return (
+        '<li class="assemblyProdDetails">'
+        f'<div class="assemblyProductDescription">{escape(part["Part Name"] or "")}</div>'
+        f'<div class="assemblyProdNumber">{number_html}</div>'
+        f'<div class="assemblyProdPrice">{price_html}</div>'
+        f'<div class="assemblyProdQty">{qty_html}</div>'
+        '</li>'
+    )
+
+
+def render_assembly_page(parts: List[Dict], assembly_name: str = None) -> str:
+    """HTML for one assembly page holding ``parts``."""
+    assembly_name = assembly_name if assembly_name is not None else (parts[0]["Assembly"] if parts else "")
+    rows = "".join(_part_row(part) for part in parts)
+    return (
+        "<!DOCTYPE html><html><head><title>"
+        f"{escape(assembly_name)} | Kia Parts</title>"
+        f'<meta id="ctl00_metaKeywords" name="keywords" '
+        f'content="{escape(", ".join(p["Part Number"] for p in parts if p.get("Part Number")))}">'
+        "<script>window.dataLayer = window.dataLayer || [];</script></head><body>"
+        f'<header>{_PAGE_CHROME}</header>'
+        '<ol class="breadcrumb"><li><a href="/">Home</a></li><li><a href="/c.html">Parts</a></li>'
+        f"<li>{escape(assembly_name)}</li></ol>"
+        f'<ul class="assemblyProdList">{rows}</ul>'
+        f"<footer>{_PAGE_CHROME}</footer></body></html>"
+    )
+
+
+def render_category_page(cards: List[Dict]) -> str:
+    """HTML for a category page; each card is a dict with ``name`` and ``href``."""
+    items = "".join(
+        '<div class="assemblyCard">'
+        f'<a class="assemblyCardLink" href="{escape(card["href"])}">'
+        f'<img src="/img/{i}.png" alt=""><span>{escape(card["name"])}</span></a></div>'
+        for i, card in enumerate(cards)
+    )
+    return (
+        "<!DOCTYPE html><html><head><title>Category | Kia Parts</title></head><body>"
+        f"<header>{_PAGE_CHROME}</header><div class=\"assemblyCards\">{items}</div>"
+        f"<footer>{_PAGE_CHROME}</footer></body></html>"
+    )
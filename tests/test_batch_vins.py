@@ -0,0 +1,81 @@
+import logging
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from checkpoint import RunCheckpoint
+from consolidate import consolidate
+from parts_index import discover_sources
+
+try:
+    import batch_vins
+except ImportError:  # batch_vins reaches the scraper, which needs selenium and undetected-chromedriver
+    batch_vins = None
+
+SORENTO = "https://parts.kia.com/Kia_2024_Sorento.html"
+TELLURIDE = "https://parts.kia.com/Kia_2023_Telluride.html"
+
+
+def assembly_url(model: str, name: str) -> str:
+    return f"https://parts.kia.com/a/{model}/_52022_1/{name}/KKMAPHC20_88-891.html?assemblySearchGuid=ABC"
+
+
+def rows(url: str, assembly: str, count: int):
+    return [{"Assembly": assembly, "Part Name": f"PART {i}", "Part Number": f"{assembly[:3]}{i:04d}",
+             "Price": "$ 1.00MSRP", "Quantity": "1", "Product URL": "", "Assembly URL": url}
+            for i in range(count)]
+
+
+@unittest.skipIf(batch_vins is None, "selenium and undetected-chromedriver are not installed")
+class BatchConsolidateTest(unittest.TestCase):
+    """A two-model batch, consolidated: every model's catalog holds only its own VINs' parts."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.output_dir = os.path.join(self.tmp.name, "output")
+        batch_dir = os.path.join(self.output_dir, "batch_vins")
+        os.makedirs(batch_dir)
+
+        seat = assembly_url("Kia_2024_Sorento", "2ND SEAT")
+        door = assembly_url("Kia_2024_Sorento", "FRONT DOOR")
+        hood = assembly_url("Kia_2023_Telluride", "HOOD")
+        plan = {
+            "vins": {"KNARH81BWR5297431": SORENTO, "KNARH81BWR5297432": SORENTO, "5XYP5DGC1PG000001": TELLURIDE},
+            "models": {SORENTO: [seat, door], TELLURIDE: [hood]},
+            "invalid": [],
+        }
+        checkpoint = RunCheckpoint(batch_dir)
+        checkpoint.record(0, seat, rows(seat, "2ND SEAT", 3))
+        checkpoint.record(1, door, rows(door, "FRONT DOOR", 2))
+        checkpoint.record(2, hood, rows(hood, "HOOD", 4))
+        checkpoint.close()
+
+        def vin_directory(vin):
+            path = os.path.join(self.output_dir, vin)
+            os.makedirs(path, exist_ok=True)
+            return path
+
+        with mock.patch.object(batch_vins, "create_vin_directory", vin_directory):
+            batch_vins.finish_batch(plan, checkpoint, None, False, logging.getLogger(__name__))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_batch_directory_is_not_a_source(self):
+        directories = {os.path.basename(os.path.dirname(path)) for path in discover_sources(self.output_dir)}
+        self.assertEqual(directories, {"KNARH81BWR5297431", "KNARH81BWR5297432", "5XYP5DGC1PG000001"})
+
+    def test_catalogs_count_each_model_once_per_vin(self):
+        summary = consolidate(self.output_dir, os.path.join(self.tmp.name, "consolidated"))
+        models = summary["models"]
+        self.assertEqual(set(models), {"Kia_2024_Sorento", "Kia_2023_Telluride"})
+        self.assertEqual(models["Kia_2024_Sorento"]["parts"], 5)
+        self.assertEqual(sorted(models["Kia_2024_Sorento"]["vins"]), ["KNARH81BWR5297431", "KNARH81BWR5297432"])
+        self.assertEqual(models["Kia_2023_Telluride"]["parts"], 4)
+        self.assertEqual(models["Kia_2023_Telluride"]["vins"], ["5XYP5DGC1PG000001"])
+        self.assertEqual((summary["stats"]["sources"], summary["stats"]["rows"]), (3, 2 * 5 + 4))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import json
+import os
+import tempfile
+import unittest
+
+from checkpoint import RunCheckpoint, iter_json_array, write_part_outputs
+
+URLS = [f"https://parts.kia.com/a/Kia_2024_Sorento/_52022_1/SEAT/KKMAPHC20_88-89{i}.html" for i in range(3)]
+
+
+def part(number, quantity="1"):
+    return {"Assembly": "2ND SEAT", "Part Name": "COVER", "Part Number": number, "Price": "$ 12.34MSRP",
+            "Quantity": quantity, "Product URL": "", "Assembly URL": URLS[0]}
+
+
+class RunCheckpointTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.output_dir = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def crash_after(self, records):
+        """Record ``records`` and close the files without finishing the run, as a killed process leaves them."""
+        checkpoint = RunCheckpoint(self.output_dir)
+        for index, url, parts in records:
+            checkpoint.record(index, url, parts)
+        checkpoint.close()
+        return checkpoint
+
+    def test_drop_partial_line(self):
+        path = os.path.join(self.output_dir, "parts.jsonl")
+        with open(path, 'w') as f:
+            f.write('{"index": 0}\n{"index": 1}\n{"ind')
+        RunCheckpoint._drop_partial_line(path)
+        with open(path, 'r') as f:
+            self.assertEqual(f.read(), '{"index": 0}\n{"index": 1}\n')
+
+        # A line longer than one read block is cut as a whole
+        with open(path, 'w') as f:
+            f.write('{"index": 0}\n' + "x" * 200000)
+        RunCheckpoint._drop_partial_line(path)
+        with open(path, 'r') as f:
+            self.assertEqual(f.read(), '{"index": 0}\n')
+
+    def test_restart_reuses_the_run_id_until_finished(self):
+        first = self.crash_after([(0, URLS[0], [part("89100P2000")])])
+        second = RunCheckpoint(self.output_dir)
+        self.assertTrue(second.resumed)
+        self.assertEqual(second.run_id, first.run_id)
+        self.assertEqual(second.finalize(), 1)
+        self.assertTrue(os.path.exists(second.output_paths()["json"]))
+
+        third = RunCheckpoint(self.output_dir)
+        self.assertFalse(third.resumed)
+        self.assertNotEqual(third.run_id, first.run_id)
+        third.close()
+
+    def test_ledgered_urls_are_skipped_on_restart(self):
+        first = self.crash_after([(0, URLS[0], [part("89100P2000")]), (1, URLS[1], [])])
+        # The crash hit halfway through ledgering the third URL
+        with open(first.records_file, 'a') as f:
+            f.write(json.dumps({"index": 2, "url": URLS[2], "parts": [part("89200P2000")]}) + "\n")
+        with open(first.ledger_file, 'a') as f:
+            f.write(URLS[2][:20])
+
+        resumed = RunCheckpoint(self.output_dir)
+        self.assertEqual(resumed.completed_urls, set(URLS[:2]))
+        # What a worker pool given skip=completed_urls goes on to scrape
+        self.assertEqual([url for url in URLS if url not in resumed.completed_urls], URLS[2:])
+        resumed.record(2, URLS[2], [part("89200P2000")])
+        resumed.close()
+        with open(resumed.ledger_file, 'r') as f:
+            self.assertEqual(f.read().splitlines(), URLS)
+
+    def test_later_record_wins(self):
+        checkpoint = RunCheckpoint(self.output_dir)
+        checkpoint.record(1, URLS[1], [part("89200P2000")])
+        checkpoint.record(0, URLS[0], [part("89100P2000", "1")])
+        checkpoint.record(0, URLS[0], [part("89100P2000", "2")])
+        records = list(checkpoint.iter_records())
+        self.assertEqual([(index, url) for index, url, _ in records], [(0, URLS[0]), (1, URLS[1])])
+        self.assertEqual(records[0][2], [part("89100P2000", "2")])
+        self.assertEqual(checkpoint.finalize(), 2)
+
+
+class IterJsonArrayTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, text):
+        path = os.path.join(self.tmp.name, "array.json")
+        with open(path, 'w') as f:
+            f.write(text)
+        return path
+
+    def test_elements_across_chunk_boundaries(self):
+        elements = [1234567, {"name": "SEAT ], {COVER", "quantity": 2}, "89100P2000", [1.5, None], True]
+        path = self.write(json.dumps(elements, indent=4))
+        # Every chunk size up to past the longest element puts a boundary inside some element
+        for chunk_size in range(1, 60):
+            self.assertEqual(list(iter_json_array(path, chunk_size=chunk_size)), elements, chunk_size)
+
+    def test_reads_part_outputs(self):
+        parts = [part(f"8910{i}P2000") for i in range(50)]
+        json_file = os.path.join(self.tmp.name, "parts.json")
+        write_part_outputs(parts, os.path.join(self.tmp.name, "parts.csv"),
+                           os.path.join(self.tmp.name, "compressed.csv"), json_file)
+        self.assertEqual(list(iter_json_array(json_file, chunk_size=100)), parts)
+        self.assertEqual(list(iter_json_array(self.write("[]"))), [])
+
+    def test_truncated_array(self):
+        path = self.write('[{"Part Number": "89100P2000"}, {"Part')
+        with self.assertRaises(ValueError):
+            list(iter_json_array(path, chunk_size=8))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+
+from checkpoint import write_part_outputs
+from consolidate import consolidate
+from parts_index import PartsIndex, discover_sources, vin_for_path
+from run_delta import SnapshotStore
+
+VIN = "KNARH81BWR5297431"
+SEAT = "https://parts.kia.com/a/Kia_2024_Sorento/_52022_1/2ND-SEAT/KKMAPHC20_88-891.html?assemblySearchGuid=ABC"
+
+
+def parts(price):
+    return [{"Assembly": "2ND SEAT", "Part Name": "COVER", "Part Number": "89100P2000", "Price": price,
+             "Quantity": "1", "Product URL": "", "Assembly URL": SEAT},
+            {"Assembly": "2ND SEAT", "Part Name": "BOLT", "Part Number": "1123408166B", "Price": "$ 1.00MSRP",
+             "Quantity": "4", "Product URL": "", "Assembly URL": SEAT}]
+
+
+class DeltaSourcesTest(unittest.TestCase):
+    """Runs stored with --delta are read from the VIN's snapshot store."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.output_dir = os.path.join(self.tmp.name, "output")
+        self.vin_dir = os.path.join(self.output_dir, VIN)
+        os.makedirs(self.vin_dir)
+        # A full run from before the VIN switched to --delta, then two delta-stored runs
+        run = "20250101_000000"
+        write_part_outputs(parts("$ 10.00MSRP"), *(os.path.join(self.vin_dir, name) for name in (
+            f"kia_parts_data_{run}.csv", f"kia_parts_compressed_{run}.csv", f"kia_parts_data_{run}.json")))
+        self.store = SnapshotStore(self.vin_dir)
+        self.store.record_run("20250201_000000", [(0, SEAT, parts("$ 11.00MSRP"))])
+        self.store.record_run("20250301_000000", [(0, SEAT, parts("$ 12.00MSRP"))])
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_discovers_snapshot_runs(self):
+        sources = discover_sources(self.output_dir)
+        self.assertEqual(sorted(sources.values()), ["20250101_000000", "20250201_000000", "20250301_000000"])
+        self.assertEqual({vin_for_path(path) for path in sources}, {VIN})
+
+        # A reconstructed run is read from its JSON, once
+        self.store.reconstruct("20250301_000000")
+        sources = discover_sources(self.output_dir)
+        self.assertEqual(len(sources), 3)
+        self.assertIn(os.path.join(self.vin_dir, "kia_parts_data_20250301_000000.json"), sources)
+
+    def test_consolidate_reads_the_latest_delta_run(self):
+        summary = consolidate(self.output_dir, os.path.join(self.tmp.name, "consolidated"))
+        self.assertEqual(summary["models"]["Kia_2024_Sorento"]["vins"], [VIN])
+        self.assertEqual(summary["stats"]["rows"], 2)
+        with open(summary["models"]["Kia_2024_Sorento"]["catalog"], 'r') as f:
+            catalog = f.read()
+        self.assertIn("$ 12.00MSRP", catalog)
+        self.assertNotIn("$ 10.00MSRP", catalog)
+
+    def test_index_reads_delta_runs(self):
+        index = PartsIndex(os.path.join(self.tmp.name, "parts_index.sqlite"))
+        try:
+            self.assertEqual(index.update(self.output_dir)["added"], 3)
+            latest = index.by_part_number("89100P2000")
+            self.assertEqual([(row["vin"], row["run"], row["price"]) for row in latest],
+                             [(VIN, "20250301_000000", "$ 12.00MSRP")])
+            self.assertEqual(len(index.by_part_number("89100P2000", latest_only=False)), 3)
+            self.assertEqual(index.update(self.output_dir)["unchanged"], 3)
+        finally:
+            index.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from http_fetcher import HttpPageFetcher, has_parts_markup
+from rate_limiter import DEFAULT_LIMITS, get_rate_limiter, set_default_limits
+
+PARTS_PAGE = ('<html><body><ol class="breadcrumb"><li>Home</li><li>2ND SEAT</li></ol><ul>'
+              '<li class="assemblyProdDetails">BOLT</li></ul></body></html>')
+CHALLENGE_PAGE = ("<html><head><title>Just a moment...</title></head><body>"
+                  '<div id="challenge-platform"></div></body></html>')
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Serves a parts page, a Cloudflare challenge and a 429, by path."""
+
+    def do_GET(self):
+        headers = {}
+        if self.path == "/parts.html":
+            status, body = 200, PARTS_PAGE
+        elif self.path == "/challenge.html":
+            status, body = 403, CHALLENGE_PAGE
+            headers = {"Server": "cloudflare", "cf-mitigated": "challenge"}
+        elif self.path == "/busy.html":
+            status, body = 429, "<html><body>Too Many Requests</body></html>"
+        else:
+            status, body = 404, "<html><body>Not found</body></html>"
+        data = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class HttpPageFetcherTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.limits = dict(DEFAULT_LIMITS)
+        set_default_limits(initial_rate=1000, max_rate=1000)
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        DEFAULT_LIMITS.update(cls.limits)
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.fetcher = HttpPageFetcher(cookies_file=os.path.join(self.tmp.name, "cookies.json"))
+
+    def tearDown(self):
+        self.fetcher.close()
+        self.tmp.cleanup()
+
+    def test_returns_page_with_parts(self):
+        self.assertEqual(self.fetcher.fetch(f"{self.base_url}/parts.html"), PARTS_PAGE)
+        self.assertEqual(self.fetcher.http_hits, 1)
+
+    def test_challenge_page_needs_browser(self):
+        self.assertIsNone(self.fetcher.fetch(f"{self.base_url}/challenge.html"))
+        self.assertEqual(self.fetcher.challenges, 1)
+
+    def test_429_backs_off_rate_limiter(self):
+        limiter = get_rate_limiter(self.base_url)
+        backoffs, rate = limiter.backoffs, limiter.rate
+        self.assertIsNone(self.fetcher.fetch(f"{self.base_url}/busy.html"))
+        self.assertEqual(limiter.backoffs, backoffs + 1)
+        self.assertLess(limiter.rate, rate)
+        self.assertEqual(self.fetcher.misses, 1)
+
+
+class PartsMarkupTest(unittest.TestCase):
+    def test_any_quoting_of_class_attribute(self):
+        for item in ('<li class="assemblyProdDetails">', "<li class='row assemblyProdDetails'>",
+                     "<li class=assemblyProdDetails>", '<li id="x" CLASS = "assemblyProdDetails">'):
+            self.assertTrue(has_parts_markup(item), item)
+
+    def test_other_markup(self):
+        for item in ('<li class="assemblyCard">', '<div class="assemblyProdDetails">',
+                     '<li data-class="x">assemblyProdDetails</li>'):
+            self.assertFalse(has_parts_markup(item), item)
+
+
+if __name__ == "__main__":
+    unittest.main()
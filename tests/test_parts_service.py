@@ -0,0 +1,121 @@
+import asyncio
+import threading
+import unittest
+
+try:
+    from parts_service import PartsService
+except ImportError:  # The service drives the scraper, which needs selenium and undetected-chromedriver
+    PartsService = None
+
+
+class ControlledJob:
+    """A blocking job that records its calls and finishes each one when the test says so."""
+
+    def __init__(self):
+        self.calls = []
+        self.started = threading.Semaphore(0)
+        self._release = []
+        self._lock = threading.Lock()
+
+    def __call__(self, arg, refresh):
+        done = threading.Event()
+        with self._lock:
+            self.calls.append(refresh)
+            self._release.append(done)
+        self.started.release()
+        done.wait(5)
+        return {"status": "ok", "source": "crawl" if refresh else "disk", "refresh": refresh}
+
+    async def wait_started(self):
+        started = await asyncio.get_running_loop().run_in_executor(None, self.started.acquire, True, 5)
+        if not started:
+            raise AssertionError("the job was never started")
+
+    def finish(self, call):
+        self._release[call].set()
+
+
+@unittest.skipIf(PartsService is None, "selenium and undetected-chromedriver are not installed")
+class LookupCoalescingTest(unittest.TestCase):
+    """Which running job a lookup joins, and when it starts one of its own."""
+
+    def setUp(self):
+        self.service = PartsService(drivers=None, max_jobs=4)
+        self.job = ControlledJob()
+
+    def tearDown(self):
+        for call in range(len(self.job.calls)):
+            self.job.finish(call)
+        self.service._executor.shutdown(wait=True)
+
+    def lookup(self, refresh):
+        return asyncio.ensure_future(self.service._lookup("vin:X", self.job, "X", refresh, True, {}))
+
+    def run_async(self, test):
+        asyncio.run(asyncio.wait_for(test(), 20))
+
+    def test_plain_lookup_joins_any_running_job(self):
+        async def test():
+            first = self.lookup(refresh=True)
+            await self.job.wait_started()
+            joined = self.lookup(refresh=False)
+            await asyncio.sleep(0)
+            self.job.finish(0)
+            self.assertEqual((await first)[1], "crawl")
+            self.assertEqual((await joined)[1], "coalesced")
+            self.assertEqual(self.job.calls, [True])
+        self.run_async(test)
+
+    def test_refresh_joins_a_running_refresh(self):
+        async def test():
+            first = self.lookup(refresh=True)
+            await self.job.wait_started()
+            joined = self.lookup(refresh=True)
+            await asyncio.sleep(0)
+            self.job.finish(0)
+            self.assertEqual((await joined)[0]["refresh"], True)
+            self.assertEqual((await joined)[1], "coalesced")
+            await first
+            self.assertEqual(self.job.calls, [True])
+        self.run_async(test)
+
+    def test_refresh_is_chained_after_a_plain_job(self):
+        async def test():
+            plain = self.lookup(refresh=False)
+            await self.job.wait_started()
+            refresh = self.lookup(refresh=True)
+            # Later lookups join the chained refresh, not the job that may answer from disk
+            joined = self.lookup(refresh=False)
+            await asyncio.sleep(0.05)
+            self.assertEqual(self.job.calls, [False])
+
+            self.job.finish(0)
+            self.assertEqual((await plain)[1], "disk")
+            await self.job.wait_started()
+            self.assertEqual(self.job.calls, [False, True])
+            self.job.finish(1)
+            self.assertEqual((await refresh)[1], "crawl")
+            self.assertEqual((await joined)[0]["refresh"], True)
+            self.assertEqual(self.service._in_flight, {})
+            self.assertEqual(self.service.stats["jobs"], 2)
+        self.run_async(test)
+
+    def test_chained_refresh_runs_after_a_cancelled_job(self):
+        async def test():
+            plain = self.lookup(refresh=False)
+            await self.job.wait_started()
+            plain_job, _ = self.service._in_flight["vin:X"]
+            refresh = self.lookup(refresh=True)
+            await asyncio.sleep(0)
+            plain_job.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await plain
+            await self.job.wait_started()
+            self.job.finish(1)
+            self.assertEqual((await refresh)[0]["refresh"], True)
+            self.assertEqual(self.service.stats["failed_jobs"], 1)
+        self.run_async(test)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import os
+import tempfile
+import threading
+import unittest
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from http_fetcher import HttpPageFetcher
+from proxy_pool import ProxyPool
+from rate_limiter import DEFAULT_LIMITS, set_default_limits
+
+PARTS_PAGE = '<html><body><ul><li class="assemblyProdDetails">BOLT</li></ul></body></html>'
+
+
+class OriginHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self._send(200, PARTS_PAGE.encode())
+
+    def _send(self, status: int, data: bytes):
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ForwardingProxyHandler(OriginHandler):
+    """Plain HTTP forward proxy: fetches the absolute URL in the request line, or fails if ``broken``."""
+
+    broken = False
+    requests = 0
+
+    def do_GET(self):
+        type(self).requests += 1
+        if self.broken:
+            self._send(502, b"<html><body>Bad Gateway</body></html>")
+            return
+        with urllib.request.urlopen(self.path, timeout=5) as response:
+            self._send(response.status, response.read())
+
+
+class HealthyProxy(ForwardingProxyHandler):
+    requests = 0
+
+
+class BrokenProxy(ForwardingProxyHandler):
+    broken = True
+    requests = 0
+
+
+def serve(handler):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+class ProxyPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.limits = dict(DEFAULT_LIMITS)
+        set_default_limits(initial_rate=1000, max_rate=1000)
+        self.servers = []
+        for handler in (OriginHandler, HealthyProxy, BrokenProxy):
+            handler.requests = 0
+            self.servers.append(serve(handler))
+        (_, self.origin), (_, self.healthy), (_, self.broken) = self.servers
+        self.tmp = tempfile.TemporaryDirectory()
+        self.pool = ProxyPool([self.healthy, self.broken], scores_file=None, max_failures=3, base_cooldown=60)
+        self.fetcher = HttpPageFetcher(cookies_file=os.path.join(self.tmp.name, "cookies.json"),
+                                       proxy_pool=self.pool)
+
+    def tearDown(self):
+        self.fetcher.close()
+        self.pool.stop()
+        for server, _ in self.servers:
+            server.shutdown()
+            server.server_close()
+        self.tmp.cleanup()
+        DEFAULT_LIMITS.update(self.limits)
+
+    def test_failing_proxy_is_quarantined(self):
+        # Proxies are picked at random weighted by score, so keep going until the broken one is out
+        pages = []
+        while self.pool.is_available(self.broken) and len(pages) < 500:
+            pages.append(self.fetcher.fetch(f"{self.origin}/a/{len(pages)}.html"))
+
+        self.assertFalse(self.pool.is_available(self.broken))
+        self.assertTrue(self.pool.is_available(self.healthy))
+        # It is dropped after max_failures failures in a row; every other page came through the healthy one
+        self.assertEqual(BrokenProxy.requests, 3)
+        self.assertEqual(pages.count(None), 3)
+        self.assertEqual(HealthyProxy.requests, len(pages) - 3)
+        served = HealthyProxy.requests
+
+        # From now on every request goes through the healthy proxy
+        for i in range(5):
+            self.assertEqual(self.fetcher.fetch(f"{self.origin}/b/{i}.html"), PARTS_PAGE)
+        self.assertEqual(BrokenProxy.requests, 3)
+        self.assertEqual(HealthyProxy.requests, served + 5)
+
+    def test_healthy_proxy_stays_in_pool(self):
+        pool = ProxyPool([self.healthy], scores_file=None)
+        fetcher = HttpPageFetcher(cookies_file=os.path.join(self.tmp.name, "cookies.json"), proxy_pool=pool)
+        try:
+            for i in range(5):
+                self.assertEqual(fetcher.fetch(f"{self.origin}/c/{i}.html"), PARTS_PAGE)
+        finally:
+            fetcher.close()
+        self.assertEqual(pool.acquire(), self.healthy)
+        self.assertEqual(HealthyProxy.requests, 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import threading
+import unittest
+
+from retry_scheduler import (CHALLENGE, PERMANENT, TRANSIENT, CircuitBreaker, RetryPolicy, RetryQueue,
+                             classify_page_failure)
+
+COOLDOWN = 0.05
+
+
+class PageDriver:
+    """A WebDriver showing a page that gave no part rows, with the navigation status Chrome reports."""
+
+    def __init__(self, status, page_source="<html><body><h1>Not found</h1></body></html>"):
+        self.status = status
+        self.page_source = page_source
+
+    def execute_script(self, script):
+        return self.status
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def setUp(self):
+        self.breaker = CircuitBreaker("parts.kia.com", failure_threshold=0.5, window=4, min_requests=4,
+                                      cooldown=COOLDOWN)
+
+    def trip(self):
+        with self.assertLogs("retry_scheduler", "WARNING"):
+            for _ in range(self.breaker.min_requests):
+                self.breaker.record(False)
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+    def test_opens_then_closes_after_a_successful_probe(self):
+        for success in (True, False, False):
+            self.breaker.record(success)
+        # Not enough requests yet to judge the host
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        with self.assertLogs("retry_scheduler", "WARNING"):
+            self.breaker.record(False)
+        self.assertEqual((self.breaker.state, self.breaker.trips), (CircuitBreaker.OPEN, 1))
+
+        self.assertGreaterEqual(self.breaker.before_request(), COOLDOWN * 0.9)
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.breaker.record(True)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertLess(self.breaker.before_request(), COOLDOWN / 2)
+
+    def test_failed_probe_reopens_for_longer(self):
+        self.trip()
+        self.breaker.before_request()
+        with self.assertLogs("retry_scheduler", "WARNING"):
+            self.breaker.record(False)
+        self.assertEqual((self.breaker.state, self.breaker.trips), (CircuitBreaker.OPEN, 2))
+        self.assertGreaterEqual(self.breaker.before_request(), 2 * COOLDOWN * 0.9)
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+
+    def test_abandoned_probe_lets_a_waiting_thread_probe(self):
+        self.trip()
+        self.breaker.before_request()
+        probed = threading.Event()
+
+        def waiter():
+            self.breaker.before_request()
+            probed.set()
+            self.breaker.record(True)
+
+        thread = threading.Thread(target=waiter, daemon=True)
+        thread.start()
+        # Half-open with the probe out: everyone else waits for it
+        self.assertFalse(probed.wait(2 * COOLDOWN))
+        self.breaker.abandon()
+        self.assertTrue(probed.wait(5))
+        thread.join(5)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(self.breaker.trips, 1)
+
+
+class RetryTest(unittest.TestCase):
+    def test_classify_page_failure(self):
+        self.assertEqual(classify_page_failure(PageDriver(404)), PERMANENT)
+        self.assertEqual(classify_page_failure(PageDriver(410)), PERMANENT)
+        self.assertEqual(classify_page_failure(PageDriver(503)), TRANSIENT)
+        self.assertEqual(classify_page_failure(PageDriver(0)), TRANSIENT)
+        challenge = "<html><head><title>Just a moment...</title></head><body>cf-chl</body></html>"
+        self.assertEqual(classify_page_failure(PageDriver(200, challenge)), CHALLENGE)
+
+    def test_permanent_failures_are_not_retried(self):
+        policy = RetryPolicy(max_attempts=3, base_delay=0.01)
+        queue = RetryQueue()
+        statuses = {"missing": 404, "flaky": 503}
+        for url in statuses:
+            queue.put((url, 1))
+        queue.close()
+
+        attempts = {url: 0 for url in statuses}
+        while True:
+            item = queue.get()
+            if item is None:
+                break
+            url, attempt = item
+            attempts[url] += 1
+            failure = classify_page_failure(PageDriver(statuses[url]))
+            if policy.should_retry(failure, attempt):
+                queue.retry((url, attempt + 1), policy.delay(failure, attempt))
+            else:
+                queue.done()
+        self.assertEqual(attempts, {"missing": 1, "flaky": 3})
+
+
+if __name__ == "__main__":
+    unittest.main()
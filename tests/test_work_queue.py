@@ -0,0 +1,93 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from work_queue import DONE, FAILED, LEASED, PENDING, WorkQueue
+
+URLS = [f"https://parts.kia.com/a/Kia_2024_Sorento/_52022_1/SEAT/KKMAPHC20_88-89{i}.html" for i in range(3)]
+
+
+class WorkQueueTest(unittest.TestCase):
+    """Two workers, each with its own connection to one queue file, as two processes would have."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "jobs.db")
+        self.queues = []
+
+    def tearDown(self):
+        for queue in self.queues:
+            queue.close()
+        self.tmp.cleanup()
+
+    def open(self, worker_id, **kwargs):
+        queue = WorkQueue(self.db_path, worker_id=worker_id, **kwargs)
+        self.queues.append(queue)
+        return queue
+
+    def test_expired_lease_is_reclaimed_by_another_worker(self):
+        crashed = self.open("host-a:1", lease_seconds=0.05)
+        other = self.open("host-b:1", lease_seconds=60)
+        crashed.add("VIN", URLS[:1])
+        job = crashed.lease("VIN")[0]
+        self.assertEqual(other.lease("VIN"), [])
+        self.assertEqual(other.counts("VIN")[LEASED], 1)
+
+        time.sleep(0.1)
+        reclaimed = other.lease("VIN")
+        self.assertEqual([(j.url, j.attempts) for j in reclaimed], [(URLS[0], 2)])
+        self.assertTrue(other.complete(reclaimed[0], [{"Part Number": "89100P2000"}]))
+        # The first worker reports late: its result and its failure are both ignored
+        self.assertFalse(crashed.complete(job, []))
+        self.assertEqual(crashed.fail(job, "timeout"), DONE)
+        self.assertEqual(list(crashed.iter_parts("VIN")), [{"Part Number": "89100P2000"}])
+
+    def test_url_fails_after_max_attempts(self):
+        first = self.open("host-a:1", max_attempts=2)
+        second = self.open("host-b:1", max_attempts=2)
+        first.add("VIN", URLS[:1])
+        self.assertEqual(first.fail(first.lease("VIN")[0], "503"), PENDING)
+        self.assertEqual(second.fail(second.lease("VIN")[0], "503"), FAILED)
+        self.assertEqual(first.lease("VIN"), [])
+        self.assertEqual(first.failed("VIN"), [(URLS[0], 2, "503")])
+
+    def test_expired_lease_on_the_last_attempt_fails(self):
+        crashed = self.open("host-a:1", lease_seconds=0.05, max_attempts=1)
+        other = self.open("host-b:1", max_attempts=1)
+        crashed.add("VIN", URLS[:1])
+        crashed.lease("VIN")
+        time.sleep(0.1)
+        self.assertEqual(other.lease("VIN"), [])
+        self.assertEqual(other.counts("VIN")[FAILED], 1)
+        self.assertIn("lease expired (held by host-a:1)", other.failed("VIN")[0][2])
+
+    def test_only_one_worker_finalizes(self):
+        workers = [self.open(f"host-{name}:1") for name in "ab"]
+        workers[0].add("VIN", URLS)
+        jobs = workers[0].lease("VIN", 2) + workers[1].lease("VIN", 2)
+        for job in jobs[:-1]:
+            workers[0].complete(job, [])
+        self.assertFalse(workers[0].claim_finalize("VIN"))
+        workers[1].complete(jobs[-1], [])
+
+        start = threading.Barrier(len(workers))
+        claimed = [None] * len(workers)
+
+        def claim(index):
+            start.wait()
+            claimed[index] = workers[index].claim_finalize("VIN")
+
+        threads = [threading.Thread(target=claim, args=(index,)) for index in range(len(workers))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(claimed), [False, True])
+        self.assertFalse(workers[0].claim_finalize("VIN"))
+        self.assertFalse(workers[1].claim_finalize("VIN"))
+
+
+if __name__ == "__main__":
+    unittest.main()
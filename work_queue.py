@@ -0,0 +1,299 @@
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+PENDING, LEASED, DONE, FAILED = "pending", "leased", "done", "failed"
+STATES = (PENDING, LEASED, DONE, FAILED)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS queues (
+    name TEXT PRIMARY KEY,
+    run_id TEXT NOT NULL,
+    created REAL NOT NULL,
+    finalized_by TEXT
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    queue TEXT NOT NULL REFERENCES queues(name),
+    url TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    leased_by TEXT,
+    lease_expires REAL,
+    updated REAL NOT NULL,
+    last_error TEXT,
+    parts TEXT,
+    UNIQUE(queue, url)
+);
+CREATE INDEX IF NOT EXISTS jobs_queue_state ON jobs(queue, state, position);
+"""
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class Job:
+    """One leased URL; hand it back with ``WorkQueue.complete`` or ``WorkQueue.fail``."""
+
+    __slots__ = ("id", "queue", "url", "position", "attempts")
+
+    def __init__(self, id: int, queue: str, url: str, position: int, attempts: int):
+        self.id = id
+        self.queue = queue
+        self.url = url
+        self.position = position
+        self.attempts = attempts
+
+
+class WorkQueue:
+    """Durable URL queue in a SQLite file that several processes or hosts can work from.
+
+    A queue (one per VIN or URL list) holds each URL once with a state:
+    pending, leased, done or failed. ``lease()`` hands out pending URLs in
+    order and marks them leased by this worker until ``lease_seconds`` from
+    now; leases of a worker that crashed run out and the URLs go back to
+    pending, or to failed once they have been tried ``max_attempts`` times.
+    Parts of finished URLs are stored with them, so whichever worker sees the
+    queue drained can write the outputs (see ``claim_finalize``).
+
+    Across hosts, put the file on a share with working file locks and leave
+    ``wal`` off; WAL mode is faster but only works on a single machine.
+    """
+
+    def __init__(self, db_path: str, lease_seconds: float = 600, max_attempts: int = 3,
+                 worker_id: Optional[str] = None, wal: bool = False):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.worker_id = worker_id or default_worker_id()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        # Autocommit mode; every change runs in its own BEGIN IMMEDIATE transaction
+        self.conn = sqlite3.connect(db_path, timeout=60, isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        if wal:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        self.conn.close()
+
+    def _transaction(self, work):
+        """Run ``work(conn)`` holding the database write lock, so no other worker interleaves."""
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(self.conn)
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+            return result
+
+    # --- Filling ---------------------------------------------------------------------
+
+    def add(self, queue: str, urls: List[str], run_id: Optional[str] = None) -> int:
+        """Create ``queue`` if needed and add the URLs it does not hold yet; returns how many were added."""
+        def work(conn):
+            conn.execute("INSERT OR IGNORE INTO queues(name, run_id, created) VALUES (?, ?, ?)",
+                         (queue, run_id or datetime.now().strftime('%Y%m%d_%H%M%S'), time.time()))
+            start = conn.execute("SELECT COALESCE(MAX(position) + 1, 0) FROM jobs WHERE queue = ?",
+                                 (queue,)).fetchone()[0]
+            now = time.time()
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO jobs(queue, url, position, updated) VALUES (?, ?, ?, ?)",
+                ((queue, url, start + offset, now) for offset, url in enumerate(urls))
+            )
+            return conn.total_changes - before
+        return self._transaction(work)
+
+    def exists(self, queue: str) -> bool:
+        return self.conn.execute("SELECT 1 FROM queues WHERE name = ?", (queue,)).fetchone() is not None
+
+    def run_id(self, queue: str) -> Optional[str]:
+        row = self.conn.execute("SELECT run_id FROM queues WHERE name = ?", (queue,)).fetchone()
+        return row["run_id"] if row else None
+
+    # --- Leasing ---------------------------------------------------------------------
+
+    def _reclaim(self, conn, queue: str, now: float):
+        """Expired leases go back to pending, or to failed when out of attempts."""
+        conn.execute(
+            "UPDATE jobs SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "last_error = 'lease expired (held by ' || leased_by || ')', leased_by = NULL, "
+            "lease_expires = NULL, updated = ? "
+            "WHERE queue = ? AND state = 'leased' AND lease_expires < ?",
+            (self.max_attempts, now, queue, now)
+        )
+
+    def lease(self, queue: str, count: int = 1) -> List[Job]:
+        """Take up to ``count`` pending URLs, lowest position first; an empty list means none are pending."""
+        def work(conn):
+            now = time.time()
+            self._reclaim(conn, queue, now)
+            rows = conn.execute(
+                "SELECT id, url, position, attempts FROM jobs WHERE queue = ? AND state = 'pending' "
+                "ORDER BY position LIMIT ?", (queue, count)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE jobs SET state = 'leased', leased_by = ?, lease_expires = ?, attempts = attempts + 1, "
+                "updated = ? WHERE id = ?",
+                ((self.worker_id, now + self.lease_seconds, now, row["id"]) for row in rows)
+            )
+            return [Job(row["id"], queue, row["url"], row["position"], row["attempts"] + 1) for row in rows]
+        return self._transaction(work)
+
+    def renew(self, jobs: List[Job]):
+        """Push the lease expiry of jobs still being worked on ``lease_seconds`` into the future."""
+        def work(conn):
+            now = time.time()
+            conn.executemany(
+                "UPDATE jobs SET lease_expires = ?, updated = ? WHERE id = ? AND state = 'leased' AND leased_by = ?",
+                ((now + self.lease_seconds, now, job.id, self.worker_id) for job in jobs)
+            )
+        self._transaction(work)
+
+    def complete(self, job: Job, parts: List[Dict]) -> bool:
+        """Store the URL's parts and mark it done.
+
+        Returns False if another worker already finished the URL after this
+        worker's lease ran out; the first result is kept.
+        """
+        def work(conn):
+            cursor = conn.execute(
+                "UPDATE jobs SET state = 'done', parts = ?, leased_by = NULL, lease_expires = NULL, "
+                "last_error = NULL, updated = ? WHERE id = ? AND state != 'done'",
+                (json.dumps(parts), time.time(), job.id)
+            )
+            return cursor.rowcount == 1
+        return self._transaction(work)
+
+    def fail(self, job: Job, error: str, retry: bool = True) -> str:
+        """Give a URL back after a failed attempt; returns its new state (pending or failed)."""
+        def work(conn):
+            row = conn.execute("SELECT state, attempts, leased_by FROM jobs WHERE id = ?", (job.id,)).fetchone()
+            if row["state"] != LEASED or row["leased_by"] != self.worker_id:
+                # The lease ran out and the URL is someone else's now
+                return row["state"]
+            state = PENDING if retry and row["attempts"] < self.max_attempts else FAILED
+            conn.execute(
+                "UPDATE jobs SET state = ?, last_error = ?, leased_by = NULL, lease_expires = NULL, updated = ? "
+                "WHERE id = ?", (state, error, time.time(), job.id)
+            )
+            return state
+        return self._transaction(work)
+
+    def retry_failed(self, queue: str) -> int:
+        """Put every failed URL back to pending with a fresh attempt budget and reopen the queue."""
+        def work(conn):
+            cursor = conn.execute(
+                "UPDATE jobs SET state = 'pending', attempts = 0, updated = ? WHERE queue = ? AND state = 'failed'",
+                (time.time(), queue)
+            )
+            if cursor.rowcount:
+                conn.execute("UPDATE queues SET finalized_by = NULL WHERE name = ?", (queue,))
+            return cursor.rowcount
+        return self._transaction(work)
+
+    # --- Progress and results --------------------------------------------------------
+
+    def counts(self, queue: str) -> Dict[str, int]:
+        counts = {state: 0 for state in STATES}
+        with self._lock:
+            rows = self.conn.execute("SELECT state, COUNT(*) AS n FROM jobs WHERE queue = ? GROUP BY state",
+                                     (queue,)).fetchall()
+        for row in rows:
+            counts[row["state"]] = row["n"]
+        return counts
+
+    def drained(self, queue: str) -> bool:
+        """True once no URL is pending or leased (expired leases count as pending)."""
+        counts = self.counts(queue)
+        if counts[PENDING]:
+            return False
+        if counts[LEASED]:
+            self._transaction(lambda conn: self._reclaim(conn, queue, time.time()))
+            counts = self.counts(queue)
+        return not counts[PENDING] and not counts[LEASED]
+
+    def claim_finalize(self, queue: str) -> bool:
+        """True for exactly one worker once the queue is drained; that worker writes the outputs."""
+        if not self.drained(queue):
+            return False
+
+        def work(conn):
+            cursor = conn.execute(
+                "UPDATE queues SET finalized_by = ? WHERE name = ? AND finalized_by IS NULL "
+                "AND NOT EXISTS (SELECT 1 FROM jobs WHERE queue = ? AND state IN ('pending', 'leased'))",
+                (self.worker_id, queue, queue)
+            )
+            return cursor.rowcount == 1
+        return self._transaction(work)
+
+    def iter_records(self, queue: str) -> Iterator[Tuple[int, str, List[Dict]]]:
+        """Stream (position, url, parts) for every done URL in queue order."""
+        cursor = self.conn.execute(
+            "SELECT position, url, parts FROM jobs WHERE queue = ? AND state = 'done' ORDER BY position", (queue,)
+        )
+        for row in cursor:
+            yield row["position"], row["url"], json.loads(row["parts"])
+
+    def iter_parts(self, queue: str) -> Iterator[Dict]:
+        for _, _, parts in self.iter_records(queue):
+            yield from parts
+
+    def failed(self, queue: str) -> List[Tuple[str, int, Optional[str]]]:
+        """(url, attempts, last error) of every failed URL."""
+        return [(row["url"], row["attempts"], row["last_error"]) for row in self.conn.execute(
+            "SELECT url, attempts, last_error FROM jobs WHERE queue = ? AND state = 'failed' ORDER BY position",
+            (queue,)
+        )]
+
+    def summary(self, queue: str) -> str:
+        counts = self.counts(queue)
+        return (f"Queue {queue}: {counts[DONE]} done, {counts[PENDING]} pending, "
+                f"{counts[LEASED]} leased, {counts[FAILED]} failed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and manage a shared scraping work queue")
+    parser.add_argument("db", help="Queue database file")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="Job counts per queue")
+    add = commands.add_parser("add", help="Add the URLs in a file to a queue")
+    add.add_argument("queue")
+    add.add_argument("urls_file")
+    commands.add_parser("failed", help="List failed URLs with their last error").add_argument("queue")
+    commands.add_parser("retry", help="Put a queue's failed URLs back to pending").add_argument("queue")
+    args = parser.parse_args()
+
+    work_queue = WorkQueue(args.db)
+    try:
+        if args.command == "status":
+            for row in work_queue.conn.execute("SELECT name, run_id, finalized_by FROM queues ORDER BY created"):
+                finalized = f", outputs written by {row['finalized_by']}" if row["finalized_by"] else ""
+                print(f"{work_queue.summary(row['name'])} (run {row['run_id']}{finalized})")
+        elif args.command == "add":
+            with open(args.urls_file, 'r') as f:
+                urls = [line.strip() for line in f if line.strip()]
+            print(f"Added {work_queue.add(args.queue, urls)} of {len(urls)} URLs to {args.queue}")
+        elif args.command == "failed":
+            for url, attempts, error in work_queue.failed(args.queue):
+                print(f"{url}  ({attempts} attempts: {error})")
+        else:
+            print(f"{work_queue.retry_failed(args.queue)} URLs back to pending in {args.queue}")
+    finally:
+        work_queue.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from driver_manager import DEFAULT_PROFILE_ROOT, DriverManager, DriverSession
+from http_fetcher import HttpPageFetcher
+from lean_browser import PageLoadStats
+from metrics import inc
+from page_cache import PageCache
+from parse_pool import ParsePool
+from proxy_pool import ProxyPool
+from rate_limiter import get_rate_limiter
+from retry_scheduler import (PERMANENT, RetryPolicy, RetryQueue, classify_page_failure,
+                             get_circuit_breaker)
+from scrape_kia_parts_undetected import parse_parts_from_html, scrape_parts_from_page
+
+logger = logging.getLogger(__name__)
+
+
+class ScraperWorkerPool:
+    """Pool of undetected-Chrome workers pulling assembly URLs from a shared queue.
+
+    Pacing comes from the per-host rate limiter shared by all workers.
+    Pages that fail for a transient reason or on a challenge go back into the
+    queue with a jittered exponential delay (``retry_policy``), and every
+    network fetch first passes the host's circuit breaker, which pauses all
+    workers while the site is failing.
+    Browsers are leased page by page from a DriverManager: pass one to share
+    warm browsers with other stages, otherwise the pool runs its own for the
+    duration of ``run()``.
+    """
+
+    def __init__(self, num_workers: int = 2, max_driver_restarts: int = 2, profile_root: str = DEFAULT_PROFILE_ROOT,
+                 http_fetcher: Optional[HttpPageFetcher] = None, page_cache: Optional[PageCache] = None,
+                 extraction_mode: str = "html", proxy_pool: Optional[ProxyPool] = None, lean: bool = False,
+                 load_stats: Optional[PageLoadStats] = None, driver_manager: Optional[DriverManager] = None,
+                 retry_policy: Optional[RetryPolicy] = None, max_queued: int = 500,
+                 parse_pool: Optional[ParsePool] = None):
+        if num_workers < 1:
+            raise ValueError("num_workers must be at least 1")
+        self.num_workers = num_workers
+        self.max_driver_restarts = max_driver_restarts
+        self.profile_root = profile_root
+        # When set, pages are fetched over HTTP first and a browser is only
+        # started for pages that need one
+        self.http_fetcher = http_fetcher
+        self.page_cache = page_cache
+        self.extraction_mode = extraction_mode
+        # Browser settings for the pool's own DriverManager when none is shared:
+        # each browser keeps one proxy until it is quarantined, and lean
+        # browsers skip images, fonts and trackers
+        self.proxy_pool = proxy_pool
+        self.lean = lean
+        self.driver_manager = driver_manager
+        # Collects per-page load reports when set
+        self.load_stats = load_stats
+        self.retry_policy = retry_policy or RetryPolicy()
+        # URLs waiting for a worker before a streaming ``run()`` input is paused
+        self.max_queued = max_queued
+        # Worker processes that parse pages, so worker threads do not hold the GIL while parsing
+        self.parse_pool = parse_pool
+
+        self.results: List[Optional[List[Dict]]] = []
+        self._queue: RetryQueue = RetryQueue(max_queued)
+        self._result_lock = threading.Lock()
+        self._waiting_for_browser = 0
+        self._on_result: Optional[Callable[[int, str, Optional[List[Dict]]], None]] = None
+        self._keep_results = True
+
+    def run(self, urls: Iterable[str],
+            on_result: Optional[Callable[[int, str, Optional[List[Dict]]], None]] = None,
+            skip: Optional[Set[str]] = None, keep_results: bool = True) -> List[Optional[List[Dict]]]:
+        """Scrape every URL and return the parts lists in the same order as ``urls``.
+
+        ``urls`` may be a generator that is still discovering URLs: workers
+        start on the first ones while it runs, and it is paused whenever
+        ``max_queued`` URLs are waiting. Failed URLs, and URLs in ``skip``,
+        come back as ``None``. ``on_result(index, url, parts)`` is called once
+        per scraped URL, serialized across workers. Callers that store rows
+        themselves from ``on_result`` pass ``keep_results=False`` so the pool
+        does not hold a second copy of every row; scraped URLs then come back
+        as ``[]``.
+        """
+        self.results = []
+        self._on_result = on_result
+        self._keep_results = keep_results
+        self._queue = RetryQueue(self.max_queued)
+
+        drivers = self.driver_manager or DriverManager(
+            size=self.num_workers, profile_root=self.profile_root, lean=self.lean, proxy_pool=self.proxy_pool
+        )
+        num_workers = self.num_workers
+        if isinstance(urls, list):
+            num_workers = min(num_workers, sum(1 for url in urls if not (skip and url in skip)))
+        threads = []
+        try:
+            for worker_id in range(num_workers):
+                thread = threading.Thread(
+                    target=self._worker, args=(worker_id, drivers),
+                    name=f"scraper-worker-{worker_id}", daemon=True
+                )
+                thread.start()
+                threads.append(thread)
+
+            try:
+                for url in urls:
+                    with self._result_lock:
+                        index = len(self.results)
+                        self.results.append(None)
+                    if not (skip and url in skip):
+                        self._feed((index, url, 1), threads)
+            finally:
+                self._queue.close()
+                for thread in threads:
+                    thread.join()
+        finally:
+            if drivers is not self.driver_manager:
+                drivers.close()
+
+        # Every worker gave up: whatever is still queued could not be scraped
+        for index, url, _ in self._queue.drain():
+            logger.error(f"No live workers left, marking URL as failed: {url}")
+            self._record(index, url, None)
+
+        return self.results
+
+    def _feed(self, job: Tuple[int, str, int], threads: List[threading.Thread]):
+        # Wait for room in the queue, unless no worker can make room: all of
+        # them are gone or waiting for a browser, which the caller producing
+        # the URLs may be holding until it is done
+        while True:
+            alive = sum(1 for thread in threads if thread.is_alive())
+            if alive <= self._waiting_for_browser:
+                self._queue.put(job, block=False)
+                return
+            if self._queue.put(job, timeout=0.5):
+                return
+
+    def _record(self, index: int, url: str, parts: Optional[List[Dict]]):
+        with self._result_lock:
+            self.results[index] = parts if parts is None or self._keep_results else []
+            if self._on_result:
+                try:
+                    self._on_result(index, url, parts)
+                except Exception as e:
+                    logger.error(f"Result callback failed for {url}: {e}")
+
+    def _scrape_in_browser(self, drivers: DriverManager, session: DriverSession,
+                           url: str) -> Tuple[List[Dict], Optional[str]]:
+        """Load ``url`` in the leased browser; return its rows and, when there are none, how it failed."""
+        limiter = get_rate_limiter(url, via=session.proxy)
+        limiter.acquire()
+        start = time.monotonic()
+        try:
+            parts_data = scrape_parts_from_page(session.driver, url, cache=self.page_cache,
+                                                mode=self.extraction_mode, load_stats=self.load_stats,
+                                                parse_pool=self.parse_pool)
+        except Exception as e:
+            logger.error(f"Failed to process URL {url} in browser {session.slot}: {e}")
+            parts_data = []
+
+        if parts_data:
+            limiter.record_success(time.monotonic() - start)
+            if session.proxy:
+                drivers.proxy_pool.record_success(session.proxy, time.monotonic() - start)
+            # The browser got through, so share its fresh clearance with the HTTP path
+            if self.http_fetcher:
+                self.http_fetcher.export_cookies(session.driver)
+            return parts_data, None
+
+        failure = classify_page_failure(session.driver)
+        # A missing page says nothing about how hard we are hitting the host
+        if failure != PERMANENT:
+            limiter.record_backoff(f"no li.assemblyProdDetails in browser, {failure}")
+            if session.proxy:
+                drivers.proxy_pool.record_failure(session.proxy, "no part rows in browser")
+        return parts_data, failure
+
+    def _worker(self, worker_id: int, drivers: DriverManager):
+        """Worker loop: scrape queued URLs until the queue is drained, leasing a browser when one is needed."""
+        restarts = 0
+
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            try:
+                outcome = self._process(worker_id, drivers, job)
+            except Exception:
+                # Settle the job so the other workers are not left waiting on it
+                get_circuit_breaker(job[1]).abandon()
+                self._record(job[0], job[1], None)
+                self._queue.done()
+                raise
+            if outcome == "retire":
+                return
+
+            if outcome == "died":
+                inc("retries", reason="browser_restart")
+                restarts += 1
+                if restarts > self.max_driver_restarts:
+                    logger.error(f"Worker {worker_id}: browser died {restarts} times, retiring worker")
+                    return
+                logger.warning(f"Worker {worker_id}: browser died, restarting ({restarts}/{self.max_driver_restarts})")
+
+    def _process(self, worker_id: int, drivers: DriverManager, job: Tuple[int, str, int]) -> Optional[str]:
+        """Scrape one job and settle it in the queue; return "died" or "retire" when the worker is affected."""
+        index, url, attempt = job
+        retrying = f" (attempt {attempt}/{self.retry_policy.max_attempts})" if attempt > 1 else ""
+        logger.info(f"Worker {worker_id}: processing URL {index + 1}/{len(self.results)}{retrying}")
+        parts_data = []
+        failure = None
+        source = "cache"
+        page_source = self.page_cache.get(url) if self.page_cache else None
+        if page_source:
+            parts_data = parse_parts_from_html(page_source, url, parse_pool=self.parse_pool)
+
+        died = False
+        breaker = None
+        if not parts_data:
+            # Anything past the cache goes to the host, so wait out an open breaker first
+            breaker = get_circuit_breaker(url)
+            breaker.before_request()
+            if not page_source and self.http_fetcher:
+                source = "http"
+                page_source = self.http_fetcher.fetch(url)
+                if page_source:
+                    parts_data = parse_parts_from_html(page_source, url, parse_pool=self.parse_pool)
+                    if parts_data and self.page_cache:
+                        self.page_cache.put(url, page_source)
+
+        if not parts_data:
+            if self.http_fetcher:
+                inc("retries", reason="browser_fallback")
+            source = "browser"
+            with self._result_lock:
+                self._waiting_for_browser += 1
+            try:
+                session = drivers.acquire()
+            except Exception as e:
+                logger.error(f"Worker {worker_id}: could not start browser: {e}")
+                # Hand the URL back to the pool and retire this worker
+                breaker.abandon()
+                self._queue.requeue(job)
+                inc("retries", reason="requeued")
+                return "retire"
+            finally:
+                with self._result_lock:
+                    self._waiting_for_browser -= 1
+            try:
+                parts_data, failure = self._scrape_in_browser(drivers, session, url)
+                died = not parts_data and not session.alive()
+                if died:
+                    session.discard()
+            finally:
+                drivers.release(session)
+
+        if breaker:
+            breaker.record(bool(parts_data) or failure == PERMANENT)
+        if parts_data:
+            inc("pages", source=source)
+            inc("parts", len(parts_data))
+            self._record(index, url, parts_data)
+            self._queue.done()
+        elif self.retry_policy.should_retry(failure, attempt):
+            delay = self.retry_policy.delay(failure, attempt)
+            logger.warning(f"Worker {worker_id}: {failure} failure on {url}, retrying in {delay:.0f}s "
+                           f"(attempt {attempt}/{self.retry_policy.max_attempts})")
+            inc("retries", reason=failure)
+            self._queue.retry((index, url, attempt + 1), delay)
+        else:
+            inc("failures", stage="assembly_page")
+            if failure == PERMANENT:
+                logger.warning(f"Worker {worker_id}: {url} is gone, not retrying")
+            self._record(index, url, None)
+            self._queue.done()
+
+        return "died" if died else None